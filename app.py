@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Dict, Tuple
+
+from async_database import AsyncDatabase
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class AppContext:
+    """The data layer shared by everything in one bot process.
+
+    Building it resolves the database dialect and sets up the pool but
+    opens no connection. The schema is checked in `startup`, which runs
+    the migrations next to the bot's own network initialization and
+    records how long each phase and the whole cold start took.
+    """
+
+    def __init__(self, database_url: str = None, database: Database = None, started_at: float = None,
+                 partition: Tuple[int, int] = (0, 1)):
+        # perf_counter() when the process began starting up; defaults to now
+        self.started_at = started_at or time.perf_counter()
+        # (index, count) of the chat_id partition this process serves, see sharding.py
+        self.partition = partition
+        self.db = AsyncDatabase(database or Database(database_url, init_schema=False, partition=partition))
+        self.timings: Dict[str, float] = {}
+        self._started = None
+
+    async def startup(self, **phases: Awaitable):
+        """Check the schema while the named `phases` run, e.g. network=application.initialize()"""
+        if self._started is None:
+            self._started = asyncio.ensure_future(self._startup(phases))
+        await self._started
+
+    async def _startup(self, phases: Dict[str, Awaitable]):
+        started = time.perf_counter()
+
+        async def timed(name: str, phase: Awaitable):
+            phase_started = time.perf_counter()
+            await phase
+            self.timings[name] = time.perf_counter() - phase_started
+
+        await asyncio.gather(timed('schema', self.db.init_database()),
+                             *(timed(name, phase) for name, phase in phases.items()))
+        self.timings['startup'] = time.perf_counter() - started
+        self.timings['cold_start'] = time.perf_counter() - self.started_at
+        concurrent = ', '.join(f"{name} {self.timings[name] * 1000:.0f}ms" for name in ('schema', *phases))
+        logger.info(f"Cold start took {self.timings['cold_start'] * 1000:.0f}ms; startup phases ran "
+                    f"concurrently in {self.timings['startup'] * 1000:.0f}ms ({concurrent}), "
+                    f"schema version {self.db.database.schema_version}")
+
+    async def close(self):
+        await self.db.close()
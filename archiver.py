@@ -0,0 +1,135 @@
+import asyncio
+import gzip
+import json
+import logging
+import time as monotonic_time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import List
+
+from models import Exam
+from scheduler import DATETIME_FORMAT
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ArchiveReport:
+    archived: int = 0
+    batches: int = 0
+    paused: float = 0.0
+    started_at: float = field(default_factory=monotonic_time.monotonic)
+    duration: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Exams archived per second over the whole run"""
+        return self.archived / self.duration if self.duration else 0.0
+
+    def __str__(self):
+        return (f"archived={self.archived} batches={self.batches} paused={self.paused:.0f}s "
+                f"duration={self.duration:.2f}s rate={self.rate:.0f} rows/s")
+
+
+class JsonlArchive:
+    """Append archived exams to a gzip-compressed JSON Lines file.
+
+    Each batch is written as its own gzip member; zcat and gzip.open read
+    the members back as one stream.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, exams: List[Exam]):
+        with gzip.open(self.path, 'at', encoding='utf-8') as archive:
+            for exam in exams:
+                archive.write(json.dumps(exam._asdict(), default=str, ensure_ascii=False) + '\n')
+
+
+class Archiver:
+    """Move past exams out of the exams table once a day.
+
+    Exams dated more than `archive_after_days` ago are moved, oldest first,
+    `batch_size` per transaction with `pause_seconds` between batches. The
+    run starts at `run_at`, clear of the reminder peak, and before each
+    batch it checks the outbox: while a reminder is due within
+    `guard_minutes` it waits rather than compete with the reminder run.
+    """
+
+    def __init__(self, db, archive_after_days: int = 30, batch_size: int = 1000,
+                 pause_seconds: float = 0.5, run_at: time = time(hour=3), guard_minutes: int = 15,
+                 path: str = None, guard_poll_seconds: float = 60):
+        self.db = db
+        self.archive_after_days = archive_after_days
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.run_at = run_at
+        self.guard = timedelta(minutes=guard_minutes)
+        self.guard_poll_seconds = guard_poll_seconds
+        # Without a file the rows go to the exams_archive table
+        self.sink = JsonlArchive(path) if path else None
+        self._task = None
+
+    async def reminders_due(self) -> bool:
+        """Whether a reminder is due (or still being sent) within the guard window.
+
+        Checked across all partitions: with sharded workers only worker 0
+        archives, while every worker sends its own chats' reminders.
+        """
+        now = datetime.now()
+        return await self.db.has_reminders_due(
+            not_before=(now - self.guard).strftime(DATETIME_FORMAT),
+            until=(now + self.guard).strftime(DATETIME_FORMAT)
+        )
+
+    async def run_once(self) -> ArchiveReport:
+        """Archive everything that is old enough and log the totals"""
+        report = ArchiveReport()
+        before_date = (date.today() - timedelta(days=self.archive_after_days)).isoformat()
+        while True:
+            while await self.reminders_due():
+                paused_at = monotonic_time.monotonic()
+                await asyncio.sleep(self.guard_poll_seconds)
+                report.paused += monotonic_time.monotonic() - paused_at
+
+            archived = await self.db.archive_exams(before_date, self.batch_size, sink=self.sink)
+            report.archived += archived
+            report.batches += 1 if archived else 0
+            if archived < self.batch_size:
+                break
+            await asyncio.sleep(self.pause_seconds)
+
+        report.duration = monotonic_time.monotonic() - report.started_at
+        logger.info(f"Archived exams dated before {before_date}: {report}")
+        return report
+
+    def seconds_until_next_run(self, now: datetime = None) -> float:
+        now = now or datetime.now()
+        next_run = datetime.combine(now.date(), self.run_at)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.seconds_until_next_run())
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Archive run failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,254 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, Iterable, List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from database import Database, PageCursor
+from models import Exam, Notification
+
+class GroupCommitWriter:
+    """Commit writes from concurrent handlers together (group commit).
+
+    The first write waits up to `window` seconds for others to join it, or
+    until `max_batch` have, and the batch is applied in one transaction so
+    it pays for one commit instead of one each. Every caller still gets
+    its own result. If the batch fails, its writes are retried one
+    transaction each, so only the failing write's caller sees the error.
+    """
+
+    def __init__(self, database: Database, run: Callable, window: float = 0.005, max_batch: int = 100):
+        self.database = database
+        self.run = run
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._pending: List[Tuple[str, tuple, asyncio.Future]] = []
+        self._timer = None
+        self._flushes = set()
+
+    async def submit(self, kind: str, *args):
+        """Queue an 'add' or 'remove' write and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((kind, args, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        """Start committing the pending writes now"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._commit(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _commit(self, batch: List[Tuple[str, tuple, asyncio.Future]]):
+        self.batches += 1
+        self.writes += len(batch)
+        try:
+            results = await self.run(self.database.write_batch, [(kind, args) for kind, args, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                self._settle(batch[0][2], error=e)
+                return
+            for kind, args, future in batch:
+                try:
+                    [result] = await self.run(self.database.write_batch, [(kind, args)])
+                except Exception as e:
+                    self._settle(future, error=e)
+                else:
+                    self._settle(future, result)
+            return
+        for (_, _, future), result in zip(batch, results):
+            self._settle(future, result)
+
+    @staticmethod
+    def _settle(future: asyncio.Future, result=None, error: Exception = None):
+        # The handler may have been cancelled while its write was in flight
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def close(self):
+        """Commit whatever is still pending"""
+        self.flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+
+class AsyncDatabase:
+    """Awaitable wrapper around Database.
+
+    Queries run on a dedicated thread pool sized to the connection pool, so
+    slow round-trips overlap with each other and never block the event loop.
+    With a write batch window (`DB_WRITE_BATCH_MS`), add_exam and
+    remove_exam go through a GroupCommitWriter.
+    """
+
+    def __init__(self, database: Database = None, max_workers: int = None,
+                 write_batch_ms: float = None, write_batch_size: int = None):
+        self.database = database or Database()
+        self.max_workers = max_workers or self.database.pool_size
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='db'
+        )
+        if write_batch_ms is None:
+            write_batch_ms = float(os.getenv('DB_WRITE_BATCH_MS', '0'))
+        self.writer = GroupCommitWriter(
+            self.database, self._run,
+            window=write_batch_ms / 1000,
+            max_batch=write_batch_size or int(os.getenv('DB_WRITE_BATCH_SIZE', '100'))
+        ) if write_batch_ms else None
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def init_database(self) -> int:
+        """Create or upgrade the schema; returns the schema version"""
+        await self._run(self.database.init_database)
+        return self.database.schema_version
+
+    async def add_exam(self, user_id: int, chat_id: int, exam_date: str, title: str,
+                       description: str = "", is_group_exam: bool = False) -> int:
+        """Add a new exam to the database"""
+        if self.writer:
+            return await self.writer.submit('add', user_id, chat_id, exam_date, title, description, is_group_exam)
+        return await self._run(
+            self.database.add_exam, user_id, chat_id, exam_date, title,
+            description=description, is_group_exam=is_group_exam
+        )
+
+    async def add_exams_bulk(self, user_id: int, chat_id: int, exams: Iterable[Tuple[str, str, str]],
+                             is_group_exam: bool = False, chunk_size: int = 500) -> int:
+        """Add many exams in one transaction; `exams` may be a lazily read file"""
+        return await self._run(
+            self.database.add_exams_bulk, user_id, chat_id, exams,
+            is_group_exam=is_group_exam, chunk_size=chunk_size
+        )
+
+    async def get_exams_for_user(self, user_id: int, chat_id: int) -> List[Exam]:
+        """Get all exams for a specific user in a specific chat"""
+        return await self._run(self.database.get_exams_for_user, user_id, chat_id)
+
+    async def get_exams_for_group(self, chat_id: int) -> List[Exam]:
+        """Get all group exams for a specific chat"""
+        return await self._run(self.database.get_exams_for_group, chat_id)
+
+    async def get_upcoming_exams_for_user(self, user_id: int, chat_id: int, from_date: str, until_date: str,
+                                          after: PageCursor = None, before: PageCursor = None,
+                                          limit: int = 10) -> List[Exam]:
+        """Get one keyset page of a user's exams between from_date and until_date"""
+        return await self._run(
+            self.database.get_upcoming_exams_for_user, user_id, chat_id, from_date, until_date,
+            after=after, before=before, limit=limit
+        )
+
+    async def get_upcoming_exams_for_group(self, chat_id: int, from_date: str, until_date: str,
+                                           after: PageCursor = None, before: PageCursor = None,
+                                           limit: int = 10) -> List[Exam]:
+        """Get one keyset page of a group's exams between from_date and until_date"""
+        return await self._run(
+            self.database.get_upcoming_exams_for_group, chat_id, from_date, until_date,
+            after=after, before=before, limit=limit
+        )
+
+    async def get_exams_for_notification(self, days_ahead: int = 1) -> List[Exam]:
+        """Get exams that need notification (1 day ahead by default)"""
+        return await self._run(self.database.get_exams_for_notification, days_ahead)
+
+    async def iter_exams_for_notification(self, days_ahead: int = 1,
+                                          batch_size: int = 500) -> AsyncIterator[Exam]:
+        """Yield exams that need notification, one keyset-paginated batch at a time"""
+        target_date = (datetime.now() + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
+        after_id = 0
+        while True:
+            batch = await self._run(self.database.get_notification_batch, target_date, after_id, batch_size)
+            for exam in batch:
+                yield exam
+            if len(batch) < batch_size:
+                return
+            after_id = batch[-1].id
+
+    async def remove_exam(self, exam_id: int, user_id: int) -> bool:
+        """Remove an exam (only if user owns it)"""
+        if self.writer:
+            return await self.writer.submit('remove', exam_id, user_id)
+        return await self._run(self.database.remove_exam, exam_id, user_id)
+
+    async def get_exam_by_id(self, exam_id: int) -> Optional[Exam]:
+        """Get exam details by ID"""
+        return await self._run(self.database.get_exam_by_id, exam_id)
+
+    async def claim_notifications(self, worker_id: str, limit: int = 200, lease_seconds: int = 300,
+                                  max_attempts: int = 5, max_lateness_seconds: int = 43200,
+                                  max_per_chat: int = None) -> List[Notification]:
+        """Lease up to `limit` notifications that are due for this worker"""
+        return await self._run(
+            self.database.claim_notifications, worker_id, limit=limit, lease_seconds=lease_seconds,
+            max_attempts=max_attempts, max_lateness_seconds=max_lateness_seconds, max_per_chat=max_per_chat
+        )
+
+    async def renew_notification_leases(self, claims: Iterable[str], lease_seconds: int = 300) -> int:
+        """Extend the lease on the unsent rows of each claim"""
+        return await self._run(self.database.renew_notification_leases, claims, lease_seconds)
+
+    async def get_chat_locale(self, chat_id: int) -> Optional[str]:
+        """The locale a chat chose for replies, or None"""
+        return await self._run(self.database.get_chat_locale, chat_id)
+
+    async def set_chat_locale(self, chat_id: int, locale: str) -> bool:
+        """Store the locale replies and reminders in a chat are rendered in"""
+        return await self._run(self.database.set_chat_locale, chat_id, locale)
+
+    async def get_upcoming_due_times(self, until: str, not_before: str, limit: int = 1000) -> List:
+        """Distinct due times of claimable notifications between not_before and until"""
+        return await self._run(self.database.get_upcoming_due_times, until, not_before, limit)
+
+    async def has_reminders_due(self, not_before: str, until: str) -> bool:
+        """Whether any chat has a reminder due or being sent between not_before and until"""
+        return await self._run(self.database.has_reminders_due, not_before, until)
+
+    async def mark_notification_sent(self, notification_id: int, claim: str) -> bool:
+        """Record a delivered notification"""
+        return await self._run(self.database.mark_notification_sent, notification_id, claim)
+
+    async def mark_notification_failed(self, notification_id: int, claim: str, error: str,
+                                       retry: bool = True, max_attempts: int = 5) -> bool:
+        """Release a failed notification for another attempt, or fail it permanently"""
+        return await self._run(
+            self.database.mark_notification_failed, notification_id, claim, error,
+            retry=retry, max_attempts=max_attempts
+        )
+
+    async def archive_exams(self, before_date: str, limit: int = 1000,
+                            sink: Callable[[List[Exam]], None] = None) -> int:
+        """Move up to `limit` exams dated before before_date to the archive"""
+        return await self._run(self.database.archive_exams, before_date, limit, sink=sink)
+
+    async def get_outbox_stats(self, remind_date: str) -> Dict[str, int]:
+        """Count notifications for remind_date by status"""
+        return await self._run(self.database.get_outbox_stats, remind_date)
+
+    def pool_stats(self) -> Dict:
+        """Return connection pool statistics"""
+        return self.database.pool_stats()
+
+    async def close(self):
+        """Stop the worker threads and close pooled connections"""
+        if self.writer:
+            await self.writer.close()
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+        self.database.close()
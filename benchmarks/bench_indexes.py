@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark the exams indexes added by migration 2.
+
+Builds a SQLite database at schema version 1 (no indexes), times the /list
+and notification queries, applies migration 2 and times them again.
+
+    python benchmarks/bench_indexes.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import SQLITE, run_migrations
+
+QUERIES = {
+    'list (user)': (
+        'SELECT id, exam_date, title, description, is_group_exam FROM exams '
+        'WHERE user_id = ? AND chat_id = ? ORDER BY exam_date ASC',
+        lambda rnd, args: (rnd.randrange(args.users), rnd.randrange(args.users))
+    ),
+    'list (group)': (
+        'SELECT id, exam_date, title, description, user_id FROM exams '
+        'WHERE chat_id = ? AND is_group_exam = TRUE ORDER BY exam_date ASC',
+        lambda rnd, args: (-rnd.randrange(args.groups),)
+    ),
+    'notification scan': (
+        'SELECT id, user_id, chat_id, exam_date, title, description, is_group_exam FROM exams '
+        'WHERE exam_date = ?',
+        lambda rnd, args: ((date(2024, 1, 1) + timedelta(days=rnd.randrange(args.days))).isoformat(),)
+    ),
+}
+
+
+def populate(conn, args):
+    rnd = random.Random(42)
+    start = date(2024, 1, 1)
+
+    def rows():
+        for i in range(args.rows):
+            exam_date = (start + timedelta(days=rnd.randrange(args.days))).isoformat()
+            if rnd.random() < 0.5:
+                user_id = rnd.randrange(args.users)
+                yield (user_id, user_id, exam_date, f'exam {i}', '', False)
+            else:
+                yield (rnd.randrange(args.users), -rnd.randrange(args.groups), exam_date, f'exam {i}', '', True)
+
+    conn.executemany(
+        'INSERT INTO exams (user_id, chat_id, exam_date, title, description, is_group_exam) '
+        'VALUES (?, ?, ?, ?, ?, ?)', rows()
+    )
+    conn.commit()
+
+
+def time_queries(conn, args):
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        rnd = random.Random(7)
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            conn.execute(sql, params(rnd, args)).fetchall()
+        results[name] = (time.perf_counter() - started) / args.iterations * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--groups', type=int, default=2_000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        run_migrations(conn, SQLITE, target=1)
+
+        started = time.perf_counter()
+        populate(conn, args)
+        print(f"Inserted {args.rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+        before = time_queries(conn, args)
+        started = time.perf_counter()
+        run_migrations(conn, SQLITE)
+        print(f"Built indexes in {time.perf_counter() - started:.1f}s\n")
+        after = time_queries(conn, args)
+        conn.close()
+
+    print(f"{'query':<20}{'no index (ms)':>16}{'indexed (ms)':>16}{'speedup':>10}")
+    for name in QUERIES:
+        print(f"{name:<20}{before[name]:>16.3f}{after[name]:>16.3f}{before[name] / after[name]:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compare the memory and build time of Exam records with per-row dicts.
+
+Maps the same synthetic result rows to the dicts the Database used to
+build, to Exam records through the RowMapper, and to a frozen slotted
+dataclass for reference. For each it reports build time per row (with the
+cyclic collector on, as in the bot, and off), memory held by the result
+list and the time of a full GC pass while it is alive.
+
+Dicts holding only plain values are never tracked by the collector, while
+every tuple-based record is, so records trade some collector work for
+less than half the memory.
+
+    python benchmarks/bench_records.py --rows 200000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import EXAM
+from models import Exam
+
+
+@dataclass(frozen=True, slots=True)
+class ExamDataclass:
+    id: int
+    user_id: int
+    chat_id: int
+    exam_date: date
+    title: str
+    description: str
+    is_group_exam: bool
+
+
+def as_dicts(rows):
+    # The mapping Database used before Exam records
+    return list(map(lambda row: {
+        'id': row[0],
+        'user_id': row[1],
+        'chat_id': row[2],
+        'exam_date': row[3],
+        'title': row[4],
+        'description': row[5],
+        'is_group_exam': bool(row[6])
+    }, rows))
+
+
+def as_dataclasses(rows):
+    return [ExamDataclass(row[0], row[1], row[2], row[3], row[4], row[5], bool(row[6])) for row in rows]
+
+
+def measure(name, build, rows, repeat):
+    best = min(_timed(build, rows) for _ in range(repeat))
+    gc.disable()
+    try:
+        best_no_gc = min(_timed(build, rows) for _ in range(repeat))
+    finally:
+        gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    records = build(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    gc.collect()
+    gc_time = time.perf_counter() - started
+    del records
+
+    print(f"{name:<12}{best / len(rows) * 1e9:>12.0f}{best_no_gc / len(rows) * 1e9:>12.0f}"
+          f"{size / len(rows):>14.0f}{gc_time * 1000:>12.1f}")
+
+
+def _timed(build, rows):
+    started = time.perf_counter()
+    build(rows)
+    return time.perf_counter() - started
+
+
+def main(args):
+    exam_date = date(2030, 6, 1)
+    # Shaped like a driver row; strings are shared, as they would be for a repeated title
+    rows = [(i, 1000 + i % 500, -100 - i % 50, exam_date, 'Final exam', 'Hall 3', i % 2) for i in range(args.rows)]
+
+    print(f"{args.rows} rows\n")
+    print(f"{'record':<12}{'ns/row':>12}{'gc off':>12}{'bytes/row':>14}{'gc (ms)':>12}")
+    measure('dict', as_dicts, rows, args.repeat)
+    measure('Exam', EXAM.all, rows, args.repeat)
+    measure('dataclass', as_dataclasses, rows, args.repeat)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Time message rendering with the template catalogs against the inline
+f-string and += code the handlers used before.
+
+Renders a --exams long /list, both as one page like render_list built
+and split into messages. It also renders a
+--reminders batch, both as one reminder per notification and as digests
+of --per-chat reminders. Arabic output is checked to be identical to the
+old code's before timing.
+
+    python benchmarks/bench_rendering.py --exams 500 --reminders 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Exam, Notification
+from rendering import Renderer, split_message
+
+
+def old_list(events, is_group, offset=0):
+    # The /list page as ExamBot.render_list built it
+    parts = ["👥 مواعيد المجموعة:\n\n" if is_group else "👤 مواعيدك الشخصية:\n\n"]
+    for i, event in enumerate(events, offset + 1):
+        parts.append(f"🎯 {i}. {event.title}\n")
+        parts.append(f"📅 {event.exam_date}\n")
+        if event.description:
+            parts.append(f"📝 {event.description}\n")
+        parts.append("\n\n")
+    parts.append("💡 استخدم /remove <رقم> لحذف موعد")
+    return "".join(parts)
+
+
+def old_list_entries(events):
+    # The same entries built with f-strings, for splitting a whole list
+    return [f"🎯 {i}. {event.title}\n📅 {event.exam_date}\n"
+            + (f"📝 {event.description}\n" if event.description else "") + "\n\n"
+            for i, event in enumerate(events, 1)]
+
+
+def old_reminder(event):
+    # ExamBot.format_notification
+    scope_emoji = "👥" if event.is_group_exam else "👤"
+    scope_text = "مجموعة" if event.is_group_exam else "شخصي"
+
+    days_left = (datetime.strptime(str(event.exam_date), '%Y-%m-%d').date() - datetime.now().date()).days
+    day_label = "اليوم" if days_left == 0 else "غداً" if days_left == 1 else "التاريخ"
+
+    message = f"🔔 تذكير بالموعد!\n\n"
+    message += f"📅 {day_label}: {event.exam_date}\n"
+    message += f"📝 العنوان: {event.title}\n"
+    if event.description:
+        message += f"📄 الوصف: {event.description}\n"
+    message += f"{scope_emoji} النطاق: {scope_text}\n\n"
+    message += f"🎯 لا تنس الاستعداد للموعد!"
+    return message
+
+
+def old_digest(events):
+    # ExamBot.format_digest
+    header = f"🔔 تذكير بالمواعيد ({len(events)})\n"
+    entries = []
+    for event in events:
+        days_left = (datetime.strptime(str(event.exam_date), '%Y-%m-%d').date() - datetime.now().date()).days
+        day_label = "اليوم" if days_left == 0 else "غداً" if days_left == 1 else "التاريخ"
+        entry = f"\n📅 {day_label}: {event.exam_date}\n📝 {event.title}\n"
+        if event.description:
+            entry += f"📄 {event.description}\n"
+        entries.append(entry)
+    return header, entries
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(args):
+    renderer = Renderer('ar')
+    today = date.today()
+    dates = [(today + timedelta(days=day % 3)).isoformat() for day in range(max(args.exams, args.reminders))]
+    exams = [Exam(i, 1, -1, dates[i], f'Exam{i}', f'room {i % 40}' if i % 3 else '', True)
+             for i in range(args.exams)]
+    notifications = [Notification(i, 1, 1440, 'w:c', i, 1, -(i // args.per_chat), dates[i], f'Exam{i}',
+                                  f'room {i % 40}' if i % 3 else '', bool(i % 2), None)
+                     for i in range(args.reminders)]
+    chats = [notifications[i:i + args.per_chat] for i in range(0, len(notifications), args.per_chat)]
+
+    assert renderer.list_page(None, exams[:10], True) == old_list(exams[:10], True)
+    assert renderer.list_entries(None, exams) == old_list_entries(exams)
+    assert all(renderer.reminder(n) == old_reminder(n) for n in notifications[:100])
+    assert renderer.digest(chats[0]) == old_digest(chats[0])
+
+    cases = [
+        (f"/list page of {args.exams}", args.exams,
+         lambda: old_list(exams, True),
+         lambda: renderer.list_page(None, exams, True)),
+        (f"/list {args.exams}, split", args.exams,
+         lambda: [text for text, _ in split_message("👥 مواعيد المجموعة:\n\n", old_list_entries(exams))],
+         lambda: renderer.list_messages(None, exams, True)),
+        (f"{args.reminders} reminders", args.reminders,
+         lambda: [old_reminder(n) for n in notifications],
+         lambda: [renderer.reminder(n, today) for n in notifications]),
+        (f"{args.reminders} as digests", args.reminders,
+         lambda: [split_message(*old_digest(chat)) for chat in chats],
+         lambda: [split_message(*renderer.digest(chat, today)) for chat in chats]),
+    ]
+    print(f"{'case':<26}{'old (ms)':>10}{'new (ms)':>10}{'us/item old':>13}{'us/item new':>13}")
+    for name, items, old, new in cases:
+        old_time, new_time = timed(old, args.repeat), timed(new, args.repeat)
+        print(f"{name:<26}{old_time * 1000:>10.2f}{new_time * 1000:>10.2f}"
+              f"{old_time / items * 1e6:>13.2f}{new_time / items * 1e6:>13.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exams', type=int, default=500, help='exams in the rendered list')
+    parser.add_argument('--reminders', type=int, default=10000, help='reminders in the batch')
+    parser.add_argument('--per-chat', type=int, default=20, help='reminders per chat in the digest case')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case; the best is reported')
+    main(parser.parse_args())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Compare /add and /remove write throughput with per-call commits and with
+group commit.
+
+Runs --clients concurrent clients, as concurrent handlers would, each
+adding --writes exams to one group and removing every fourth one again.
+It does this through AsyncDatabase, first with one transaction per call
+and then with a GroupCommitWriter for each --windows value (in ms). For
+each run it reports writes per second, per-call latency and the mean
+number of writes committed together.
+
+    python benchmarks/bench_writes.py --clients 64 --writes 50 --windows 2,5,10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_database import AsyncDatabase
+from database import Database
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(database_url: str, args, window_ms: float):
+    db = AsyncDatabase(Database(database_url), write_batch_ms=window_ms, write_batch_size=args.batch_size)
+    exam_date = (date.today() + timedelta(days=7)).isoformat()
+    latencies = []
+
+    async def client(user_id: int):
+        for i in range(args.writes):
+            started = time.perf_counter()
+            exam_id = await db.add_exam(user_id, -1, exam_date, f'Exam {i}', 'room', True)
+            latencies.append(time.perf_counter() - started)
+            if i % 4 == 3:
+                started = time.perf_counter()
+                await db.remove_exam(exam_id, user_id)
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(user_id) for user_id in range(1, args.clients + 1)))
+    elapsed = time.perf_counter() - started
+    per_batch = db.writer.writes / db.writer.batches if db.writer else 1.0
+    await db.close()
+    return len(latencies) / elapsed, latencies, per_batch
+
+
+async def main(args):
+    windows = [0.0] + [float(window) for window in args.windows.split(',') if window]
+    print(f"{args.clients} clients x {args.writes} adds (+1 remove per 4)\n")
+    print(f"{'mode':<16}{'writes/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'per commit':>12}")
+    for window_ms in windows:
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'writes.db')}"
+            if args.database_url:
+                db = Database(database_url)
+                with db.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('DELETE FROM notifications')
+                    cursor.execute('DELETE FROM exams')
+                    conn.commit()
+                db.close()
+            rate, latencies, per_batch = await run(database_url, args, window_ms)
+        mode = f"group {window_ms:g}ms" if window_ms else 'per call'
+        print(f"{mode:<16}{rate:>10.0f}{percentile(latencies, 50) * 1000:>10.2f}"
+              f"{percentile(latencies, 99) * 1000:>10.2f}{per_batch:>12.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=64, help='concurrent writers')
+    parser.add_argument('--writes', type=int, default=50, help='exams added per client')
+    parser.add_argument('--windows', default='2,5,10', help='group commit windows to compare, in ms')
+    parser.add_argument('--batch-size', type=int, default=100, help='writes per group commit at most')
+    parser.add_argument('--database-url', help='e.g. postgresql://user@127.0.0.1/examdb (default: temp SQLite)')
+    asyncio.run(main(parser.parse_args()))
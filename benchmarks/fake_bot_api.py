@@ -0,0 +1,308 @@
+"""
+Local stand-in for the Telegram Bot API.
+
+Answers the handful of methods the bot uses (getMe, sendMessage,
+editMessageText, answerCallbackQuery, sendDocument, getFile, setWebhook,
+deleteWebhook, getUpdates), serves uploaded files for download and records
+every sent or edited message and every document.
+Point the bot at it with TELEGRAM_BASE_URL=http://127.0.0.1:<port>.
+Updates can be queued for a long-polling bot, or pushed to a webhook the
+way Telegram would, including the secret-token header.
+
+Only the standard library is used, so it runs wherever the bot does.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlparse
+
+
+@dataclass
+class SentMessage:
+    chat_id: int
+    text: str
+    at: float
+    reply_markup: Optional[dict] = None
+    message_id: int = 0
+
+
+@dataclass
+class SentDocument:
+    chat_id: int
+    file_name: str
+    content: bytes
+
+
+@dataclass
+class FakeBotAPI:
+    host: str = '127.0.0.1'
+    port: int = 0
+    # Simulated Bot API latency per call, in seconds
+    latency: float = 0.0
+    # Fraction of sendMessage calls answered with 429 Too Many Requests
+    flood_rate: float = 0.0
+    retry_after: int = 1
+    sent: List[SentMessage] = field(default_factory=list)
+    edited: List[SentMessage] = field(default_factory=list)
+    documents: List[SentDocument] = field(default_factory=list)
+    files: Dict[str, bytes] = field(default_factory=dict)
+    calls: Dict[str, int] = field(default_factory=dict)
+    webhook_url: Optional[str] = None
+    webhook_secret: Optional[str] = None
+    # Served to a long-polling bot by getUpdates
+    pending_updates: List[dict] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._server = None
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    # --- Bot API methods -------------------------------------------------
+
+    def _method(self, name: str, params: dict):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if name == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot',
+                    'can_join_groups': True, 'can_read_all_group_messages': False,
+                    'supports_inline_queries': False}
+        if name == 'sendMessage':
+            if self.flood_rate and random.random() < self.flood_rate:
+                raise FloodError(self.retry_after)
+            chat_id = int(params['chat_id'])
+            message_id = next(self._message_ids)
+            self.sent.append(SentMessage(chat_id, params.get('text', ''), time.monotonic(),
+                                         params.get('reply_markup'), message_id))
+            return {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group', 'title': 'fake'},
+                'text': params.get('text', ''),
+            }
+        if name == 'editMessageText':
+            chat_id = int(params['chat_id'])
+            message_id = int(params['message_id'])
+            self.edited.append(SentMessage(chat_id, params.get('text', ''), time.monotonic(),
+                                           params.get('reply_markup'), message_id))
+            return {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group', 'title': 'fake'},
+                'text': params.get('text', ''),
+            }
+        if name == 'sendDocument':
+            chat_id = int(params['chat_id'])
+            file_name, content = params['document']
+            self.documents.append(SentDocument(chat_id, file_name, content))
+            return {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group', 'title': 'fake'},
+                'document': {'file_id': f'sent{len(self.documents)}', 'file_unique_id': f'sent{len(self.documents)}',
+                             'file_name': file_name},
+            }
+        if name == 'getFile':
+            file_id = params['file_id']
+            return {'file_id': file_id, 'file_unique_id': file_id,
+                    'file_size': len(self.files[file_id]), 'file_path': f'documents/{file_id}'}
+        if name == 'setWebhook':
+            self.webhook_url = params.get('url')
+            self.webhook_secret = params.get('secret_token')
+            return True
+        if name == 'deleteWebhook':
+            self.webhook_url = None
+            return True
+        if name == 'getUpdates':
+            # Updates before `offset` have been confirmed by the bot
+            offset = int(params.get('offset') or 0)
+            self.pending_updates = [update for update in self.pending_updates if update['update_id'] >= offset]
+            return self.pending_updates[:int(params.get('limit') or 100)]
+        return True
+
+    # --- HTTP plumbing ---------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, payload = await self._dispatch(target, headers.get('content-type', ''), body)
+                is_file = isinstance(payload, bytes)
+                data = payload if is_file else json.dumps(payload).encode()
+                content_type = 'application/octet-stream' if is_file else 'application/json'
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, target: str, content_type: str, body: bytes):
+        path = urlparse(target).path
+        if path.startswith('/file/'):
+            content = self.files.get(path.rsplit('/', 1)[-1])
+            return ('200 OK', content) if content is not None else ('404 Not Found', {'ok': False})
+        method = path.rsplit('/', 1)[-1]
+        params = _parse_params(content_type, body)
+        if method == 'getUpdates' and not self.pending_updates:
+            # Stand-in for long polling, so an idle bot does not spin
+            await asyncio.sleep(min(float(params.get('timeout') or 0), 0.1))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        try:
+            return '200 OK', {'ok': True, 'result': self._method(method, params)}
+        except FloodError as e:
+            return '429 Too Many Requests', {
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {e.retry_after}',
+                'parameters': {'retry_after': e.retry_after},
+            }
+
+    # --- Driving the bot -------------------------------------------------
+
+    def make_update(self, text: str, user_id: int, chat_id: int) -> dict:
+        """Build a message update the way Telegram delivers a command"""
+        command = text.split()[0] if text.startswith('/') else None
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id == user_id else 'group', 'title': 'fake'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+            'text': text,
+        }
+        if command:
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        return {'update_id': next(self._update_ids), 'message': message}
+
+    def make_document_update(self, file_name: str, content: bytes, user_id: int, chat_id: int,
+                             caption: str = None, mime_type: str = None) -> dict:
+        """Build an update carrying an uploaded document, stored for getFile"""
+        file_id = f'file{len(self.files) + 1}'
+        self.files[file_id] = content
+        update = self.make_update(caption or '', user_id, chat_id)
+        message = update['message']
+        del message['text']
+        message.pop('entities', None)
+        if caption:
+            message['caption'] = caption
+            if caption.startswith('/'):
+                message['caption_entities'] = [
+                    {'type': 'bot_command', 'offset': 0, 'length': len(caption.split()[0])}
+                ]
+        message['document'] = {'file_id': file_id, 'file_unique_id': file_id, 'file_name': file_name,
+                               'file_size': len(content), 'mime_type': mime_type or 'application/octet-stream'}
+        return update
+
+    def make_callback_update(self, data: str, message: SentMessage, user_id: int) -> dict:
+        """Build the update Telegram sends when an inline button under `message` is pressed"""
+        chat_id = message.chat_id
+        return {
+            'update_id': next(self._update_ids),
+            'callback_query': {
+                'id': str(next(self._update_ids)),
+                'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+                'chat_instance': str(chat_id),
+                'data': data,
+                'message': {
+                    'message_id': message.message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private' if chat_id == user_id else 'group', 'title': 'fake'},
+                    'from': {'id': 1, 'is_bot': True, 'first_name': 'Fake'},
+                    'text': message.text,
+                },
+            },
+        }
+
+    def queue_update(self, update: dict):
+        """Deliver an update to a long-polling bot on its next getUpdates"""
+        self.pending_updates.append(update)
+
+    async def post_update(self, update: dict, url: str = None, secret: str = None) -> int:
+        """POST an update to the bot's webhook and return the HTTP status"""
+        parsed = urlparse(url or self.webhook_url)
+        secret = self.webhook_secret if secret is None else secret
+        data = json.dumps(update).encode()
+        reader, writer = await asyncio.open_connection(parsed.hostname, parsed.port or 80)
+        headers = f"POST {parsed.path or '/'} HTTP/1.1\r\nHost: {parsed.netloc}\r\n" \
+                  f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n"
+        if secret:
+            headers += f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+        writer.write(headers.encode() + b"\r\n" + data)
+        await writer.drain()
+        status_line = await reader.readline()
+        writer.close()
+        return int(status_line.split()[1])
+
+
+class FloodError(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+def _parse_params(content_type: str, body: bytes) -> dict:
+    if not body:
+        return {}
+    if 'application/json' in content_type:
+        return json.loads(body)
+    if 'multipart/form-data' in content_type:
+        boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+        params = {}
+        for part in body.split(b'--' + boundary):
+            head, _, value = part.partition(b'\r\n\r\n')
+            if b'name="' not in head:
+                continue
+            name = head.split(b'name="', 1)[1].split(b'"', 1)[0].decode()
+            value = value[:-2] if value.endswith(b'\r\n') else value
+            if b'filename="' in head:
+                params[name] = (head.split(b'filename="', 1)[1].split(b'"', 1)[0].decode(), value)
+            else:
+                params[name] = _decode_value(value.decode())
+        return params
+    return {name: _decode_value(value) for name, value in parse_qsl(body.decode())}
+
+
+def _decode_value(value: str):
+    # python-telegram-bot JSON-encodes non-string parameters
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
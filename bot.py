@@ -1,10 +1,44 @@
+import asyncio
+import csv
+import io
+import json
 import logging
+import os
 import re
+import tempfile
+import time as perf_time
 from datetime import datetime, timedelta, time
+from functools import partial
+from typing import List, Optional, Tuple
+
+# Cold-start timing includes the imports below
+IMPORT_STARTED = perf_time.perf_counter()
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
-from database import Database
-from config import BOT_TOKEN
+from telegram.ext import Application, ApplicationHandlerStop, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters
+from telegram.error import BadRequest
+from app import AppContext
+from database import PageCursor
+from dispatcher import NotificationDispatcher
+from outbox import OutboxWorker
+from scheduler import ReminderScheduler
+from archiver import Archiver
+from sharding import ChatOrderedUpdateProcessor, Supervisor
+from cache import ListCache, LocalBackend
+from ratelimit import CommandLimiter
+from rendering import Renderer
+from exam_files import CSV, ICS, ExamReader, detect_format, write_exams
+from metrics import MetricsServer, configure as configure_metrics, observe_handler, register_gauge
+from config import (
+    require_bot_token, NOTIFY_GLOBAL_RATE, NOTIFY_CHAT_RATE, NOTIFY_CONCURRENCY, NOTIFY_MAX_RETRIES, NOTIFY_DIGEST,
+    OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS, REMINDER_MAX_LATENESS_SECONDS,
+    SCHEDULER_HORIZON_SECONDS, SCHEDULER_REFRESH_SECONDS, LIST_CACHE_TTL, LIST_CACHE_SIZE, CACHE_REDIS_URL,
+    LIST_WINDOW_DAYS, LIST_PAGE_SIZE, ARCHIVE_AFTER_DAYS, ARCHIVE_TIME, ARCHIVE_BATCH_SIZE, ARCHIVE_BATCH_PAUSE,
+    ARCHIVE_GUARD_MINUTES, ARCHIVE_FILE, COMMAND_USER_RATE, COMMAND_USER_BURST, COMMAND_CHAT_RATE,
+    COMMAND_CHAT_BURST, LIST_COALESCE_SECONDS, RATE_LIMIT_SIZE, DEFAULT_LOCALE,
+    CONCURRENT_UPDATES, TELEGRAM_BASE_URL, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH,
+    WEBHOOK_SECRET, METRICS_PORT, METRICS_HOST, TRACE_UPDATES, IMPORT_MAX_BYTES, WORKERS
+)
 
 # Set up logging
 logging.basicConfig(
@@ -13,68 +47,144 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize database
-db = Database()
+# The commands build_application registers
+COMMANDS = ('start', 'help', 'add', 'list', 'remove', 'import', 'export', 'lang')
 
 class ExamBot:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, app: AppContext = None):
+        # One data layer per process; the schema is checked in app.startup()
+        self.app = app or AppContext()
+        self.db = self.app.db
+        self.renderer = Renderer(DEFAULT_LOCALE)
+        self.outbox = OutboxWorker(
+            self.db,
+            dispatcher_factory=partial(
+                NotificationDispatcher,
+                # Sharded workers split Telegram's global limit between them
+                global_rate=NOTIFY_GLOBAL_RATE / self.app.partition[1],
+                chat_rate=NOTIFY_CHAT_RATE,
+                concurrency=NOTIFY_CONCURRENCY,
+                max_retries=NOTIFY_MAX_RETRIES
+            ),
+            format_message=self.renderer.reminder,
+            batch_size=OUTBOX_BATCH_SIZE,
+            lease_seconds=OUTBOX_LEASE_SECONDS,
+            max_attempts=OUTBOX_MAX_ATTEMPTS,
+            max_lateness_seconds=REMINDER_MAX_LATENESS_SECONDS,
+            format_digest=self.renderer.digest if NOTIFY_DIGEST else None,
+            chat_rate=NOTIFY_CHAT_RATE
+        )
+        self.scheduler = None
+        self.archiver = Archiver(
+            self.db,
+            archive_after_days=ARCHIVE_AFTER_DAYS,
+            batch_size=ARCHIVE_BATCH_SIZE,
+            pause_seconds=ARCHIVE_BATCH_PAUSE,
+            run_at=time.fromisoformat(ARCHIVE_TIME),
+            guard_minutes=ARCHIVE_GUARD_MINUTES,
+            path=ARCHIVE_FILE
+        ) if ARCHIVE_AFTER_DAYS and self.app.partition[0] == 0 else None  # sharded: worker 0 only
+        self.list_cache = ListCache(
+            ttl=LIST_CACHE_TTL,
+            max_entries=LIST_CACHE_SIZE,
+            redis_url=CACHE_REDIS_URL
+        )
+        # chat_id -> locale chosen with /lang ('' for none), kept as long as a cached list
+        self.chat_locales = LocalBackend(LIST_CACHE_SIZE)
+        self.limiter = CommandLimiter(
+            user_rate=COMMAND_USER_RATE,
+            user_burst=COMMAND_USER_BURST,
+            chat_rate=COMMAND_CHAT_RATE,
+            chat_burst=COMMAND_CHAT_BURST,
+            coalesce_seconds=LIST_COALESCE_SECONDS,
+            max_entries=RATE_LIMIT_SIZE,
+            commands=COMMANDS
+        )
+        configure_metrics(enabled=bool(METRICS_PORT), tracing=TRACE_UPDATES)
+        # Sharded workers serve metrics on consecutive ports, one per partition
+        metrics_port = METRICS_PORT + self.app.partition[0] if METRICS_PORT else 0
+        self.metrics_server = MetricsServer(METRICS_HOST, metrics_port) if metrics_port else None
+        self.register_metrics()
     
+    def register_metrics(self):
+        """Expose pool and cache counters, read at scrape time."""
+        pool_stats = self.db.pool_stats
+        register_gauge('exam_bot_db_pool_checkouts_total', 'Connections handed out by the pool',
+                       lambda: {(): pool_stats()['checkouts']}, kind='counter')
+        register_gauge('exam_bot_db_pool_waits_total', 'Checkouts that had to wait for a free connection',
+                       lambda: {(): pool_stats()['waits']}, kind='counter')
+        register_gauge('exam_bot_db_pool_wait_seconds_total', 'Time spent waiting for a free connection',
+                       lambda: {(): pool_stats()['wait_time']}, kind='counter')
+        register_gauge('exam_bot_db_pool_connections', 'Open pooled connections by state',
+                       lambda: {('open',): pool_stats()['size'], ('idle',): pool_stats()['idle']}, ['state'])
+        register_gauge('exam_bot_list_cache_total', 'List cache hits, misses, invalidations and evictions',
+                       lambda: {(name,): value for name, value in self.list_cache.metrics().items()
+                                if name != 'hit_rate'}, ['event'], kind='counter')
+        register_gauge('exam_bot_commands_throttled_total', 'Commands dropped by the rate limiter',
+                       lambda: self.limiter.metrics()['throttled'], ['command', 'limit'], kind='counter')
+        register_gauge('exam_bot_list_coalesced_total', 'Repeated /list requests answered by an earlier reply',
+                       lambda: {(): self.limiter.metrics()['coalesced']}, kind='counter')
+        register_gauge('exam_bot_rate_limit_entries', 'Users, chats and /list keys tracked by the rate limiter',
+                       lambda: {(): self.limiter.metrics()['entries']})
+        register_gauge('exam_bot_startup_seconds', 'Cold start and startup phase durations',
+                       lambda: {(phase,): seconds for phase, seconds in self.app.timings.items()}, ['phase'])
+    
+    async def throttle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Drop commands from users and chats over their rate limit (runs before the command handlers)."""
+        message = update.effective_message
+        command, _, username = (message.text or message.caption or '').split(maxsplit=1)[0].lstrip('/').partition('@')
+        # /list@otherbot in a group is another bot's command: it costs this bot no tokens
+        if username and username.lower() != (context.bot.username or '').lower():
+            return
+        bucket = self.limiter.check(command, update.effective_user.id, update.effective_chat.id)
+        if bucket is None:
+            return
+        
+        # Say so once; further commands are dropped silently until one is allowed again
+        if not bucket.warned:
+            bucket.warned = True
+            # Only an already known locale, so a flood causes no lookups
+            locale = self.chat_locales.get(str(update.effective_chat.id)) or None
+            await message.reply_text(self.renderer.catalog(locale).throttled())
+        raise ApplicationHandlerStop
+    
+    def invalidate_list(self, chat_id: int, user_id: int, is_group: bool):
+        """Forget the cached and recently sent /list the chat's exams appear in."""
+        self.list_cache.invalidate(chat_id, user_id, is_group)
+        scope = ListCache.GROUP if is_group else ListCache.PERSONAL
+        self.limiter.forget(ListCache.key(chat_id, user_id, scope))
+    
+    async def locale(self, chat_id: int) -> Optional[str]:
+        """The locale the chat chose with /lang, or None for the default."""
+        locale = self.chat_locales.get(str(chat_id))
+        if locale is None:
+            locale = await self.db.get_chat_locale(chat_id) or ''
+            self.chat_locales.set(str(chat_id), locale, LIST_CACHE_TTL)
+        return locale or None
+    
+    @observe_handler('start')
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send a message when the command /start is issued."""
-        welcome_message = """
-🎓 مرحباً بك في بوت التذكيرات!
-
-📋 الأوامر:
-• /add التاريخ العنوان الوصف
-• /list عرض المواعيد  
-• /remove رقم حذف موعد
-• /help المساعدة
-
-💡 مثال: /add 2024-03-15 امتحان الرياضيات
-
-🔔 سيرسل لك تذكير قبل يوم واحد من كل موعد
-        """
-        await update.message.reply_text(welcome_message)
+        t = self.renderer.catalog(await self.locale(update.effective_chat.id))
+        await update.message.reply_text(t.welcome())
     
+    @observe_handler('help')
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send help information."""
-        help_text = """
-📚 دليل الاستخدام
-
-🎯 إضافة موعد:
-/add التاريخ العنوان الوصف
-
-📅 عرض المواعيد:
-/list
-
-🗑️ حذف موعد:
-/remove رقم الموعد
-
-💡 أمثلة:
-• /add 2024-03-15 امتحان الرياضيات
-• /add 2024-03-20 موعد طبيب
-• /remove 1
-
-🔔 البوت يذكرك قبل يوم واحد من كل موعد
-        """
-        await update.message.reply_text(help_text)
+        t = self.renderer.catalog(await self.locale(update.effective_chat.id))
+        await update.message.reply_text(t.help())
     
+    @observe_handler('add')
     async def add(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Add a new event."""
         user_id = update.effective_user.id
         chat_id = update.effective_chat.id
+        locale = await self.locale(chat_id)
+        t = self.renderer.catalog(locale)
         
         # Parse command arguments
         if not context.args or len(context.args) < 2:
-            await update.message.reply_text(
-                "❌ خطأ في الاستخدام!\n\n"
-                "📝 الطريقة الصحيحة:\n"
-                "/add التاريخ العنوان الوصف\n\n"
-                "💡 أمثلة:\n"
-                "• /add 2024-03-15 امتحان الرياضيات\n"
-                "• /add 2024-03-20 موعد طبيب"
-            )
+            await update.message.reply_text(t.add_usage())
             return
         
         # Extract date, title, and description
@@ -86,24 +196,17 @@ class ExamBot:
         try:
             event_date = datetime.strptime(date_str, '%Y-%m-%d').date()
             if event_date < datetime.now().date():
-                await update.message.reply_text(
-                    "❌ لا يمكن إضافة مواعيد في الماضي!\n"
-                    "💡 استخدم تاريخ اليوم أو مستقبلي"
-                )
+                await update.message.reply_text(t.add_past_date())
                 return
         except ValueError:
-            await update.message.reply_text(
-                "❌ تنسيق التاريخ غير صحيح!\n"
-                "💡 استخدم: YYYY-MM-DD\n"
-                "مثال: 2024-03-15"
-            )
+            await update.message.reply_text(t.add_bad_date())
             return
         
         # Determine if this is a group event (if in a group chat)
         is_group_event = chat_id != user_id
         
         # Add event to database
-        event_id = self.db.add_exam(
+        event_id = await self.db.add_exam(
             user_id=user_id,
             chat_id=chat_id,
             exam_date=date_str,
@@ -112,155 +215,337 @@ class ExamBot:
             is_group_exam=is_group_event
         )
         
-        # Send confirmation
-        scope = "مجموعة" if is_group_event else "شخصي"
-        scope_emoji = "👥" if is_group_event else "👤"
+        self.invalidate_list(chat_id, user_id, is_group_event)
+        if self.scheduler:
+            self.scheduler.schedule_exam(date_str, chat_id)
         
-        message = f"✅ تم إضافة الموعد بنجاح!\n\n"
-        message += f"📅 التاريخ: {date_str}\n"
-        message += f"📝 العنوان: {title}\n"
-        if description:
-            message += f"📄 الوصف: {description}\n"
-        message += f"🆔 الرقم: {event_id}\n"
-        message += f"{scope_emoji} النطاق: {scope}\n\n"
-        message += f"💡 استخدم /list لرؤية جميع مواعيدك"
-        
-        await update.message.reply_text(message)
+        await update.message.reply_text(
+            self.renderer.added(locale, event_id, date_str, title, description, is_group_event)
+        )
     
+    @observe_handler('list')
     async def list(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """List upcoming events."""
+        """List upcoming events, one page at a time."""
         user_id = update.effective_user.id
         chat_id = update.effective_chat.id
         
         # Check if this is a group chat
         is_group = chat_id != user_id
+        scope = ListCache.GROUP if is_group else ListCache.PERSONAL
         
+        # The same list was just sent to this chat; one reply answers both requests
+        if self.limiter.coalesce(ListCache.key(chat_id, user_id, scope)):
+            return
+        
+        # Only the first page is cached; later pages are fetched when a button is pressed
+        cached = self.list_cache.get(chat_id, user_id, scope)
+        if cached is None:
+            message, buttons = await self.render_list(user_id, chat_id, is_group, await self.locale(chat_id))
+            self.list_cache.set(chat_id, user_id, scope, json.dumps([message, buttons]))
+        else:
+            message, buttons = json.loads(cached)
+        
+        await update.message.reply_text(message, reply_markup=self.list_keyboard(buttons))
+    
+    @observe_handler('list_page')
+    async def list_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show the next or previous /list page (inline button callback)."""
+        query = update.callback_query
+        await query.answer()
+        
+        # list:<n|p>:<offset>:<exam_date>:<exam_id>, see render_list
+        try:
+            _, direction, offset, exam_date, exam_id = query.data.split(':')
+            cursor = (exam_date, int(exam_id))
+            offset = int(offset)
+        except ValueError:
+            return
+        
+        user_id = update.effective_user.id
+        chat_id = update.effective_chat.id
+        message, buttons = await self.render_list(
+            user_id, chat_id, chat_id != user_id, await self.locale(chat_id),
+            after=cursor if direction == 'n' else None,
+            before=cursor if direction == 'p' else None,
+            offset=offset
+        )
+        try:
+            await query.edit_message_text(message, reply_markup=self.list_keyboard(buttons))
+        except BadRequest as e:
+            # Pressing a button twice renders the same page again
+            if 'not modified' not in str(e).lower():
+                raise
+    
+    @staticmethod
+    def list_keyboard(buttons) -> Optional[InlineKeyboardMarkup]:
+        if not buttons:
+            return None
+        return InlineKeyboardMarkup([[InlineKeyboardButton(label, callback_data=data) for label, data in buttons]])
+    
+    async def render_list(self, user_id: int, chat_id: int, is_group: bool, locale: Optional[str] = None,
+                          after: PageCursor = None, before: PageCursor = None,
+                          offset: int = 0) -> Tuple[str, List[Tuple[str, str]]]:
+        """Build one page of the /list reply and its Prev/Next buttons.
+        
+        Only exams from today to LIST_WINDOW_DAYS ahead are shown, LIST_PAGE_SIZE
+        at a time. Pages are keyset-paginated on (exam_date, id): a button
+        carries the cursor of the page's last (Next) or first (Prev) exam and
+        the position the new page starts at, for numbering.
+        """
+        today = datetime.now().date()
+        from_date = today.isoformat()
+        until_date = (today + timedelta(days=LIST_WINDOW_DAYS)).isoformat() if LIST_WINDOW_DAYS else '9999-12-31'
+        
+        # One extra row tells whether there is another page in that direction
         if is_group:
             # In group: show only group events
-            group_events = self.db.get_exams_for_group(chat_id)
-            
-            if not group_events:
-                await update.message.reply_text(
-                    "📅 لا توجد مواعيد قادمة في المجموعة!\n"
-                    "💡 استخدم /add لإضافة موعد جديد"
-                )
-                return
-            
-            message = "👥 مواعيد المجموعة:\n\n"
-            for i, event in enumerate(group_events, 1):
-                message += f"🎯 {i}. {event['title']}\n"
-                message += f"📅 {event['exam_date']}\n"
-                if event['description']:
-                    message += f"📝 {event['description']}\n"
-                message += "\n\n"
+            events = await self.db.get_upcoming_exams_for_group(
+                chat_id, from_date, until_date, after=after, before=before, limit=LIST_PAGE_SIZE + 1
+            )
         else:
             # In private chat: show only personal events
-            personal_events = self.db.get_exams_for_user(user_id, chat_id)
-            
-            if not personal_events:
-                await update.message.reply_text(
-                    "📅 لا توجد مواعيد قادمة!\n"
-                    "💡 استخدم /add لإضافة موعدك الأول"
-                )
-                return
-            
-            message = "👤 مواعيدك الشخصية:\n\n"
-            for i, event in enumerate(personal_events, 1):
-                message += f"🎯 {i}. {event['title']}\n"
-                message += f"📅 {event['exam_date']}\n"
-                if event['description']:
-                    message += f"📝 {event['description']}\n"
-                message += "\n\n"
+            events = await self.db.get_upcoming_exams_for_user(
+                user_id, chat_id, from_date, until_date, after=after, before=before, limit=LIST_PAGE_SIZE + 1
+            )
         
-        message += "💡 استخدم /remove <رقم> لحذف موعد"
+        if not events and (after or before):
+            # The page's exams were removed meanwhile; start over
+            return await self.render_list(user_id, chat_id, is_group, locale)
+        if not events:
+            return self.renderer.list_page(locale, events, is_group), []
+        
+        more = len(events) > LIST_PAGE_SIZE
+        if before:
+            events = events[-LIST_PAGE_SIZE:]
+            has_prev, has_next = more, True
+            offset = max(offset, 0) if more else 0
+        else:
+            events = events[:LIST_PAGE_SIZE]
+            has_prev, has_next = after is not None, more
         
-        await update.message.reply_text(message)
+        message = self.renderer.list_page(locale, events, is_group, offset, paged=has_prev or has_next)
+        
+        t = self.renderer.catalog(locale)
+        buttons = []
+        if has_prev:
+            first = events[0]
+            buttons.append((t.list_prev(), f"list:p:{max(offset - LIST_PAGE_SIZE, 0)}:{first.exam_date}:{first.id}"))
+        if has_next:
+            last = events[-1]
+            buttons.append((t.list_next(), f"list:n:{offset + len(events)}:{last.exam_date}:{last.id}"))
+        return message, buttons
     
+    @observe_handler('remove')
     async def remove(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Remove an event by ID."""
         user_id = update.effective_user.id
+        t = self.renderer.catalog(await self.locale(update.effective_chat.id))
         
         if not context.args:
-            await update.message.reply_text(
-                "❌ خطأ في الاستخدام!\n"
-                "💡 مثال: /remove 1\n"
-                "🔍 استخدم /list لرؤية أرقام المواعيد"
-            )
+            await update.message.reply_text(t.remove_usage())
             return
         
         try:
             event_id = int(context.args[0])
         except ValueError:
-            await update.message.reply_text(
-                "❌ رقم الموعد غير صحيح!\n"
-                "💡 مثال: /remove 1"
-            )
+            await update.message.reply_text(t.remove_bad_id())
             return
         
         # Check if event exists and user owns it
-        event = self.db.get_exam_by_id(event_id)
+        event = await self.db.get_exam_by_id(event_id)
         if not event:
-            await update.message.reply_text(
-                "❌ لم يتم العثور على الموعد!\n"
-                "💡 استخدم /list لرؤية المواعيد المتاحة"
-            )
+            await update.message.reply_text(t.remove_not_found())
             return
         
-        if event['user_id'] != user_id:
-            await update.message.reply_text(
-                "❌ لا يمكنك حذف مواعيد الآخرين!\n"
-                "👤 يمكنك حذف مواعيدك فقط"
-            )
+        if event.user_id != user_id:
+            await update.message.reply_text(t.remove_not_owner())
             return
         
         # Remove event
-        if self.db.remove_exam(event_id, user_id):
-            await update.message.reply_text(
-                f"✅ تم حذف الموعد بنجاح!\n\n"
-                f"📝 العنوان: {event['title']}\n"
-                f"📅 التاريخ: {event['exam_date']}\n\n"
-                f"💡 استخدم /list لرؤية المواعيد المتبقية"
-            )
+        if await self.db.remove_exam(event_id, user_id):
+            self.invalidate_list(event.chat_id, user_id, event.is_group_exam)
+            await update.message.reply_text(t.removed(title=event.title, exam_date=event.exam_date))
         else:
-            await update.message.reply_text(
-                "❌ فشل في حذف الموعد!\n"
-                "🔄 حاول مرة أخرى"
-            )
+            await update.message.reply_text(t.remove_failed())
     
-    async def send_notifications(self, context: ContextTypes.DEFAULT_TYPE):
-        """Send notifications for events happening tomorrow."""
-        events = self.db.get_exams_for_notification(days_ahead=1)
+    @observe_handler('import')
+    async def import_exams(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Add every exam from an uploaded CSV or ICS file."""
+        message = update.effective_message
+        user_id = update.effective_user.id
+        chat_id = update.effective_chat.id
+        t = self.renderer.catalog(await self.locale(chat_id))
         
-        for event in events:
+        # The file is either sent with /import as its caption or replied to with /import
+        document = message.document or (message.reply_to_message and message.reply_to_message.document)
+        if not document:
+            await message.reply_text(t.import_usage())
+            return
+        
+        file_format = detect_format(document.file_name, document.mime_type)
+        if not file_format:
+            await message.reply_text(t.import_unsupported())
+            return
+        if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+            await message.reply_text(t.import_too_large(megabytes=IMPORT_MAX_BYTES // (1024 * 1024)))
+            return
+        
+        is_group_event = chat_id != user_id
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"import.{file_format}")
+            telegram_file = await document.get_file()
+            await telegram_file.download_to_drive(path)
+            
+            # Rows are parsed while they are inserted, so the file is never loaded whole
+            started = perf_time.perf_counter()
             try:
-                scope_emoji = "👥" if event['is_group_exam'] else "👤"
-                scope_text = "مجموعة" if event['is_group_exam'] else "شخصي"
-                
-                message = f"🔔 تذكير بالموعد!\n\n"
-                message += f"📅 غداً: {event['exam_date']}\n"
-                message += f"📝 العنوان: {event['title']}\n"
-                if event['description']:
-                    message += f"📄 الوصف: {event['description']}\n"
-                message += f"{scope_emoji} النطاق: {scope_text}\n\n"
-                message += f"🎯 لا تنس الاستعداد للموعد!"
-                
-                await context.bot.send_message(
-                    chat_id=event['chat_id'],
-                    text=message
-                )
-                
-                logger.info(f"Sent notification for event {event['id']} to chat {event['chat_id']}")
-                
-            except Exception as e:
-                logger.error(f"Failed to send notification for event {event['id']}: {e}")
+                with open(path, encoding='utf-8-sig', newline='') as stream:
+                    reader = ExamReader(stream, file_format)
+                    added = await self.db.add_exams_bulk(user_id, chat_id, reader, is_group_exam=is_group_event)
+            except UnicodeDecodeError:
+                await message.reply_text(t.import_bad_encoding())
+                return
+            except csv.Error as e:
+                logger.info(f"Rejected import into chat {chat_id}: {e}")
+                await message.reply_text(t.import_bad_csv())
+                return
+            elapsed = perf_time.perf_counter() - started
+        
+        rate = added / elapsed if elapsed else 0.0
+        logger.info(f"Imported {added} exams ({reader.skipped} skipped) into chat {chat_id} "
+                    f"in {elapsed:.2f}s ({rate:.0f} rows/s)")
+        if added:
+            self.invalidate_list(chat_id, user_id, is_group_event)
+            if self.scheduler:
+                await self.scheduler.refresh()
+        
+        reply = t.imported(added=added, elapsed=elapsed, rate=rate)
+        if reader.skipped:
+            reply += t.import_skipped(skipped=reader.skipped)
+        await message.reply_text(reply)
+    
+    @observe_handler('export')
+    async def export_exams(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Send the chat's exams as a CSV or ICS file."""
+        user_id = update.effective_user.id
+        chat_id = update.effective_chat.id
+        t = self.renderer.catalog(await self.locale(chat_id))
+        
+        file_format = context.args[0].lower() if context.args else CSV
+        if file_format not in (CSV, ICS):
+            await update.message.reply_text(t.export_bad_format())
+            return
+        
+        is_group = chat_id != user_id
+        if is_group:
+            events = await self.db.get_exams_for_group(chat_id)
+        else:
+            events = await self.db.get_exams_for_user(user_id, chat_id)
+        if not events:
+            await update.message.reply_text(t.export_empty())
+            return
+        
+        data = write_exams(events, file_format).getvalue().encode('utf-8')
+        await update.message.reply_document(
+            document=io.BytesIO(data),
+            filename=f"exams.{file_format}",
+            caption=t.export_caption(count=len(events))
+        )
+    
+    @observe_handler('lang')
+    async def lang(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show or set the language of the chat's replies and reminders."""
+        user_id = update.effective_user.id
+        chat_id = update.effective_chat.id
+        locales = self.renderer.locales
+        current = await self.locale(chat_id)
+        t = self.renderer.catalog(current)
+        
+        if not context.args:
+            current = current or self.renderer.default_locale
+            await update.message.reply_text(t.lang_current(locale=current, locales=" | ".join(locales)))
+            return
+        
+        locale = context.args[0].lower()
+        if locale not in locales:
+            await update.message.reply_text(t.lang_unknown(locales=", ".join(locales)))
+            return
+        
+        await self.db.set_chat_locale(chat_id, locale)
+        self.chat_locales.set(str(chat_id), locale, LIST_CACHE_TTL)
+        # The cached list was rendered in the old language
+        self.invalidate_list(chat_id, user_id, chat_id != user_id)
+        await update.message.reply_text(self.renderer.catalog(locale).lang_set())
+    
+    async def send_notifications(self, context: ContextTypes.DEFAULT_TYPE):
+        """Send every reminder that is due."""
+        await self.outbox.run(context.bot)
+    
+    async def start_scheduler(self, application: Application):
+        """Start firing reminders as they come due (post_init hook)."""
+        self.scheduler = ReminderScheduler(
+            self.db,
+            fire=lambda: self.outbox.run(application.bot),
+            policy=self.db.database.reminder_policy,
+            horizon_seconds=SCHEDULER_HORIZON_SECONDS,
+            refresh_seconds=SCHEDULER_REFRESH_SECONDS,
+            max_lateness_seconds=REMINDER_MAX_LATENESS_SECONDS
+        )
+        self.scheduler.start()
+    
+    async def stop_scheduler(self, application: Application):
+        """Stop the reminder scheduler (post_shutdown hook)."""
+        if self.scheduler:
+            await self.scheduler.stop()
+    
+    async def post_init(self, application: Application):
+        """Start the scheduler, the archiver and, if enabled, the metrics endpoint."""
+        # Already done by main(); other callers get the schema checked here
+        await self.app.startup()
+        await self.start_scheduler(application)
+        if self.archiver:
+            self.archiver.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+    
+    async def post_shutdown(self, application: Application):
+        await self.stop_scheduler(application)
+        if self.archiver:
+            await self.archiver.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        # Last, once nothing else writes: flush batched writes, stop the db threads, close the pool
+        await self.app.close()
 
-def main():
-    """Start the bot."""
-    # Create application
-    application = Application.builder().token(BOT_TOKEN).build()
+def application_builder():
+    """ApplicationBuilder with the bot token and Bot API endpoint configured."""
+    builder = Application.builder().token(require_bot_token())
+    if TELEGRAM_BASE_URL:
+        # e.g. a local fake Bot API for load tests
+        builder = builder.base_url(f"{TELEGRAM_BASE_URL.rstrip('/')}/bot")
+        builder = builder.base_file_url(f"{TELEGRAM_BASE_URL.rstrip('/')}/file/bot")
+    return builder
+
+def build_application(exam_bot: ExamBot, updater: bool = True) -> Application:
+    """Create the Application with all handlers registered.
+    
+    Without an updater the Application receives no updates from Telegram
+    itself; a sharded worker is fed them by the supervisor instead.
+    """
+    builder = (
+        application_builder()
+        .concurrent_updates(ChatOrderedUpdateProcessor(CONCURRENT_UPDATES))
+        .post_init(exam_bot.post_init)
+        .post_shutdown(exam_bot.post_shutdown)
+    )
+    if not updater:
+        builder = builder.updater(None)
+    application = builder.build()
     
-    # Create bot instance
-    exam_bot = ExamBot()
+    # Rate limits apply to every command, including /import sent as a document caption
+    application.add_handler(MessageHandler(
+        filters.COMMAND | filters.CaptionRegex(r'^/'), exam_bot.throttle
+    ), group=-1)
     
     # Add command handlers
     application.add_handler(CommandHandler("start", exam_bot.start))
@@ -268,18 +553,58 @@ def main():
     application.add_handler(CommandHandler("add", exam_bot.add))
     application.add_handler(CommandHandler("list", exam_bot.list))
     application.add_handler(CommandHandler("remove", exam_bot.remove))
+    application.add_handler(CommandHandler("import", exam_bot.import_exams))
+    application.add_handler(CommandHandler("export", exam_bot.export_exams))
+    application.add_handler(CommandHandler("lang", exam_bot.lang))
+    application.add_handler(CallbackQueryHandler(exam_bot.list_page, pattern=r'^list:'))
+    # A document sent with /import as its caption
+    application.add_handler(MessageHandler(
+        filters.Document.ALL & filters.CaptionRegex(r'^/import(@\w+)?(\s|$)'), exam_bot.import_exams
+    ))
     
-    # Schedule daily notifications
-    job_queue = application.job_queue
-    job_queue.run_daily(
-        exam_bot.send_notifications,
-        time=time(hour=9, minute=0),  # 9:00 AM daily
-        name="daily_notifications"
+    return application
+
+def webhook_settings() -> dict:
+    """Arguments for run_webhook, or Updater.start_webhook, from the WEBHOOK_* settings."""
+    return dict(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}"
     )
+
+def run_application(application: Application):
+    """Receive updates by webhook or long polling until the process is stopped."""
+    if WEBHOOK_URL:
+        if not WEBHOOK_SECRET:
+            logger.warning("WEBHOOK_SECRET is not set; webhook requests will not be authenticated")
+        logger.info(f"Starting Exam Notification Bot (webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT})...")
+        application.run_webhook(**webhook_settings())
+    else:
+        logger.info("Starting Exam Notification Bot...")
+        application.run_polling()
+
+def main():
+    """Start the bot."""
+    if WORKERS > 1:
+        # One process per chat_id partition, fed by a routing supervisor
+        Supervisor(WORKERS).run()
+        return
+    
+    # Create bot instance; reminders are fired by the scheduler as they come due
+    app = AppContext(started_at=IMPORT_STARTED)
+    exam_bot = ExamBot(app)
+    application = build_application(exam_bot)
+    
+    # Check the schema while the bot connects to Telegram. Application.initialize()
+    # is idempotent, and run_polling/run_webhook carry on in this same event loop.
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(app.startup(network=application.initialize()))
     
     # Start the bot
-    logger.info("Starting Exam Notification Bot...")
-    application.run_polling()
+    run_application(application)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+try:
+    import redis
+except ImportError:  # optional: only needed for a shared cache across replicas
+    redis = None
+
+
+class LocalBackend:
+    """In-process LRU store with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared store so every replica sees the same entries and invalidations"""
+
+    def __init__(self, url: str, prefix: str = 'exam_bot:list:'):
+        if redis is None:
+            raise ImportError("the redis package is required for a shared cache (pip install redis)")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: float):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        stats = asdict(self)
+        stats['hit_rate'] = self.hit_rate
+        return stats
+
+
+class ListCache:
+    """Read-through cache of the rendered first /list page keyed by (chat_id, user_id, scope)"""
+
+    GROUP = 'group'
+    PERSONAL = 'personal'
+
+    def __init__(self, ttl: float = 60, max_entries: int = 10000, redis_url: str = None):
+        self.ttl = ttl
+        self.backend = RedisBackend(redis_url) if redis_url else LocalBackend(max_entries)
+        self.stats = CacheStats()
+
+    @staticmethod
+    def key(chat_id: int, user_id: int, scope: str) -> str:
+        # Group lists are shared by every member, so the user is not part of the key
+        if scope == ListCache.GROUP:
+            user_id = 0
+        return f"{chat_id}:{user_id}:{scope}"
+
+    def get(self, chat_id: int, user_id: int, scope: str) -> Optional[str]:
+        value = self.backend.get(self.key(chat_id, user_id, scope))
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def set(self, chat_id: int, user_id: int, scope: str, message: str):
+        self.backend.set(self.key(chat_id, user_id, scope), message, self.ttl)
+
+    def invalidate(self, chat_id: int, user_id: int, is_group: bool):
+        """Drop the one cached list an added or removed exam appears in"""
+        scope = self.GROUP if is_group else self.PERSONAL
+        self.backend.delete(self.key(chat_id, user_id, scope))
+        self.stats.invalidations += 1
+
+    def metrics(self) -> dict:
+        metrics = self.stats.as_dict()
+        metrics['evictions'] = self.backend.evictions
+        return metrics
@@ -6,5 +6,82 @@ load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///exams.db')
 
-if not BOT_TOKEN:
-    raise ValueError("BOT_TOKEN environment variable is required")
+# Bot API endpoint; override to point the bot at a local fake Bot API
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL') or None
+# Updates processed in parallel (handlers for different chats overlap)
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+
+# Worker processes; above 1 a supervisor routes each chat's updates to the process owning its partition
+WORKERS = int(os.getenv('WORKERS', '1'))
+
+# Webhook mode: used instead of long polling when WEBHOOK_URL is set
+WEBHOOK_URL = os.getenv('WEBHOOK_URL') or None
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or None
+
+# Reminder delivery limits (Telegram allows ~30 msg/s overall and ~1 msg/s per chat)
+NOTIFY_GLOBAL_RATE = float(os.getenv('NOTIFY_GLOBAL_RATE', '30'))
+NOTIFY_CHAT_RATE = float(os.getenv('NOTIFY_CHAT_RATE', '1'))
+NOTIFY_CONCURRENCY = int(os.getenv('NOTIFY_CONCURRENCY', '64'))
+NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', '3'))
+# Send each chat one digest of its due reminders instead of a message per exam
+NOTIFY_DIGEST = os.getenv('NOTIFY_DIGEST', 'false').lower() in ('1', 'true', 'yes')
+
+# Notifications outbox: rows leased per claim, lease length, and delivery attempts per reminder
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '200'))
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '300'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+
+# Reminder scheduling; lead times, anchor time and spread are read by the database layer
+# (REMINDER_LEAD_MINUTES, REMINDER_TIME, REMINDER_SPREAD_MINUTES)
+REMINDER_MAX_LATENESS_SECONDS = int(os.getenv('REMINDER_MAX_LATENESS_SECONDS', '43200'))
+SCHEDULER_HORIZON_SECONDS = int(os.getenv('SCHEDULER_HORIZON_SECONDS', '600'))
+SCHEDULER_REFRESH_SECONDS = int(os.getenv('SCHEDULER_REFRESH_SECONDS', '60'))
+
+# Rendered /list replies; set CACHE_REDIS_URL to share the cache between replicas
+LIST_CACHE_TTL = float(os.getenv('LIST_CACHE_TTL', '60'))
+LIST_CACHE_SIZE = int(os.getenv('LIST_CACHE_SIZE', '10000'))
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL') or None
+
+# Language of replies and reminders in chats that did not choose one with /lang (ar, en)
+DEFAULT_LOCALE = os.getenv('DEFAULT_LOCALE', 'ar')
+
+# /list shows exams from today up to LIST_WINDOW_DAYS ahead (0 = no limit), LIST_PAGE_SIZE per page
+LIST_WINDOW_DAYS = int(os.getenv('LIST_WINDOW_DAYS', '365'))
+LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', '10'))
+
+# Archive exams dated more than ARCHIVE_AFTER_DAYS ago (0 = keep everything), daily at ARCHIVE_TIME,
+# into the exams_archive table or, when ARCHIVE_FILE is set, a gzip-compressed JSON Lines file
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+ARCHIVE_TIME = os.getenv('ARCHIVE_TIME', '03:00')
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '1000'))
+ARCHIVE_BATCH_PAUSE = float(os.getenv('ARCHIVE_BATCH_PAUSE', '0.5'))
+ARCHIVE_GUARD_MINUTES = int(os.getenv('ARCHIVE_GUARD_MINUTES', '15'))
+ARCHIVE_FILE = os.getenv('ARCHIVE_FILE') or None
+
+# Command rate limits: tokens per second and burst size per user and per chat (rate 0 = no limit);
+# repeated /list requests within LIST_COALESCE_SECONDS get one reply
+COMMAND_USER_RATE = float(os.getenv('COMMAND_USER_RATE', '0.5'))
+COMMAND_USER_BURST = float(os.getenv('COMMAND_USER_BURST', '5'))
+COMMAND_CHAT_RATE = float(os.getenv('COMMAND_CHAT_RATE', '1'))
+COMMAND_CHAT_BURST = float(os.getenv('COMMAND_CHAT_BURST', '10'))
+LIST_COALESCE_SECONDS = float(os.getenv('LIST_COALESCE_SECONDS', '2'))
+RATE_LIMIT_SIZE = int(os.getenv('RATE_LIMIT_SIZE', '10000'))
+
+# Largest /import upload accepted (bots can download files up to 20 MB)
+IMPORT_MAX_BYTES = int(os.getenv('IMPORT_MAX_BYTES', str(20 * 1024 * 1024)))
+
+# Prometheus metrics on http://METRICS_HOST:METRICS_PORT/metrics (disabled when the port is 0)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# Per-update tracing spans (OpenTelemetry when installed, otherwise logged)
+TRACE_UPDATES = os.getenv('TRACE_UPDATES', 'false').lower() in ('1', 'true', 'yes')
+
+
+def require_bot_token() -> str:
+    """Return BOT_TOKEN; checked when the bot is built, so importing config never fails"""
+    if not BOT_TOKEN:
+        raise ValueError("BOT_TOKEN environment variable is required")
+    return BOT_TOKEN
@@ -1,248 +1,648 @@
-import pymysql
 import os
-from datetime import datetime
-from typing import List, Dict, Optional
-from urllib.parse import urlparse
+import itertools
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
+from dialects import CHAT_PARTITION, CLAIMABLE_NOTIFICATIONS, get_dialect
+from migrations import current_version, run_migrations
+from scheduler import DATETIME_FORMAT, ReminderPolicy
+from metrics import observe_query
+from models import Exam, Notification
+
+
+class RowMapper:
+    """Turn result rows into `record_type` instances, with flag columns as bool.
+
+    Queries select the record's fields in declaration order. SQLite and
+    MySQL return flags as 0 or 1, so those columns are converted.
+    """
+
+    def __init__(self, record_type, flags: Tuple[str, ...] = ('is_group_exam',)):
+        self.make = record_type._make
+        self.flags = tuple(index for index, field in enumerate(record_type._fields) if field in flags)
+
+    def __call__(self, row):
+        return self.all((row,))[0]
+
+    def all(self, rows) -> list:
+        make, flags = self.make, self.flags
+        records = []
+        for row in rows:
+            row = list(row)
+            for index in flags:
+                row[index] = bool(row[index])
+            records.append(make(row))
+        return records
+
+
+EXAM = RowMapper(Exam)
+NOTIFICATION = RowMapper(Notification)
+EXAM_COLUMNS = ', '.join(Exam._fields)
+
+# (exam_date, id) of the exam a /list page starts or ends at
+PageCursor = Tuple[str, int]
+# Sorts after every exam id (exams.id is a 32-bit column)
+MAX_ID = 2 ** 31 - 1
+
+# Written once with ? placeholders; each dialect compiles them to its own paramstyle.
+# Every exam query selects EXAM_COLUMNS so rows map straight onto Exam.
+STATEMENTS = {
+    'insert_exam': '''
+        INSERT INTO exams (user_id, chat_id, exam_date, title, description, is_group_exam)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    'insert_notification': '''
+        INSERT INTO notifications (exam_id, chat_id, remind_date, due_at, lead_minutes)
+        VALUES (?, ?, ?, ?, ?)
+    ''',
+    'exams_for_user': f'''
+        SELECT {EXAM_COLUMNS}
+        FROM exams
+        WHERE user_id = ? AND chat_id = ?
+        ORDER BY exam_date ASC
+    ''',
+    'exams_for_group': f'''
+        SELECT {EXAM_COLUMNS}
+        FROM exams
+        WHERE chat_id = ? AND is_group_exam = TRUE
+        ORDER BY exam_date ASC
+    ''',
+    # Keyset pages of upcoming exams, ordered by (exam_date, id). With the cursor
+    # date as the range bound, "after the cursor" reduces to date > d OR id > i.
+    'upcoming_for_user_after': f'''
+        SELECT {EXAM_COLUMNS}
+        FROM exams
+        WHERE user_id = ? AND chat_id = ? AND exam_date >= ? AND exam_date <= ?
+          AND (exam_date > ? OR id > ?)
+        ORDER BY exam_date ASC, id ASC
+        LIMIT ?
+    ''',
+    'upcoming_for_user_before': f'''
+        SELECT {EXAM_COLUMNS}
+        FROM exams
+        WHERE user_id = ? AND chat_id = ? AND exam_date <= ? AND exam_date >= ?
+          AND (exam_date < ? OR id < ?)
+        ORDER BY exam_date DESC, id DESC
+        LIMIT ?
+    ''',
+    'upcoming_for_group_after': f'''
+        SELECT {EXAM_COLUMNS}
+        FROM exams
+        WHERE chat_id = ? AND is_group_exam = TRUE AND exam_date >= ? AND exam_date <= ?
+          AND (exam_date > ? OR id > ?)
+        ORDER BY exam_date ASC, id ASC
+        LIMIT ?
+    ''',
+    'upcoming_for_group_before': f'''
+        SELECT {EXAM_COLUMNS}
+        FROM exams
+        WHERE chat_id = ? AND is_group_exam = TRUE AND exam_date <= ? AND exam_date >= ?
+          AND (exam_date < ? OR id < ?)
+        ORDER BY exam_date DESC, id DESC
+        LIMIT ?
+    ''',
+    'exams_on_date': f'''
+        SELECT {EXAM_COLUMNS}
+        FROM exams
+        WHERE exam_date = ?
+    ''',
+    # One row per chat and exam date: exams, characters of title and
+    # description, and how many have a description, for plan_reminders.py
+    'reminder_load': '''
+        SELECT chat_id, exam_date, COUNT(*),
+               SUM(LENGTH(title) + LENGTH(COALESCE(description, ''))),
+               SUM(CASE WHEN description <> '' THEN 1 ELSE 0 END)
+        FROM exams
+        WHERE exam_date >= ? AND exam_date <= ?
+        GROUP BY chat_id, exam_date
+    ''',
+    'notification_batch': f'''
+        SELECT {EXAM_COLUMNS}
+        FROM exams
+        WHERE exam_date = ? AND id > ?
+        ORDER BY id ASC
+        LIMIT ?
+    ''',
+    'delete_exam': '''
+        DELETE FROM exams
+        WHERE id = ? AND user_id = ?
+    ''',
+    'delete_unsent_notifications': "DELETE FROM notifications WHERE exam_id = ? AND status != 'sent'",
+    'exam_by_id': f'''
+        SELECT {EXAM_COLUMNS}
+        FROM exams
+        WHERE id = ?
+    ''',
+    # At most max_per_chat rows of a chat, so a claimed chat drains within its lease at the
+    # per-chat rate. The outer status check keeps the claim exclusive where the subquery reads
+    # a snapshot (MySQL, PostgreSQL).
+    'claim_notifications': f'''
+        UPDATE notifications
+        SET status = 'sending', claimed_by = ?, lease_until = ?, attempts = attempts + 1
+        WHERE id IN (
+            SELECT id FROM ({CLAIMABLE_NOTIFICATIONS}) claimable
+            WHERE chat_rank <= ?
+            ORDER BY due_at, chat_id, id
+            LIMIT ?
+        )
+          AND (status = 'pending' OR (status = 'sending' AND lease_until < ?))
+    ''',
+    'renew_notification_lease': '''
+        UPDATE notifications
+        SET lease_until = ?
+        WHERE claimed_by = ? AND status = 'sending'
+    ''',
+    'claimed_notifications': '''
+        SELECT n.id, n.attempts, n.lead_minutes, n.claimed_by, e.id, e.user_id, e.chat_id,
+               e.exam_date, e.title, e.description, e.is_group_exam, cs.locale
+        FROM notifications n
+        JOIN exams e ON e.id = n.exam_id
+        LEFT JOIN chat_settings cs ON cs.chat_id = n.chat_id
+        WHERE n.claimed_by = ?
+        ORDER BY n.due_at, n.chat_id, n.id
+    ''',
+    'chat_locale': 'SELECT locale FROM chat_settings WHERE chat_id = ?',
+    'set_chat_locale': '''
+        INSERT INTO chat_settings (chat_id, locale) VALUES (?, ?)
+        ON CONFLICT (chat_id) DO UPDATE SET locale = excluded.locale
+    ''',
+    'upcoming_due_times': f'''
+        SELECT DISTINCT due_at FROM notifications
+        WHERE due_at >= ? AND due_at <= ?
+          AND (status = 'pending' OR (status = 'sending' AND lease_until < ?))
+          AND {CHAT_PARTITION} = ?
+        ORDER BY due_at
+        LIMIT ?
+    ''',
+    # Every partition's rows, including those being sent now
+    'reminders_due_between': '''
+        SELECT due_at FROM notifications
+        WHERE status IN ('pending', 'sending') AND due_at >= ? AND due_at <= ?
+        LIMIT 1
+    ''',
+    'mark_notification_sent': '''
+        UPDATE notifications
+        SET status = 'sent', sent_at = ?, lease_until = NULL
+        WHERE id = ? AND claimed_by = ?
+    ''',
+    'mark_notification_failed': '''
+        UPDATE notifications
+        SET status = CASE WHEN ? AND attempts < ? THEN 'pending' ELSE 'failed' END,
+            claimed_by = NULL, lease_until = NULL, last_error = ?
+        WHERE id = ? AND claimed_by = ?
+    ''',
+    # Oldest first, so the exam_date index bounds each archive batch
+    'archive_candidates': f'''
+        SELECT {EXAM_COLUMNS}
+        FROM exams
+        WHERE exam_date < ?
+        ORDER BY exam_date ASC, id ASC
+        LIMIT ?
+    ''',
+    'outbox_stats': '''
+        SELECT status, COUNT(*) FROM notifications WHERE remind_date = ? GROUP BY status
+    ''',
+}
 
 class Database:
-    def __init__(self, database_url: str = None):
+    def __init__(self, database_url: str = None, pool_size: int = None,
+                 pool_idle_timeout: float = None, reminder_policy: ReminderPolicy = None,
+                 init_schema: bool = True, partition: Tuple[int, int] = (0, 1)):
         self.database_url = database_url or os.getenv('DATABASE_URL', 'sqlite:///exams.db')
-        self.init_database()
-    
+        self.reminder_policy = reminder_policy or ReminderPolicy.from_env()
+        self.pool_size = pool_size or int(os.getenv('DB_POOL_SIZE', '5'))
+        self.pool_idle_timeout = pool_idle_timeout or float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))
+
+        # (index, count): reminders are claimed only for chats with partition_of(chat_id, count) == index
+        self.partition = partition
+        self.partition_params = (partition[1], partition[0])
+
+        # Resolved once: connection settings, pool type and SQL for this backend
+        self.dialect = get_dialect(self.database_url)
+        self.sql = self.dialect.compile_statements(STATEMENTS)
+        self.pool = self.dialect.create_pool(self.pool_size, self.pool_idle_timeout)
+
+        # Pass init_schema=False to run init_database() later, e.g. during startup
+        self.schema_version = None
+        if init_schema:
+            self.init_database()
+
     def get_connection(self):
-        """Get database connection based on URL"""
-        if self.database_url.startswith('mysql://') or self.database_url.startswith('mariadb://'):
-            # Parse MySQL/MariaDB URL
-            parsed = urlparse(self.database_url)
-            return pymysql.connect(
-                host=parsed.hostname,
-                port=parsed.port or 3306,
-                user=parsed.username,
-                password=parsed.password,
-                database=parsed.path[1:],  # Remove leading slash
-                charset='utf8mb4'
-            )
-        else:
-            # Fallback to SQLite for local development
-            import sqlite3
-            db_path = self.database_url.replace('sqlite:///', '')
-            return sqlite3.connect(db_path)
-    
+        """Open a new database connection based on URL"""
+        return self.dialect.connect()
+
+    def connection(self):
+        """Borrow a pooled connection for the duration of a with-block"""
+        return self.pool.connection()
+
+    def pool_stats(self) -> Dict:
+        """Return pool statistics: checkouts, waits, connections created and current size"""
+        stats = self.pool.stats.as_dict()
+        stats['size'] = self.pool.size
+        stats['idle'] = self.pool.idle
+        return stats
+
+    def close(self):
+        """Close all pooled connections"""
+        self.pool.close()
+
     def init_database(self):
-        """Initialize the database with required tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if self.database_url.startswith('mysql://') or self.database_url.startswith('mariadb://'):
-            # MySQL/MariaDB schema
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS exams (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id BIGINT NOT NULL,
-                    chat_id BIGINT NOT NULL,
-                    exam_date DATE NOT NULL,
-                    title VARCHAR(255) NOT NULL,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_group_exam BOOLEAN DEFAULT FALSE
-                )
-            ''')
-        else:
-            # SQLite schema
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS exams (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    chat_id INTEGER NOT NULL,
-                    exam_date TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_group_exam BOOLEAN DEFAULT FALSE
-                )
-            ''')
-        
-        conn.commit()
-        conn.close()
-    
-    def add_exam(self, user_id: int, chat_id: int, exam_date: str, title: str, 
+        """Create or upgrade the schema to the latest migration"""
+        with self.connection() as conn:
+            self.schema_version = run_migrations(conn, self.dialect.name)
+
+    def read_schema_version(self) -> int:
+        """Return the applied schema version without migrating; 0 if the schema was never created"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                version = current_version(cursor)
+            except Exception:
+                # No schema_version table; each driver raises its own error class
+                conn.rollback()
+                return 0
+            conn.rollback()
+            return version
+
+    def _reminder_rows(self, exam_id: int, exam_date: str, chat_id: int) -> List[Tuple]:
+        return [(exam_id, chat_id, due_at.strftime('%Y-%m-%d'), due_at.strftime(DATETIME_FORMAT), lead)
+                for lead, due_at in self.reminder_policy.due_times(exam_date, chat_id)]
+
+    @observe_query
+    def add_exam(self, user_id: int, chat_id: int, exam_date: str, title: str,
                  description: str = "", is_group_exam: bool = False) -> int:
-        """Add a new exam to the database"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if self.database_url.startswith('mysql://') or self.database_url.startswith('mariadb://'):
-            cursor.execute('''
-                INSERT INTO exams (user_id, chat_id, exam_date, title, description, is_group_exam)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (user_id, chat_id, exam_date, title, description, is_group_exam))
-            exam_id = cursor.lastrowid
-        else:
-            cursor.execute('''
-                INSERT INTO exams (user_id, chat_id, exam_date, title, description, is_group_exam)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (user_id, chat_id, exam_date, title, description, is_group_exam))
-            exam_id = cursor.lastrowid
-        
-        conn.commit()
-        conn.close()
-        
+        """Add a new exam to the database and schedule its reminders"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            self.dialect.begin(conn)
+            exam_id = self._add_exam(cursor, user_id, chat_id, exam_date, title, description, is_group_exam)
+            conn.commit()
+
+            return exam_id
+
+    def _add_exam(self, cursor, user_id: int, chat_id: int, exam_date: str, title: str,
+                  description: str, is_group_exam: bool) -> int:
+        exam_id = self.dialect.insert_id(
+            cursor, self.sql['insert_exam'],
+            (user_id, chat_id, exam_date, title, description, is_group_exam)
+        )
+        reminders = self._reminder_rows(exam_id, exam_date, chat_id)
+        if reminders:
+            cursor.executemany(self.sql['insert_notification'], reminders)
         return exam_id
-    
-    def get_exams_for_user(self, user_id: int, chat_id: int) -> List[Dict]:
+
+    @observe_query(rows=lambda added: added)
+    def add_exams_bulk(self, user_id: int, chat_id: int, exams: Iterable[Tuple[str, str, str]],
+                       is_group_exam: bool = False, chunk_size: int = 500) -> int:
+        """Add many (exam_date, title, description) rows and their reminders in one transaction.
+
+        `exams` is consumed lazily, `chunk_size` rows per multi-row INSERT, so a
+        streamed file is never materialized. Chunks are made smaller where the
+        backend allows fewer bound parameters per statement (999 on SQLite
+        before 3.32). Returns the number of exams added.
+        """
+        # Six parameters per row
+        chunk_size = max(1, min(chunk_size, self.dialect.max_variables // 6))
+        added = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            self.dialect.begin(conn)
+
+            exams = iter(exams)
+            while True:
+                chunk = list(itertools.islice(exams, chunk_size))
+                if not chunk:
+                    break
+
+                params = []
+                for exam_date, title, description in chunk:
+                    params.extend((user_id, chat_id, exam_date, title, description, is_group_exam))
+                sql = self.dialect.compile(f'''
+                    INSERT INTO exams (user_id, chat_id, exam_date, title, description, is_group_exam)
+                    VALUES {', '.join(['(?, ?, ?, ?, ?, ?)'] * len(chunk))}
+                ''')
+                exam_ids = self.dialect.insert_ids(cursor, sql, params, len(chunk))
+
+                reminders = []
+                for exam_id, (exam_date, _, _) in zip(exam_ids, chunk):
+                    reminders.extend(self._reminder_rows(exam_id, exam_date, chat_id))
+                if reminders:
+                    cursor.executemany(self.sql['insert_notification'], reminders)
+                added += len(chunk)
+
+            conn.commit()
+
+        return added
+
+    @observe_query
+    def get_exams_for_user(self, user_id: int, chat_id: int) -> List[Exam]:
         """Get all exams for a specific user in a specific chat"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if self.database_url.startswith('mysql://') or self.database_url.startswith('mariadb://'):
-            cursor.execute('''
-                SELECT id, exam_date, title, description, is_group_exam
-                FROM exams 
-                WHERE user_id = %s AND chat_id = %s
-                ORDER BY exam_date ASC
-            ''', (user_id, chat_id))
-        else:
-            cursor.execute('''
-                SELECT id, exam_date, title, description, is_group_exam
-                FROM exams 
-                WHERE user_id = ? AND chat_id = ?
-                ORDER BY exam_date ASC
-            ''', (user_id, chat_id))
-        
-        exams = []
-        for row in cursor.fetchall():
-            exams.append({
-                'id': row[0],
-                'exam_date': row[1],
-                'title': row[2],
-                'description': row[3],
-                'is_group_exam': bool(row[4])
-            })
-        
-        conn.close()
-        return exams
-    
-    def get_exams_for_group(self, chat_id: int) -> List[Dict]:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['exams_for_user'], (user_id, chat_id))
+            return EXAM.all(cursor.fetchall())
+
+    @observe_query
+    def get_exams_for_group(self, chat_id: int) -> List[Exam]:
         """Get all group exams for a specific chat"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if self.database_url.startswith('mysql://') or self.database_url.startswith('mariadb://'):
-            cursor.execute('''
-                SELECT id, exam_date, title, description, user_id
-                FROM exams 
-                WHERE chat_id = %s AND is_group_exam = TRUE
-                ORDER BY exam_date ASC
-            ''', (chat_id,))
-        else:
-            cursor.execute('''
-                SELECT id, exam_date, title, description, user_id
-                FROM exams 
-                WHERE chat_id = ? AND is_group_exam = TRUE
-                ORDER BY exam_date ASC
-            ''', (chat_id,))
-        
-        exams = []
-        for row in cursor.fetchall():
-            exams.append({
-                'id': row[0],
-                'exam_date': row[1],
-                'title': row[2],
-                'description': row[3],
-                'user_id': row[4]
-            })
-        
-        conn.close()
-        return exams
-    
-    def get_exams_for_notification(self, days_ahead: int = 1) -> List[Dict]:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['exams_for_group'], (chat_id,))
+            return EXAM.all(cursor.fetchall())
+
+    @observe_query
+    def get_upcoming_exams_for_user(self, user_id: int, chat_id: int, from_date: str, until_date: str,
+                                    after: PageCursor = None, before: PageCursor = None,
+                                    limit: int = 10) -> List[Exam]:
+        """Get one page of a user's exams between from_date and until_date.
+
+        Pages are ordered by (exam_date, id). Pass the last exam's cursor as
+        `after` for the next page or the first exam's as `before` for the
+        previous one; rows are always returned in ascending order.
+        """
+        return self._upcoming_page('upcoming_for_user', (user_id, chat_id),
+                                   from_date, until_date, after, before, limit)
+
+    @observe_query
+    def get_upcoming_exams_for_group(self, chat_id: int, from_date: str, until_date: str,
+                                     after: PageCursor = None, before: PageCursor = None,
+                                     limit: int = 10) -> List[Exam]:
+        """Get one page of a group's exams between from_date and until_date"""
+        return self._upcoming_page('upcoming_for_group', (chat_id,),
+                                   from_date, until_date, after, before, limit)
+
+    def _upcoming_page(self, statement: str, owner: Tuple, from_date: str, until_date: str,
+                       after: Optional[PageCursor], before: Optional[PageCursor], limit: int) -> List[Exam]:
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            if before is not None:
+                before_date, before_id = before if before[0] <= until_date else (until_date, MAX_ID)
+                cursor.execute(self.sql[f'{statement}_before'],
+                               owner + (before_date, from_date, before_date, before_id, limit))
+                return EXAM.all(reversed(cursor.fetchall()))
+            # Id 0 precedes every exam, so the first page starts at (from_date, 0)
+            after_date, after_id = after if after is not None and after[0] >= from_date else (from_date, 0)
+            cursor.execute(self.sql[f'{statement}_after'],
+                           owner + (after_date, until_date, after_date, after_id, limit))
+            return EXAM.all(cursor.fetchall())
+
+    @observe_query
+    def get_exams_for_notification(self, days_ahead: int = 1) -> List[Exam]:
         """Get exams that need notification (1 day ahead by default)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Calculate target date
-        from datetime import datetime, timedelta
         target_date = (datetime.now() + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
-        
-        if self.database_url.startswith('mysql://') or self.database_url.startswith('mariadb://'):
-            cursor.execute('''
-                SELECT id, user_id, chat_id, exam_date, title, description, is_group_exam
-                FROM exams 
-                WHERE exam_date = %s
-            ''', (target_date,))
-        else:
-            cursor.execute('''
-                SELECT id, user_id, chat_id, exam_date, title, description, is_group_exam
-                FROM exams 
-                WHERE exam_date = ?
-            ''', (target_date,))
-        
-        exams = []
-        for row in cursor.fetchall():
-            exams.append({
-                'id': row[0],
-                'user_id': row[1],
-                'chat_id': row[2],
-                'exam_date': row[3],
-                'title': row[4],
-                'description': row[5],
-                'is_group_exam': bool(row[6])
-            })
-        
-        conn.close()
-        return exams
-    
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['exams_on_date'], (target_date,))
+            return EXAM.all(cursor.fetchall())
+
+    @observe_query
+    def get_notification_batch(self, target_date: str, after_id: int = 0,
+                               limit: int = 500) -> List[Exam]:
+        """Get the next page of exams on target_date with id > after_id, ordered by id"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['notification_batch'], (target_date, after_id, limit))
+            return EXAM.all(cursor.fetchall())
+
+    @observe_query(rows=len)
+    def get_reminder_load(self, from_date: str, until_date: str) -> List[Tuple[int, str, int, int, int]]:
+        """Get (chat_id, exam_date, exams, text characters, exams with a description)
+        for every chat and date with exams between from_date and until_date.
+
+        Grouped in the database, so a range of millions of exams comes back
+        as one row per chat and day.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['reminder_load'], (from_date, until_date))
+            return [(chat_id, str(exam_date), exams, int(chars or 0), int(described or 0))
+                    for chat_id, exam_date, exams, chars, described in cursor.fetchall()]
+
+    def iter_exams_for_notification(self, days_ahead: int = 1,
+                                    batch_size: int = 500) -> Iterator[Exam]:
+        """Yield exams that need notification, fetched in keyset-paginated batches.
+
+        Memory stays bounded by batch_size and no connection is held between
+        batches, so the caller can start sending after the first page.
+        """
+        target_date = (datetime.now() + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
+        after_id = 0
+        while True:
+            batch = self.get_notification_batch(target_date, after_id, batch_size)
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            after_id = batch[-1].id
+
+    @observe_query
     def remove_exam(self, exam_id: int, user_id: int) -> bool:
         """Remove an exam (only if user owns it)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if self.database_url.startswith('mysql://') or self.database_url.startswith('mariadb://'):
-            cursor.execute('''
-                DELETE FROM exams 
-                WHERE id = %s AND user_id = %s
-            ''', (exam_id, user_id))
-        else:
-            cursor.execute('''
-                DELETE FROM exams 
-                WHERE id = ? AND user_id = ?
-            ''', (exam_id, user_id))
-        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            self.dialect.begin(conn)
+            deleted = self._remove_exam(cursor, exam_id, user_id)
+            conn.commit()
+
+            return deleted
+
+    def _remove_exam(self, cursor, exam_id: int, user_id: int) -> bool:
+        cursor.execute(self.sql['delete_exam'], (exam_id, user_id))
         deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        
+        if deleted:
+            # Drop queued reminders so the outbox never sends for a removed exam
+            cursor.execute(self.sql['delete_unsent_notifications'], (exam_id,))
         return deleted
-    
-    def get_exam_by_id(self, exam_id: int) -> Optional[Dict]:
+
+    @observe_query(rows=len)
+    def write_batch(self, writes: List[Tuple[str, tuple]]) -> List:
+        """Apply ('add', add_exam args) and ('remove', remove_exam args) writes in one transaction.
+
+        Returns each write's result in order: the new exam id, or whether
+        the exam was removed. Raises, with nothing written, if any fails.
+        """
+        apply = {'add': self._add_exam, 'remove': self._remove_exam}
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            self.dialect.begin(conn)
+            results = [apply[kind](cursor, *args) for kind, args in writes]
+            conn.commit()
+
+            return results
+
+    @observe_query
+    def get_exam_by_id(self, exam_id: int) -> Optional[Exam]:
         """Get exam details by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if self.database_url.startswith('mysql://') or self.database_url.startswith('mariadb://'):
-            cursor.execute('''
-                SELECT id, user_id, chat_id, exam_date, title, description, is_group_exam
-                FROM exams 
-                WHERE id = %s
-            ''', (exam_id,))
-        else:
-            cursor.execute('''
-                SELECT id, user_id, chat_id, exam_date, title, description, is_group_exam
-                FROM exams 
-                WHERE id = ?
-            ''', (exam_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return {
-                'id': row[0],
-                'user_id': row[1],
-                'chat_id': row[2],
-                'exam_date': row[3],
-                'title': row[4],
-                'description': row[5],
-                'is_group_exam': bool(row[6])
-            }
-        return None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['exam_by_id'], (exam_id,))
+            row = cursor.fetchone()
+            return EXAM(row) if row else None
+
+    @observe_query
+    def claim_notifications(self, worker_id: str, limit: int = 200, lease_seconds: int = 300,
+                            max_attempts: int = 5, max_lateness_seconds: int = 43200,
+                            max_per_chat: int = None) -> List[Notification]:
+        """Lease up to `limit` notifications that are due for this worker.
+
+        A row is claimable once its due_at has passed (but by no more than
+        max_lateness_seconds) while it is pending, or while another worker's
+        lease on it has expired (that worker crashed mid-run). The
+        conditional UPDATE makes each claim exclusive across replicas.
+        Rows are claimed and returned in (due_at, chat_id, id) order, at
+        most `max_per_chat` of each chat. Without that cap, when the batch
+        is full its last row's chat is the one the limit may have cut off.
+        """
+        now = datetime.now()
+        claim = f"{worker_id}:{uuid.uuid4().hex[:12]}"
+        lease_until = (now + timedelta(seconds=lease_seconds)).strftime(DATETIME_FORMAT)
+        stale_before = (now - timedelta(seconds=max_lateness_seconds)).strftime(DATETIME_FORMAT)
+        now = now.strftime(DATETIME_FORMAT)
+
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['claim_notifications'],
+                           (claim, lease_until, now, stale_before, max_attempts, now) + self.partition_params
+                           + (max_per_chat or limit, limit, now))
+            conn.commit()
+            cursor.execute(self.sql['claimed_notifications'], (claim,))
+            return NOTIFICATION.all(cursor.fetchall())
+
+    @observe_query
+    def renew_notification_leases(self, claims: Iterable[str], lease_seconds: int = 300) -> int:
+        """Extend the lease on the unsent rows of each claim; returns the rows renewed.
+
+        Rows another worker has taken over since, after the lease expired,
+        carry that worker's claim and are left alone.
+        """
+        lease_until = (datetime.now() + timedelta(seconds=lease_seconds)).strftime(DATETIME_FORMAT)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+
+            self.dialect.begin(conn)
+            renewed = 0
+            for claim in claims:
+                cursor.execute(self.sql['renew_notification_lease'], (lease_until, claim))
+                renewed += cursor.rowcount
+            conn.commit()
+
+            return renewed
+
+    @observe_query
+    def get_chat_locale(self, chat_id: int) -> Optional[str]:
+        """The locale a chat chose for replies, or None"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['chat_locale'], (chat_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    @observe_query
+    def set_chat_locale(self, chat_id: int, locale: str) -> bool:
+        """Store the locale replies and reminders in a chat are rendered in"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['set_chat_locale'], (chat_id, locale))
+            conn.commit()
+
+            return True
+
+    @observe_query
+    def get_upcoming_due_times(self, until: str, not_before: str, limit: int = 1000) -> List:
+        """Distinct due times of claimable notifications between not_before and until"""
+        now = datetime.now().strftime(DATETIME_FORMAT)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['upcoming_due_times'], (not_before, until, now) + self.partition_params + (limit,))
+            return [row[0] for row in cursor.fetchall()]
+
+    @observe_query
+    def has_reminders_due(self, not_before: str, until: str) -> bool:
+        """Whether any chat, in any partition, has a reminder due or being sent between not_before and until"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['reminders_due_between'], (not_before, until))
+            return cursor.fetchone() is not None
+
+    @observe_query
+    def mark_notification_sent(self, notification_id: int, claim: str) -> bool:
+        """Record a delivered notification; ignored if the lease was lost to another worker"""
+        sent_at = datetime.now().strftime(DATETIME_FORMAT)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['mark_notification_sent'], (sent_at, notification_id, claim))
+            updated = cursor.rowcount > 0
+            conn.commit()
+
+            return updated
+
+    @observe_query
+    def mark_notification_failed(self, notification_id: int, claim: str, error: str,
+                                 retry: bool = True, max_attempts: int = 5) -> bool:
+        """Release a failed notification for another attempt, or fail it permanently"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['mark_notification_failed'],
+                           (retry, max_attempts, error[:1000], notification_id, claim))
+            updated = cursor.rowcount > 0
+            conn.commit()
+
+            return updated
+
+    @observe_query(rows=lambda archived: archived)
+    def archive_exams(self, before_date: str, limit: int = 1000,
+                      sink: Callable[[List[Exam]], None] = None) -> int:
+        """Move up to `limit` exams dated before before_date out of the exams table.
+
+        The batch is copied into exams_archive and deleted together with its
+        notifications in one transaction. With a `sink` (e.g. a file writer)
+        the rows are handed to it instead, only once the delete has removed
+        the whole batch and before the commit, so a failed write loses no
+        row. If another connection deleted part of the batch after it was
+        selected, the batch is rolled back and selected again. Returns the
+        number of exams archived; 0 when none are left.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            while True:
+                self.dialect.begin(conn)
+                cursor.execute(self.sql['archive_candidates'], (before_date, limit))
+                exams = EXAM.all(cursor.fetchall())
+                if not exams:
+                    conn.commit()
+                    return 0
+
+                ids = [exam.id for exam in exams]
+                in_ids = f"({', '.join(['?'] * len(ids))})"
+                if sink is None:
+                    cursor.execute(self.dialect.compile(f'''
+                        INSERT INTO exams_archive (id, user_id, chat_id, exam_date, title, description,
+                                                   created_at, is_group_exam)
+                        SELECT id, user_id, chat_id, exam_date, title, description, created_at, is_group_exam
+                        FROM exams WHERE id IN {in_ids}
+                    '''), ids)
+                cursor.execute(self.dialect.compile(f'DELETE FROM notifications WHERE exam_id IN {in_ids}'), ids)
+                cursor.execute(self.dialect.compile(f'DELETE FROM exams WHERE id IN {in_ids}'), ids)
+                if cursor.rowcount == len(ids):
+                    break
+                conn.rollback()
+
+            if sink is not None:
+                try:
+                    sink(exams)
+                except Exception:
+                    conn.rollback()
+                    raise
+            conn.commit()
+
+            return len(ids)
+
+    @observe_query
+    def get_outbox_stats(self, remind_date: str) -> Dict[str, int]:
+        """Count notifications for remind_date by status"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql['outbox_stats'], (remind_date,))
+            return {status: count for status, count in cursor.fetchall()}
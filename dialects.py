@@ -0,0 +1,260 @@
+import sqlite3
+from typing import Dict, List, Sequence
+from urllib.parse import urlparse
+
+import pymysql
+
+from migrations import MYSQL, POSTGRESQL, SQLITE
+from models import Exam
+from pool import ConnectionPool, ThreadLocalPool
+
+# Partition of a chat among sharded workers, as sharding.partition_of computes it.
+# Bits 16-31 of a multiplicative hash: unlike `ABS(chat_id) % count` they are
+# unrelated to ReminderPolicy.chat_offset, so each spread minute's reminders are
+# shared by all workers. Every operand stays below 2**63, so the three backends
+# compute it exactly in 64-bit integers.
+CHAT_PARTITION = '((((ABS(chat_id) % 4294967296) * 1597334677 % 4294967296) >> 16) % ?)'
+
+# Notifications this worker may claim, each ranked within its chat in claim order
+CLAIMABLE_NOTIFICATIONS = f'''
+    SELECT id, due_at, chat_id, ROW_NUMBER() OVER (PARTITION BY chat_id ORDER BY due_at, id) AS chat_rank
+    FROM notifications
+    WHERE due_at <= ? AND due_at >= ? AND attempts < ?
+      AND (status = 'pending' OR (status = 'sending' AND lease_until < ?))
+      AND {CHAT_PARTITION} = ?
+'''
+
+try:
+    import psycopg2
+except ImportError:  # optional: only needed for PostgreSQL
+    psycopg2 = None
+
+
+# Replicas archiving at the same time take different batches (MySQL 8.0+, MariaDB 10.6+)
+ARCHIVE_CANDIDATES_SKIP_LOCKED = f'''
+    SELECT {', '.join(Exam._fields)}
+    FROM exams
+    WHERE exam_date < ?
+    ORDER BY exam_date ASC, id ASC
+    LIMIT ?
+    FOR UPDATE SKIP LOCKED
+'''
+
+
+class Dialect:
+    """Everything that differs between database backends.
+
+    Statements are written once with `?` placeholders and compiled to the
+    backend's paramstyle when the Database is constructed; a dialect may
+    also override whole statements (see `overrides`).
+    """
+    name = ''
+    placeholder = '?'
+    overrides: Dict[str, str] = {}
+    # Most bound parameters one statement may carry
+    max_variables = 999
+
+    def __init__(self, url: str):
+        self.url = url
+
+    def connect(self):
+        raise NotImplementedError
+
+    def create_pool(self, max_size: int, idle_timeout: float):
+        return ConnectionPool(self.connect, max_size=max_size, idle_timeout=idle_timeout)
+
+    def compile(self, sql: str) -> str:
+        if self.placeholder == '?':
+            return sql
+        # A literal % (the modulo operator) must be doubled for format-style drivers
+        return sql.replace('%', '%%').replace('?', self.placeholder)
+
+    def compile_statements(self, statements: Dict[str, str]) -> Dict[str, str]:
+        merged = dict(statements, **self.overrides)
+        return {name: self.compile(sql) for name, sql in merged.items()}
+
+    def begin(self, conn):
+        """Start a transaction spanning several statements"""
+
+    def insert_id(self, cursor, sql: str, params: Sequence) -> int:
+        """Run an INSERT and return the new row's id"""
+        cursor.execute(sql, params)
+        return cursor.lastrowid
+
+    def insert_ids(self, cursor, sql: str, params: Sequence, count: int) -> Sequence[int]:
+        """Run a multi-row INSERT of `count` rows and return their ids in order"""
+        raise NotImplementedError
+
+
+class SQLiteDialect(Dialect):
+    name = SQLITE
+    # SQLITE_MAX_VARIABLE_NUMBER defaults to 999 before SQLite 3.32
+    max_variables = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        self.path = url.replace('sqlite:///', '')
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def create_pool(self, max_size: int, idle_timeout: float):
+        # SQLite keeps one long-lived connection per thread
+        return ThreadLocalPool(self.connect)
+
+    def insert_ids(self, cursor, sql: str, params: Sequence, count: int) -> Sequence[int]:
+        # The statement's ids are consecutive and lastrowid is the last of them
+        cursor.execute(sql, params)
+        return range(cursor.lastrowid - count + 1, cursor.lastrowid + 1)
+
+
+class MySQLDialect(Dialect):
+    name = MYSQL
+    placeholder = '%s'
+    max_variables = 65535
+    overrides = {
+        # MySQL rejects LIMIT in an IN subquery and a subquery on the table being updated,
+        # unless the subquery is wrapped in a derived table, which it then materializes
+        'claim_notifications': f'''
+            UPDATE notifications
+            SET status = 'sending', claimed_by = ?, lease_until = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id FROM ({CLAIMABLE_NOTIFICATIONS}) claimable
+                    WHERE chat_rank <= ?
+                    ORDER BY due_at, chat_id, id
+                    LIMIT ?
+                ) batch
+            )
+              AND (status = 'pending' OR (status = 'sending' AND lease_until < ?))
+        ''',
+        'archive_candidates': ARCHIVE_CANDIDATES_SKIP_LOCKED,
+        # LENGTH counts bytes in MySQL
+        'reminder_load': '''
+            SELECT chat_id, exam_date, COUNT(*),
+                   SUM(CHAR_LENGTH(title) + CHAR_LENGTH(COALESCE(description, ''))),
+                   SUM(CASE WHEN description <> '' THEN 1 ELSE 0 END)
+            FROM exams
+            WHERE exam_date >= ? AND exam_date <= ?
+            GROUP BY chat_id, exam_date
+        ''',
+        'set_chat_locale': '''
+            INSERT INTO chat_settings (chat_id, locale) VALUES (?, ?)
+            ON DUPLICATE KEY UPDATE locale = VALUES(locale)
+        ''',
+    }
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        parsed = urlparse(url)
+        self.connect_args = dict(
+            host=parsed.hostname,
+            port=parsed.port or 3306,
+            user=parsed.username,
+            password=parsed.password,
+            database=parsed.path[1:],  # Remove leading slash
+            charset='utf8mb4',
+            # Pooled connections must not keep a read snapshot open between checkouts
+            autocommit=True
+        )
+
+    def connect(self):
+        return pymysql.connect(**self.connect_args)
+
+    def create_pool(self, max_size: int, idle_timeout: float):
+        return ConnectionPool(
+            self.connect,
+            max_size=max_size,
+            idle_timeout=idle_timeout,
+            health_check=lambda conn: conn.ping(reconnect=False)
+        )
+
+    def begin(self, conn):
+        conn.begin()
+
+    def insert_ids(self, cursor, sql: str, params: Sequence, count: int) -> Sequence[int]:
+        # InnoDB allocates a multi-row INSERT's ids in one block; lastrowid is the first
+        cursor.execute(sql, params)
+        return range(cursor.lastrowid, cursor.lastrowid + count)
+
+
+class PostgreSQLDialect(Dialect):
+    name = POSTGRESQL
+    placeholder = '%s'
+    max_variables = 65535
+    overrides = {
+        # Concurrent workers skip rows another worker is claiming instead of queueing on them.
+        # FOR UPDATE cannot share a query level with a window function, so it locks by id.
+        'claim_notifications': f'''
+            UPDATE notifications
+            SET status = 'sending', claimed_by = ?, lease_until = ?, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM notifications
+                WHERE id IN (
+                    SELECT id FROM ({CLAIMABLE_NOTIFICATIONS}) claimable
+                    WHERE chat_rank <= ?
+                )
+                ORDER BY due_at, chat_id, id
+                LIMIT ?
+                FOR UPDATE SKIP LOCKED
+            )
+              AND (status = 'pending' OR (status = 'sending' AND lease_until < ?))
+        ''',
+        'archive_candidates': ARCHIVE_CANDIDATES_SKIP_LOCKED,
+    }
+
+    def connect(self):
+        if psycopg2 is None:
+            raise ImportError("the psycopg2 package is required for PostgreSQL (pip install psycopg2-binary)")
+        # libpq understands postgresql:// URLs directly
+        return psycopg2.connect(self.url)
+
+    def create_pool(self, max_size: int, idle_timeout: float):
+        return ConnectionPool(
+            self.connect,
+            max_size=max_size,
+            idle_timeout=idle_timeout,
+            health_check=_select_one,
+            # A read leaves its transaction open; end it before the connection is reused
+            reset=lambda conn: conn.rollback()
+        )
+
+    def insert_id(self, cursor, sql: str, params: Sequence) -> int:
+        cursor.execute(sql + ' RETURNING id', params)
+        return cursor.fetchone()[0]
+
+    def insert_ids(self, cursor, sql: str, params: Sequence, count: int) -> List[int]:
+        cursor.execute(sql + ' RETURNING id', params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _select_one(conn):
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1')
+    cursor.fetchone()
+    conn.rollback()
+
+
+DIALECTS = {
+    'sqlite': SQLiteDialect,
+    'mysql': MySQLDialect,
+    'mariadb': MySQLDialect,
+    'postgresql': PostgreSQLDialect,
+    'postgres': PostgreSQLDialect,
+}
+
+
+def register_dialect(scheme: str, dialect_class: type):
+    """Make DATABASE_URLs starting with `scheme://` use dialect_class"""
+    DIALECTS[scheme] = dialect_class
+
+
+def get_dialect(url: str) -> Dialect:
+    """Resolve the dialect for a DATABASE_URL; a bare path is a SQLite file"""
+    scheme = url.split('://', 1)[0].lower() if '://' in url else 'sqlite'
+    if scheme not in DIALECTS:
+        raise ValueError(f"Unsupported DATABASE_URL scheme: {scheme}")
+    return DIALECTS[scheme](url)
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, Optional, Union
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+from metrics import count_notification
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def restart_refill(self):
+        """Discard tokens accrued since the last acquire, e.g. while waiting on another bucket"""
+        now = time.monotonic()
+        if now > self.updated:
+            self.updated = now
+
+    def pause(self, seconds: float):
+        """Hand out no tokens for the next `seconds` (used for RetryAfter)"""
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0
+        self.updated = max(self.updated, self.paused_until)
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int
+    text: str
+    # Caller's reference for the message, e.g. the exam id, passed back to callbacks
+    ref: Any = None
+
+
+@dataclass
+class DispatchReport:
+    queued: int = 0
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    retry_after: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    duration: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Messages sent per second over the whole run"""
+        return self.sent / self.duration if self.duration else 0.0
+
+    def __str__(self):
+        return (f"sent={self.sent} failed={self.failed} retries={self.retries} "
+                f"retry_after={self.retry_after} duration={self.duration:.2f}s "
+                f"throughput={self.throughput:.1f} msg/s")
+
+
+class NotificationDispatcher:
+    """Send messages concurrently within Telegram's global and per-chat rate limits.
+
+    Messages for the same chat are sent in order by a single task; up to
+    `concurrency` chats are served at once.
+    """
+
+    def __init__(self, bot, global_rate: float = 30, chat_rate: float = 1,
+                 concurrency: int = 64, max_retries: int = 3, backoff: float = 1.0,
+                 max_pending: int = 1000,
+                 on_sent: Optional[Callable[[OutgoingMessage], Any]] = None,
+                 on_failed: Optional[Callable[[OutgoingMessage, Exception], Any]] = None):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, capacity=1)
+        self.chat_rate = chat_rate
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # Cap on queued-but-unsent messages so streamed input is not read ahead unboundedly
+        self.max_pending = max_pending
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+
+    async def _send(self, message: OutgoingMessage, chat_bucket: TokenBucket, report: DispatchReport):
+        attempt = 0
+        while True:
+            await chat_bucket.acquire()
+            await self.global_bucket.acquire()
+            # Space this chat's messages from when they are actually sent
+            chat_bucket.restart_refill()
+            try:
+                await self.bot.send_message(chat_id=message.chat_id, text=message.text)
+            except RetryAfter as e:
+                # Flood control applies to the whole bot, so every sender backs off
+                attempt += 1
+                if attempt > self.max_retries:
+                    return e
+                report.retry_after += 1
+                count_notification('retry_after')
+                delay = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                self.global_bucket.pause(delay)
+                chat_bucket.pause(delay)
+                continue
+            except (Forbidden, BadRequest) as e:
+                # Blocked bot, deleted chat, bad text: retrying cannot help
+                return e
+            except (TimedOut, NetworkError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    return e
+                report.retries += 1
+                count_notification('retry')
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+                continue
+            except Exception as e:
+                return e
+            return None
+
+    async def _chat_worker(self, chat_id: int, queue: asyncio.Queue, report: DispatchReport,
+                           slots: asyncio.Semaphore, pending: asyncio.Semaphore,
+                           workers: Dict[int, asyncio.Queue], buckets: Dict[int, TokenBucket]):
+        chat_bucket = buckets.get(chat_id)
+        if chat_bucket is None:
+            chat_bucket = buckets[chat_id] = TokenBucket(self.chat_rate, capacity=1)
+        async with slots:
+            try:
+                while not queue.empty():
+                    message = queue.get_nowait()
+                    try:
+                        error = await self._send(message, chat_bucket, report)
+                        if error is None:
+                            report.sent += 1
+                            count_notification('sent')
+                            logger.debug(f"Sent message {message.ref} to chat {chat_id}")
+                            await self._callback(self.on_sent, message)
+                        else:
+                            report.failed += 1
+                            count_notification('failed')
+                            logger.error(f"Failed to send message {message.ref} to chat {chat_id}: {error}")
+                            await self._callback(self.on_failed, message, error)
+                    finally:
+                        pending.release()
+            finally:
+                # No await between the final empty() check and this del, so no message is stranded
+                del workers[chat_id]
+
+    async def _callback(self, callback: Optional[Callable], message: OutgoingMessage, *args):
+        """Run on_sent or on_failed; an error there must not stop the chat's other messages"""
+        if callback is None:
+            return
+        try:
+            await _maybe_await(callback(message, *args))
+        except Exception as e:
+            logger.error(f"Callback for message {message.ref} to chat {message.chat_id} failed: {e}")
+
+    async def dispatch(self, messages: Union[Iterable[OutgoingMessage], AsyncIterable[OutgoingMessage]]) -> DispatchReport:
+        """Send every message and return a report once all have been delivered or given up on"""
+        report = DispatchReport()
+        slots = asyncio.Semaphore(self.concurrency)
+        pending = asyncio.Semaphore(self.max_pending)
+        workers: Dict[int, asyncio.Queue] = {}
+        # Outlive the workers so a chat that gets more messages later keeps its pacing
+        buckets: Dict[int, TokenBucket] = {}
+        tasks = set()
+
+        async def enqueue(message: OutgoingMessage):
+            await pending.acquire()
+            report.queued += 1
+            queue = workers.get(message.chat_id)
+            if queue is None:
+                queue = workers[message.chat_id] = asyncio.Queue()
+                task = asyncio.create_task(self._chat_worker(
+                    message.chat_id, queue, report, slots, pending, workers, buckets
+                ))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            queue.put_nowait(message)
+
+        try:
+            if hasattr(messages, '__aiter__'):
+                async for message in messages:
+                    await enqueue(message)
+            else:
+                for message in messages:
+                    await enqueue(message)
+
+            while tasks:
+                await asyncio.gather(*list(tasks))
+        except BaseException:
+            # Stop sending rather than leave chat tasks running after dispatch has returned
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*list(tasks), return_exceptions=True)
+            raise
+
+        report.duration = time.monotonic() - report.started_at
+        return report
+
+
+async def _maybe_await(result):
+    if asyncio.iscoroutine(result):
+        await result
@@ -0,0 +1,140 @@
+import csv
+import io
+import re
+from datetime import date, datetime
+from typing import IO, Iterable, Iterator, Optional, Tuple
+
+from models import Exam
+
+CSV = 'csv'
+ICS = 'ics'
+
+CSV_FIELDS = ('exam_date', 'title', 'description')
+# exams.title is VARCHAR(255) on MySQL and PostgreSQL
+MAX_TITLE_LENGTH = 255
+
+ExamRow = Tuple[str, str, str]
+
+
+def detect_format(file_name: Optional[str], mime_type: Optional[str] = None) -> Optional[str]:
+    """Return CSV or ICS from an uploaded document's name or MIME type"""
+    name = (file_name or '').lower()
+    mime = (mime_type or '').lower()
+    if name.endswith('.ics') or mime == 'text/calendar':
+        return ICS
+    if name.endswith('.csv') or mime in ('text/csv', 'text/comma-separated-values'):
+        return CSV
+    return None
+
+
+class ExamReader:
+    """Stream (exam_date, title, description) rows from a CSV or ICS file.
+
+    Lines are read one at a time, so arbitrarily large files are never held
+    in memory. Rows with a missing or over-long title, a malformed date or a
+    date in the past are skipped and counted in `skipped`. A malformed CSV
+    file raises csv.Error.
+    """
+
+    def __init__(self, stream: IO[str], file_format: str, today: date = None):
+        self.stream = stream
+        self.file_format = file_format
+        self.today = today or date.today()
+        self.skipped = 0
+
+    def __iter__(self) -> Iterator[ExamRow]:
+        rows = self._read_csv() if self.file_format == CSV else self._read_ics()
+        for exam_date, title, description in rows:
+            parsed = _parse_date(exam_date)
+            title = (title or '').strip()
+            if parsed is None or not title or len(title) > MAX_TITLE_LENGTH or parsed < self.today:
+                self.skipped += 1
+                continue
+            yield parsed.isoformat(), title, (description or '').strip()
+
+    def _read_csv(self) -> Iterator[ExamRow]:
+        reader = csv.reader(self.stream)
+        for row in reader:
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            # Optional header row
+            if reader.line_num == 1 and row[0].strip().lower() in ('exam_date', 'date'):
+                continue
+            row = row + [''] * (3 - len(row))
+            yield row[0], row[1], ','.join(row[2:])
+
+    def _read_ics(self) -> Iterator[ExamRow]:
+        event = None
+        for line in _unfold(self.stream):
+            name, _, value = line.partition(':')
+            name = name.split(';', 1)[0].upper()
+            if name == 'BEGIN' and value.upper() == 'VEVENT':
+                event = {}
+            elif name == 'END' and value.upper() == 'VEVENT' and event is not None:
+                yield event.get('DTSTART', ''), event.get('SUMMARY', ''), event.get('DESCRIPTION', '')
+                event = None
+            elif event is not None and name in ('DTSTART', 'SUMMARY', 'DESCRIPTION'):
+                event[name] = _ics_unescape(value)
+
+
+def _unfold(stream: IO[str]) -> Iterator[str]:
+    """Join RFC 5545 folded lines (continuations start with a space or tab)"""
+    current = None
+    for raw in stream:
+        line = raw.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _parse_date(value: str) -> Optional[date]:
+    value = (value or '').strip()
+    for fmt, length in (('%Y-%m-%d', 10), ('%Y%m%d', 8)):
+        try:
+            return datetime.strptime(value[:length], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+_ICS_ESCAPE = re.compile(r'\\([\\;,nN])')
+
+
+def _ics_unescape(value: str) -> str:
+    # One pass, so an escaped backslash is never read as the start of another escape
+    return _ICS_ESCAPE.sub(lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+
+
+def _ics_escape(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def write_exams(exams: Iterable[Exam], file_format: str, stream: IO[str] = None) -> IO[str]:
+    """Write exams as CSV or ICS; returns the stream, rewound"""
+    stream = stream or io.StringIO()
+    if file_format == ICS:
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+        stream.write('BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//exam_bot//EN\r\n')
+        for exam in exams:
+            stream.write('BEGIN:VEVENT\r\n')
+            stream.write(f"UID:exam-{exam.id}@exam_bot\r\n")
+            stream.write(f"DTSTAMP:{stamp}\r\n")
+            stream.write(f"DTSTART;VALUE=DATE:{str(exam.exam_date).replace('-', '')}\r\n")
+            stream.write(f"SUMMARY:{_ics_escape(exam.title)}\r\n")
+            if exam.description:
+                stream.write(f"DESCRIPTION:{_ics_escape(exam.description)}\r\n")
+            stream.write('END:VEVENT\r\n')
+        stream.write('END:VCALENDAR\r\n')
+    else:
+        writer = csv.writer(stream)
+        writer.writerow(CSV_FIELDS)
+        for exam in exams:
+            writer.writerow([exam.exam_date, exam.title, exam.description or ''])
+    stream.seek(0)
+    return stream
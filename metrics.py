@@ -0,0 +1,319 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Sequence, Tuple
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # optional: spans are logged instead
+    otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label(value) -> str:
+    """A label value as the text exposition format quotes it"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._expose_child(values, child))
+        return lines
+
+
+class _CounterValue:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def _expose_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {child.value}"]
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _expose_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, 'le="%s"' % bound)
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{labels} {child.count}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {child.sum}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Values read from a callback at scrape time; use kind='counter' for running totals"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[Tuple, float]],
+                 labelnames: Sequence[str] = (), kind: str = 'gauge'):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            samples = self.callback()
+        except Exception as e:
+            logger.error(f"Gauge {self.name} callback failed: {e}")
+            samples = {}
+        for values, value in sorted(samples.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.enabled = False
+        self.tracing = False
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.register(Histogram(
+    'exam_bot_handler_latency_seconds', 'Time spent in each command handler', ['handler']
+))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    'exam_bot_handler_errors_total', 'Command handlers that raised', ['handler']
+))
+QUERY_LATENCY = REGISTRY.register(Histogram(
+    'exam_bot_db_query_seconds', 'Time spent in each Database method', ['method']
+))
+QUERY_ROWS = REGISTRY.register(Counter(
+    'exam_bot_db_rows_total', 'Rows returned or written by each Database method', ['method']
+))
+NOTIFICATIONS = REGISTRY.register(Counter(
+    'exam_bot_notifications_total', 'Reminder send outcomes', ['outcome']
+))
+
+
+def configure(enabled: bool, tracing: bool = False):
+    REGISTRY.enabled = enabled
+    REGISTRY.tracing = tracing
+
+
+def register_gauge(name: str, documentation: str, callback: Callable[[], Dict[Tuple, float]],
+                   labelnames: Sequence[str] = (), kind: str = 'gauge'):
+    REGISTRY.register(Gauge(name, documentation, callback, labelnames, kind))
+
+
+def count_notification(outcome: str):
+    """Count a reminder outcome: sent, failed, retry or retry_after"""
+    if REGISTRY.enabled:
+        NOTIFICATIONS.labels(outcome).inc()
+
+
+def _row_count(result) -> int:
+    if isinstance(result, list):
+        return len(result)
+    return 1 if result else 0
+
+
+def observe_query(func=None, *, rows: Callable = _row_count):
+    """Time a Database method and count the rows it returned or wrote.
+
+    `rows` maps the method's result to a row count when it is not a list
+    of rows or a single row.
+    """
+    if func is None:
+        return functools.partial(observe_query, rows=rows)
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not REGISTRY.enabled:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        QUERY_LATENCY.labels(name).observe(time.perf_counter() - started)
+        QUERY_ROWS.labels(name).inc(rows(result))
+        return result
+
+    return wrapper
+
+
+def observe_handler(name: str):
+    """Time an async update handler and, when tracing is on, wrap it in a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, update, context):
+            if not REGISTRY.enabled and not REGISTRY.tracing:
+                return await func(self, update, context)
+            started = time.perf_counter()
+            with span(f"handler.{name}", update=update):
+                try:
+                    return await func(self, update, context)
+                except Exception:
+                    if REGISTRY.enabled:
+                        HANDLER_ERRORS.labels(name).inc()
+                    raise
+                finally:
+                    if REGISTRY.enabled:
+                        HANDLER_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+def span(name: str, update=None):
+    """Tracing span for one update; a no-op unless tracing is enabled"""
+    if not REGISTRY.tracing:
+        return nullcontext()
+    return _span(name, update)
+
+
+@contextmanager
+def _span(name: str, update):
+    attributes = {}
+    if update is not None and getattr(update, 'update_id', None) is not None:
+        attributes['update_id'] = update.update_id
+        if update.effective_chat:
+            attributes['chat_id'] = update.effective_chat.id
+    if otel_trace is not None:
+        with otel_trace.get_tracer('exam_bot').start_as_current_span(name, attributes=attributes):
+            yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        logger.info(f"span {name} {attributes} took {(time.perf_counter() - started) * 1000:.1f}ms")
+
+
+class MetricsServer:
+    """Minimal HTTP server exposing the registry at /metrics"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9100):
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', REGISTRY.expose().encode()
+            else:
+                status, body = '404 Not Found', b'not found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
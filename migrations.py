@@ -0,0 +1,344 @@
+import logging
+from dataclasses import dataclass, field
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+MYSQL = 'mysql'
+SQLITE = 'sqlite'
+POSTGRESQL = 'postgresql'
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    mysql: List[str] = field(default_factory=list)
+    sqlite: List[str] = field(default_factory=list)
+    postgresql: List[str] = field(default_factory=list)
+
+    def statements(self, dialect: str) -> List[str]:
+        return getattr(self, dialect)
+
+
+# Append new migrations to the end; never edit one that has shipped.
+# (The postgresql variants were added together, before PostgreSQL was supported.)
+MIGRATIONS = [
+    Migration(
+        1, 'create exams table',
+        mysql=['''
+            CREATE TABLE IF NOT EXISTS exams (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                chat_id BIGINT NOT NULL,
+                exam_date DATE NOT NULL,
+                title VARCHAR(255) NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_group_exam BOOLEAN DEFAULT FALSE
+            )
+        '''],
+        sqlite=['''
+            CREATE TABLE IF NOT EXISTS exams (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                exam_date TEXT NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_group_exam BOOLEAN DEFAULT FALSE
+            )
+        '''],
+        postgresql=['''
+            CREATE TABLE IF NOT EXISTS exams (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                chat_id BIGINT NOT NULL,
+                exam_date DATE NOT NULL,
+                title VARCHAR(255) NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                is_group_exam BOOLEAN DEFAULT FALSE
+            )
+        ''']
+    ),
+    Migration(
+        2, 'index exams for /list and the daily notification scan',
+        mysql=[
+            'CREATE INDEX idx_exams_user_chat_date ON exams (user_id, chat_id, exam_date)',
+            'CREATE INDEX idx_exams_chat_group_date ON exams (chat_id, is_group_exam, exam_date)',
+            'CREATE INDEX idx_exams_date ON exams (exam_date)',
+        ],
+        sqlite=[
+            'CREATE INDEX IF NOT EXISTS idx_exams_user_chat_date ON exams (user_id, chat_id, exam_date)',
+            'CREATE INDEX IF NOT EXISTS idx_exams_chat_group_date ON exams (chat_id, is_group_exam, exam_date)',
+            'CREATE INDEX IF NOT EXISTS idx_exams_date ON exams (exam_date)',
+        ],
+        postgresql=[
+            'CREATE INDEX IF NOT EXISTS idx_exams_user_chat_date ON exams (user_id, chat_id, exam_date)',
+            'CREATE INDEX IF NOT EXISTS idx_exams_chat_group_date ON exams (chat_id, is_group_exam, exam_date)',
+            'CREATE INDEX IF NOT EXISTS idx_exams_date ON exams (exam_date)',
+        ]
+    ),
+    Migration(
+        3, 'notifications outbox with delivery state',
+        mysql=[
+            '''
+            CREATE TABLE IF NOT EXISTS notifications (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                exam_id INT NOT NULL,
+                chat_id BIGINT NOT NULL,
+                remind_date DATE NOT NULL,
+                status VARCHAR(16) NOT NULL DEFAULT 'pending',
+                attempts INT NOT NULL DEFAULT 0,
+                claimed_by VARCHAR(64),
+                lease_until DATETIME,
+                sent_at DATETIME,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            'CREATE UNIQUE INDEX uq_notifications_exam_date ON notifications (exam_id, remind_date)',
+            'CREATE INDEX idx_notifications_claim ON notifications (remind_date, status, lease_until)',
+            'CREATE INDEX idx_notifications_claimed_by ON notifications (claimed_by)',
+        ],
+        sqlite=[
+            '''
+            CREATE TABLE IF NOT EXISTS notifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                exam_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                remind_date TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                claimed_by TEXT,
+                lease_until TEXT,
+                sent_at TEXT,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            'CREATE UNIQUE INDEX IF NOT EXISTS uq_notifications_exam_date ON notifications (exam_id, remind_date)',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_claim ON notifications (remind_date, status, lease_until)',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_claimed_by ON notifications (claimed_by)',
+        ],
+        postgresql=[
+            '''
+            CREATE TABLE IF NOT EXISTS notifications (
+                id BIGSERIAL PRIMARY KEY,
+                exam_id INT NOT NULL,
+                chat_id BIGINT NOT NULL,
+                remind_date DATE NOT NULL,
+                status VARCHAR(16) NOT NULL DEFAULT 'pending',
+                attempts INT NOT NULL DEFAULT 0,
+                claimed_by VARCHAR(64),
+                lease_until TIMESTAMP,
+                sent_at TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            'CREATE UNIQUE INDEX IF NOT EXISTS uq_notifications_exam_date ON notifications (exam_id, remind_date)',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_claim ON notifications (remind_date, status, lease_until)',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_claimed_by ON notifications (claimed_by)',
+        ]
+    ),
+    Migration(
+        4, 'precomputed reminder due times',
+        mysql=[
+            'ALTER TABLE notifications ADD COLUMN due_at DATETIME NULL, ADD COLUMN lead_minutes INT NOT NULL DEFAULT 1440',
+            "UPDATE notifications SET due_at = TIMESTAMP(remind_date, '09:00:00') WHERE due_at IS NULL",
+            'DROP INDEX uq_notifications_exam_date ON notifications',
+            'DROP INDEX idx_notifications_claim ON notifications',
+            'CREATE UNIQUE INDEX uq_notifications_exam_lead ON notifications (exam_id, lead_minutes)',
+            'CREATE INDEX idx_notifications_due ON notifications (status, due_at)',
+            # Schedule the old 9:00-the-day-before reminder for exams added before this migration
+            '''
+            INSERT IGNORE INTO notifications (exam_id, chat_id, remind_date, due_at, lead_minutes)
+            SELECT id, chat_id, DATE_SUB(exam_date, INTERVAL 1 DAY),
+                   TIMESTAMP(DATE_SUB(exam_date, INTERVAL 1 DAY), '09:00:00'), 1440
+            FROM exams WHERE exam_date > CURDATE()
+            ''',
+        ],
+        sqlite=[
+            'ALTER TABLE notifications ADD COLUMN due_at TEXT',
+            'ALTER TABLE notifications ADD COLUMN lead_minutes INTEGER NOT NULL DEFAULT 1440',
+            "UPDATE notifications SET due_at = remind_date || ' 09:00:00' WHERE due_at IS NULL",
+            'DROP INDEX IF EXISTS uq_notifications_exam_date',
+            'DROP INDEX IF EXISTS idx_notifications_claim',
+            'CREATE UNIQUE INDEX IF NOT EXISTS uq_notifications_exam_lead ON notifications (exam_id, lead_minutes)',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_due ON notifications (status, due_at)',
+            '''
+            INSERT OR IGNORE INTO notifications (exam_id, chat_id, remind_date, due_at, lead_minutes)
+            SELECT id, chat_id, date(exam_date, '-1 day'), date(exam_date, '-1 day') || ' 09:00:00', 1440
+            FROM exams WHERE exam_date > date('now')
+            ''',
+        ],
+        postgresql=[
+            'ALTER TABLE notifications ADD COLUMN due_at TIMESTAMP NULL, ADD COLUMN lead_minutes INT NOT NULL DEFAULT 1440',
+            "UPDATE notifications SET due_at = remind_date + TIME '09:00' WHERE due_at IS NULL",
+            'DROP INDEX IF EXISTS uq_notifications_exam_date',
+            'DROP INDEX IF EXISTS idx_notifications_claim',
+            'CREATE UNIQUE INDEX IF NOT EXISTS uq_notifications_exam_lead ON notifications (exam_id, lead_minutes)',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_due ON notifications (status, due_at)',
+            '''
+            INSERT INTO notifications (exam_id, chat_id, remind_date, due_at, lead_minutes)
+            SELECT id, chat_id, exam_date - 1, (exam_date - 1) + TIME '09:00', 1440
+            FROM exams WHERE exam_date > CURRENT_DATE
+            ON CONFLICT DO NOTHING
+            ''',
+        ]
+    ),
+    Migration(
+        5, 'archive table for past exams',
+        mysql=['''
+            CREATE TABLE IF NOT EXISTS exams_archive (
+                id INT PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                chat_id BIGINT NOT NULL,
+                exam_date DATE NOT NULL,
+                title VARCHAR(255) NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP NULL,
+                is_group_exam BOOLEAN DEFAULT FALSE,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        '''],
+        sqlite=['''
+            CREATE TABLE IF NOT EXISTS exams_archive (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                exam_date TEXT NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP,
+                is_group_exam BOOLEAN DEFAULT FALSE,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        '''],
+        postgresql=['''
+            CREATE TABLE IF NOT EXISTS exams_archive (
+                id INT PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                chat_id BIGINT NOT NULL,
+                exam_date DATE NOT NULL,
+                title VARCHAR(255) NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP,
+                is_group_exam BOOLEAN DEFAULT FALSE,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''']
+    ),
+    Migration(
+        6, 'per-chat settings (reply locale)',
+        mysql=['''
+            CREATE TABLE IF NOT EXISTS chat_settings (
+                chat_id BIGINT PRIMARY KEY,
+                locale VARCHAR(16) NOT NULL
+            )
+        '''],
+        sqlite=['''
+            CREATE TABLE IF NOT EXISTS chat_settings (
+                chat_id INTEGER PRIMARY KEY,
+                locale TEXT NOT NULL
+            )
+        '''],
+        postgresql=['''
+            CREATE TABLE IF NOT EXISTS chat_settings (
+                chat_id BIGINT PRIMARY KEY,
+                locale VARCHAR(16) NOT NULL
+            )
+        ''']
+    ),
+]
+
+SCHEMA_VERSION_DDL = {
+    MYSQL: '''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    SQLITE: '''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    POSTGRESQL: '''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+}
+
+# Serializes migrations across bot replicas that start at the same time
+MYSQL_LOCK_NAME = 'exam_bot_schema_migrations'
+POSTGRESQL_LOCK_KEY = 726_173_001
+
+
+def current_version(cursor) -> int:
+    """Return the highest applied migration version (0 for a fresh database)"""
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    row = cursor.fetchone()
+    return (row[0] or 0) if row else 0
+
+
+def run_migrations(conn, dialect: str, target: int = None) -> int:
+    """Apply pending migrations up to target (default: latest) and return the new version.
+
+    Existing deployments created before versioning are upgraded in place:
+    migration 1 only creates the exams table if it is missing.
+    """
+    target = MIGRATIONS[-1].version if target is None else target
+    cursor = conn.cursor()
+    placeholder = '?' if dialect == SQLITE else '%s'
+
+    if dialect == MYSQL:
+        cursor.execute('SELECT GET_LOCK(%s, 60)', (MYSQL_LOCK_NAME,))
+    elif dialect == POSTGRESQL:
+        cursor.execute('SELECT pg_advisory_lock(%s)', (POSTGRESQL_LOCK_KEY,))
+    try:
+        cursor.execute(SCHEMA_VERSION_DDL[dialect])
+        conn.commit()
+        version = current_version(cursor)
+
+        for migration in MIGRATIONS:
+            if migration.version <= version or migration.version > target:
+                continue
+            if dialect == SQLITE:
+                # SQLite has no advisory lock, so take the write lock first and check the
+                # version again: another process sharing the file may have just applied it.
+                # SQLite DDL is transactional, so a failed migration leaves no trace.
+                cursor.execute('BEGIN IMMEDIATE')
+                version = current_version(cursor)
+                if migration.version <= version:
+                    conn.commit()
+                    continue
+            logger.info(f"Applying migration {migration.version}: {migration.description}")
+            for statement in migration.statements(dialect):
+                cursor.execute(statement)
+            cursor.execute(
+                f'INSERT INTO schema_version (version, description) VALUES ({placeholder}, {placeholder})',
+                (migration.version, migration.description)
+            )
+            conn.commit()
+            version = migration.version
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if dialect == MYSQL:
+            cursor.execute('SELECT RELEASE_LOCK(%s)', (MYSQL_LOCK_NAME,))
+        elif dialect == POSTGRESQL:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (POSTGRESQL_LOCK_KEY,))
+            conn.commit()
+
+    return version
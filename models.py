@@ -0,0 +1,34 @@
+from datetime import date
+from typing import NamedTuple, Optional, Union
+
+
+class Exam(NamedTuple):
+    """One row of the exams table.
+
+    A tuple subclass: immutable, no per-instance __dict__, and built
+    straight from a result row, so large result sets stay cheap.
+    """
+    id: int
+    user_id: int
+    chat_id: int
+    exam_date: Union[date, str]
+    title: str
+    description: str
+    is_group_exam: bool
+
+
+class Notification(NamedTuple):
+    """A claimed outbox row together with the exam it reminds about and its chat's locale"""
+    notification_id: int
+    attempts: int
+    lead_minutes: int
+    claim: str
+    id: int
+    user_id: int
+    chat_id: int
+    exam_date: Union[date, str]
+    title: str
+    description: str
+    is_group_exam: bool
+    # None when the chat never chose one
+    locale: Optional[str]
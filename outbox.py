@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+from telegram.error import BadRequest, Forbidden
+from async_database import AsyncDatabase
+from dispatcher import DispatchReport, NotificationDispatcher, OutgoingMessage
+from models import Notification
+from rendering import split_message
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class OutboxWorker:
+    """Claim-and-send loop over the notifications outbox.
+
+    Reminder rows are written when an exam is added. Every replica can drain
+    the outbox at the same time: each batch is leased to exactly one worker,
+    and rows left behind by a crashed worker become claimable again once
+    their lease expires. While a run is going, the leases of its claimed
+    rows are renewed every third of `lease_seconds`, so rows waiting for a
+    slow chat are never taken over by another replica. The next batch is
+    claimed only once the dispatcher has worked through half of what it
+    was handed, and with `chat_rate` set a claim takes at most half a
+    lease's worth of one chat's messages.
+
+    With `format_digest` set, each chat gets one digest of all its due
+    reminders instead of a message per reminder, split only where a digest
+    would exceed Telegram's message length.
+    """
+
+    def __init__(self, db: AsyncDatabase, dispatcher_factory: Callable[..., NotificationDispatcher],
+                 format_message: Callable[[Notification], str], worker_id: str = None,
+                 batch_size: int = 200, lease_seconds: int = 300, max_attempts: int = 5,
+                 max_lateness_seconds: int = 43200,
+                 format_digest: Callable[[List[Notification]], Tuple[str, List[str]]] = None,
+                 chat_rate: float = None):
+        self.db = db
+        self.dispatcher_factory = dispatcher_factory
+        self.format_message = format_message
+        self.worker_id = worker_id or default_worker_id()
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_lateness_seconds = max_lateness_seconds
+        # Returns a digest's header and one entry per notification
+        self.format_digest = format_digest
+        # Rows of one chat per claim, sent within half a lease at the per-chat rate. Not for
+        # digests: their rows share a few messages, and a capped chat would get two digests.
+        self.max_per_chat = max(1, int(lease_seconds * chat_rate / 2)) if chat_rate and not format_digest else None
+
+    async def drain(self, bot) -> DispatchReport:
+        """Send claimed batches until no due notification is left"""
+        # Unmarked rows per claim, whose leases are renewed, and rows handed to the dispatcher
+        unmarked: Dict[str, int] = {}
+        queued = 0
+        room = asyncio.Condition()
+
+        async def marked(message: OutgoingMessage):
+            nonlocal queued
+            for _, claim in message.ref:
+                unmarked[claim] -= 1
+                if not unmarked[claim]:
+                    del unmarked[claim]
+            queued -= len(message.ref)
+            async with room:
+                room.notify_all()
+
+        # A message's ref lists the (notification_id, claim) of every reminder it carries
+        async def on_sent(message: OutgoingMessage):
+            try:
+                for notification_id, claim in message.ref:
+                    await self.db.mark_notification_sent(notification_id, claim)
+            finally:
+                await marked(message)
+
+        async def on_failed(message: OutgoingMessage, error: Exception):
+            # Blocked bots and deleted chats will never accept the message
+            retry = not isinstance(error, (Forbidden, BadRequest))
+            try:
+                for notification_id, claim in message.ref:
+                    await self.db.mark_notification_failed(
+                        notification_id, claim, str(error),
+                        retry=retry, max_attempts=self.max_attempts
+                    )
+            finally:
+                await marked(message)
+
+        dispatcher = self.dispatcher_factory(bot, on_sent=on_sent, on_failed=on_failed, max_pending=self.batch_size)
+
+        async def claim() -> List[Notification]:
+            # Rows claimed early would only wait in the dispatcher's queue
+            async with room:
+                await room.wait_for(lambda: queued <= self.batch_size // 2)
+            batch = await self.claim()
+            if batch:
+                unmarked[batch[0].claim] = len(batch)
+            return batch
+
+        def handed(message: OutgoingMessage) -> OutgoingMessage:
+            nonlocal queued
+            queued += len(message.ref)
+            return message
+
+        async def claimed_messages():
+            while True:
+                batch = await claim()
+                if not batch:
+                    return
+                for notification in batch:
+                    yield handed(OutgoingMessage(
+                        chat_id=notification.chat_id,
+                        text=self.format_message(notification),
+                        ref=[(notification.notification_id, notification.claim)]
+                    ))
+
+        async def claimed_digests():
+            # A full batch is cut off after its last row in claim order, so that
+            # row's chat may continue in the next batch and is held back
+            held: List[Notification] = []
+            while True:
+                batch = await claim()
+                chats: Dict[int, List[Notification]] = {}
+                for notification in held + batch:
+                    chats.setdefault(notification.chat_id, []).append(notification)
+                held = chats.pop(batch[-1].chat_id) if len(batch) == self.batch_size else []
+                for notifications in chats.values():
+                    for message in self.digest(notifications):
+                        yield handed(message)
+                if not batch and not held:
+                    return
+
+        async def renew():
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                if unmarked:
+                    try:
+                        await self.db.renew_notification_leases(list(unmarked), self.lease_seconds)
+                    except Exception as e:
+                        logger.error(f"Worker {self.worker_id} could not renew its leases: {e}")
+
+        renewer = asyncio.create_task(renew())
+        try:
+            messages = claimed_digests() if self.format_digest else claimed_messages()
+            return await dispatcher.dispatch(messages)
+        finally:
+            renewer.cancel()
+
+    async def claim(self) -> List[Notification]:
+        return await self.db.claim_notifications(
+            self.worker_id, limit=self.batch_size, lease_seconds=self.lease_seconds,
+            max_attempts=self.max_attempts, max_lateness_seconds=self.max_lateness_seconds,
+            max_per_chat=self.max_per_chat
+        )
+
+    def digest(self, notifications: List[Notification]) -> List[OutgoingMessage]:
+        """One chat's reminders as few messages as Telegram's length limit allows"""
+        # A held-back chat's rows come from two claims
+        notifications.sort(key=lambda notification: (str(notification.exam_date), notification.notification_id))
+        header, entries = self.format_digest(notifications)
+        return [
+            OutgoingMessage(
+                chat_id=notifications[0].chat_id,
+                text=text,
+                ref=[(notifications[index].notification_id, notifications[index].claim) for index in indexes]
+            )
+            for text, indexes in split_message(header, entries)
+        ]
+
+    async def run(self, bot) -> DispatchReport:
+        """Send everything that is due and log the day's outbox totals"""
+        report = await self.drain(bot)
+        if report.queued:
+            stats = await self.db.get_outbox_stats(datetime.now().strftime('%Y-%m-%d'))
+            logger.info(f"Worker {self.worker_id} finished outbox run: {report}; today's outbox {stats}")
+        return report
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Dry run of the reminders for a range of exam dates: how many messages
+they take, how long sending them would take within Telegram's rate
+limits, and which chats wait the longest. Nothing is sent.
+
+The exams are counted per chat and day in the database, so a range of
+millions of exams is read as one row per chat and day. Each count becomes
+a batch of messages released at its due time (REMINDER_LEAD_MINUTES,
+REMINDER_TIME and REMINDER_SPREAD_MINUTES apply as in the bot), and the
+batches go through a fluid model of the dispatcher: every chat with
+messages waiting gets an equal share of the global rate, at most the per-
+chat rate, with at most --concurrency chats served at once. With
+--workers above 1 each worker's chats are simulated on their own at
+global rate / workers.
+
+    python plan_reminders.py --from 2026-10-18 --to 2026-10-24 --digest
+"""
+
+import argparse
+import heapq
+import math
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from config import (
+    DATABASE_URL, DEFAULT_LOCALE, NOTIFY_GLOBAL_RATE, NOTIFY_CHAT_RATE,
+    NOTIFY_CONCURRENCY, NOTIFY_DIGEST, WORKERS
+)
+from database import Database
+from migrations import MIGRATIONS
+from models import Notification
+from rendering import MAX_MESSAGE_LENGTH, Renderer, message_length
+from scheduler import ReminderPolicy
+from sharding import partition_of
+
+
+class DigestSize:
+    """Estimate how many messages a chat's digest splits into from its exams' text length.
+
+    Entry and header overheads are measured on the rendered templates.
+    Titles and descriptions are counted in characters, which is exact for
+    Arabic and Latin text; emoji in them count double in Telegram.
+    """
+
+    def __init__(self, renderer: Renderer, limit: int = MAX_MESSAGE_LENGTH):
+        today = date.today()
+        # Dated tomorrow, as with the default lead time of a day
+        tomorrow = (today + timedelta(days=1)).isoformat()
+        sample = Notification(0, 0, 0, '', 0, 0, 0, tomorrow, '', '', False, None)
+        header, [entry] = renderer.digest([sample], today)
+        _, [described] = renderer.digest([sample._replace(description=' ')], today)
+        self.header = message_length(header)
+        self.entry = message_length(entry)
+        self.description = message_length(described) - self.entry - 1
+        self.limit = limit
+
+    def messages(self, exams: int, chars: int, described: int) -> int:
+        # The header was measured with a count of 1
+        room = self.limit - self.header - len(str(exams)) + 1
+        length = exams * self.entry + described * self.description + chars
+        return max(1, math.ceil(length / room))
+
+
+@dataclass
+class Release:
+    """Messages due for one chat at one time"""
+    due: float
+    chat_id: int
+    reminders: int
+    messages: int
+
+
+@dataclass
+class ChatPlan:
+    chat_id: int
+    worker: int
+    reminders: int = 0
+    messages: int = 0
+    # Longest time, in seconds, between a batch being due and its last message going out
+    max_lag: float = 0.0
+    last_sent: float = 0.0
+
+
+def load_releases(db: Database, from_date: str, until_date: str, policy: ReminderPolicy,
+                  digest: bool, sizer: DigestSize) -> Tuple[List[Release], datetime]:
+    """Turn the per-chat, per-day exam counts into message batches, with due times in
+    seconds from the earliest one"""
+    batches: Dict[Tuple[int, datetime], List[int]] = {}
+    for chat_id, exam_date, exams, chars, described in db.get_reminder_load(from_date, until_date):
+        # datetime.min: plan past dates too, not only exams that have not started yet
+        for _, due_at in policy.due_times(exam_date, chat_id, now=datetime.min):
+            batch = batches.get((chat_id, due_at))
+            if batch is None:
+                batches[(chat_id, due_at)] = [exams, chars, described]
+            else:
+                batch[0] += exams
+                batch[1] += chars
+                batch[2] += described
+
+    if not batches:
+        return [], None
+    origin = min(due_at for _, due_at in batches)
+    releases = [
+        Release((due_at - origin).total_seconds(), chat_id, exams,
+                sizer.messages(exams, chars, described) if digest else exams)
+        for (chat_id, due_at), (exams, chars, described) in batches.items()
+    ]
+    releases.sort(key=lambda release: release.due)
+    return releases, origin
+
+
+def simulate(releases: Iterable[Release], global_rate: float, chat_rate: float,
+             concurrency: int, plans: Dict[int, ChatPlan]) -> List[Tuple[float, int]]:
+    """Run one worker's releases (sorted by due time) through the fluid model.
+
+    Every chat with messages waiting is served at the same rate, so the
+    model only has to stop when a batch is released or one drains:
+    `served` counts the messages each waiting chat has received so far,
+    and a batch drains when it reaches the batch's mark. That makes it
+    O(batches log batches) however many messages there are. Returns
+    (lag, messages) per batch and updates each chat's plan.
+    """
+    lags = []
+    # Messages sent to every waiting chat since the start, and the time that was reached
+    served, now = 0.0, 0.0
+    # Mark of each waiting chat's last queued batch
+    queued: Dict[int, float] = {}
+    drains: List[Tuple[float, int, float, int]] = []
+
+    def rate() -> float:
+        waiting = len(queued)
+        return min(chat_rate, global_rate / waiting, chat_rate * min(waiting, concurrency) / waiting)
+
+    def advance(until: float):
+        nonlocal served, now
+        # Drain every batch that finishes before `until`
+        while drains:
+            mark, chat_id, due, messages = drains[0]
+            finished = now + (mark - served) / rate()
+            if finished > until:
+                break
+            heapq.heappop(drains)
+            served, now = mark, finished
+            plan = plans[chat_id]
+            plan.max_lag = max(plan.max_lag, finished - due)
+            plan.last_sent = max(plan.last_sent, finished)
+            lags.append((finished - due, messages))
+            if queued[chat_id] == mark:
+                del queued[chat_id]
+        if drains:
+            served += (until - now) * rate()
+        now = until
+
+    for release in releases:
+        advance(release.due)
+        mark = queued.get(release.chat_id, served) + release.messages
+        queued[release.chat_id] = mark
+        heapq.heappush(drains, (mark, release.chat_id, release.due, release.messages))
+        plan = plans[release.chat_id]
+        plan.reminders += release.reminders
+        plan.messages += release.messages
+    advance(math.inf)
+    return lags
+
+
+def percentile(lags: List[Tuple[float, int]], pct: float) -> float:
+    """Lag that `pct` percent of the messages are sent within, from (lag, messages) sorted by lag"""
+    total = sum(messages for _, messages in lags)
+    threshold, seen = total * pct / 100, 0
+    for lag, messages in lags:
+        seen += messages
+        if seen >= threshold:
+            return lag
+    return 0.0
+
+
+def format_seconds(seconds: float) -> str:
+    seconds = round(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m {seconds:02d}s"
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+
+def main(args):
+    started = time.perf_counter()
+    # Read only: never migrate the database being planned for
+    db = Database(args.database_url, init_schema=False)
+    version, latest = db.read_schema_version(), MIGRATIONS[-1].version
+    if version < latest:
+        db.close()
+        sys.exit(f"The database schema is at version {version}, but the planner needs version {latest}. "
+                 f"Start the bot once to migrate it.")
+    policy = db.reminder_policy
+    sizer = DigestSize(Renderer(DEFAULT_LOCALE))
+    releases, origin = load_releases(db, args.from_date, args.to_date, policy, args.digest, sizer)
+    db.close()
+    loaded = time.perf_counter()
+    if not releases:
+        print(f"No exams between {args.from_date} and {args.to_date}")
+        return
+
+    plans = {release.chat_id: ChatPlan(release.chat_id, partition_of(release.chat_id, args.workers))
+             for release in releases}
+    partitions: List[List[Release]] = [[] for _ in range(args.workers)]
+    for release in releases:
+        partitions[plans[release.chat_id].worker].append(release)
+    lags = []
+    for partition in partitions:
+        lags.extend(simulate(partition, args.global_rate / args.workers, args.chat_rate,
+                             args.concurrency, plans))
+    lags.sort()
+    simulated = time.perf_counter()
+
+    reminders = sum(release.reminders for release in releases)
+    messages = sum(release.messages for release in releases)
+    last_due = releases[-1].due
+    last_sent = max(plan.last_sent for plan in plans.values())
+    busiest = {}
+    for release in releases:
+        busiest[release.due] = busiest.get(release.due, 0) + release.messages
+    peak_due, peak_messages = max(busiest.items(), key=lambda item: item[1])
+
+    print(f"Exams {args.from_date} to {args.to_date}: {reminders} reminders for {len(plans)} chats")
+    print(f"Delivery: {'one digest per chat' if args.digest else 'one message per reminder'}, "
+          f"{args.global_rate:g} msg/s over {args.workers} worker(s), {args.chat_rate:g} msg/s per chat, "
+          f"{args.concurrency} chats at once per worker")
+    print(f"Messages:           {messages}")
+    print(f"First due:          {origin:%Y-%m-%d %H:%M}")
+    print(f"Last due:           {origin + timedelta(seconds=last_due):%Y-%m-%d %H:%M}")
+    print(f"Last sent:          {origin + timedelta(seconds=last_sent):%Y-%m-%d %H:%M:%S}")
+    print(f"Sending time:       {format_seconds(messages / args.global_rate)} at the full global rate")
+    print(f"Busiest due time:   {origin + timedelta(seconds=peak_due):%Y-%m-%d %H:%M}, "
+          f"{peak_messages} messages")
+    print(f"Lag after due time: p50 {format_seconds(percentile(lags, 50))}, "
+          f"p95 {format_seconds(percentile(lags, 95))}, max {format_seconds(lags[-1][0])}")
+
+    hottest = heapq.nlargest(args.top, plans.values(), key=lambda plan: (plan.max_lag, plan.messages))
+    print("\nHottest chats (longest wait for their last message):")
+    print(f"{'chat_id':>16}{'worker':>8}{'reminders':>11}{'messages':>10}{'max lag':>14}")
+    for plan in hottest:
+        print(f"{plan.chat_id:>16}{plan.worker:>8}{plan.reminders:>11}{plan.messages:>10}"
+              f"{format_seconds(plan.max_lag):>14}")
+    print(f"\nRead {len(releases)} batches in {loaded - started:.2f}s, simulated in {simulated - loaded:.2f}s")
+
+
+if __name__ == '__main__':
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--from', dest='from_date', default=tomorrow, help='first exam date (default: tomorrow)')
+    parser.add_argument('--to', dest='to_date', help='last exam date (default: the --from date)')
+    parser.add_argument('--database-url', default=DATABASE_URL, help='default: DATABASE_URL')
+    parser.add_argument('--digest', action=argparse.BooleanOptionalAction, default=NOTIFY_DIGEST,
+                        help='one digest per chat and due time (default: NOTIFY_DIGEST)')
+    parser.add_argument('--global-rate', type=float, default=NOTIFY_GLOBAL_RATE,
+                        help='messages per second over all workers (default: NOTIFY_GLOBAL_RATE)')
+    parser.add_argument('--chat-rate', type=float, default=NOTIFY_CHAT_RATE,
+                        help='messages per second to one chat (default: NOTIFY_CHAT_RATE)')
+    parser.add_argument('--concurrency', type=int, default=NOTIFY_CONCURRENCY,
+                        help='chats served at once per worker (default: NOTIFY_CONCURRENCY)')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='worker processes (default: WORKERS)')
+    parser.add_argument('--top', type=int, default=10, help='hottest chats to list')
+    arguments = parser.parse_args()
+    arguments.to_date = arguments.to_date or arguments.from_date
+    main(arguments)
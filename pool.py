@@ -0,0 +1,240 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Callable, Optional
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available in time"""
+
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    waits: int = 0
+    wait_time: float = 0.0
+    created: int = 0
+    closed: int = 0
+    health_check_failures: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived connections with health checks and idle eviction"""
+
+    def __init__(self, factory: Callable, max_size: int = 5, idle_timeout: float = 300,
+                 health_check: Optional[Callable] = None, health_check_interval: float = 30,
+                 acquire_timeout: float = 30, reset: Optional[Callable] = None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        # Called on every returned connection, e.g. to end a transaction a read left open
+        self.reset = reset
+        self.stats = PoolStats()
+        # Idle connections as (connection, last_used) pairs, most recently used on the right
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self.stats.closed += 1
+
+    def _evict_idle(self, now: float):
+        """Close connections that sat idle longer than idle_timeout (caller holds the lock)"""
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._close_quietly(conn)
+
+    def _is_healthy(self, conn, last_used: float, now: float) -> bool:
+        if self.health_check is None or now - last_used < self.health_check_interval:
+            return True
+        try:
+            self.health_check(conn)
+            return True
+        except Exception:
+            self.stats.health_check_failures += 1
+            return False
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Check out a connection, creating one if the pool is below max_size"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited_since = None
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("connection pool is closed")
+                now = time.monotonic()
+                self._evict_idle(now)
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                elif self._size < self.max_size:
+                    # Reserve the slot before connecting so concurrent callers respect max_size
+                    self._size += 1
+                    conn, last_used = None, None
+                else:
+                    if waited_since is None:
+                        waited_since = now
+                        self.stats.waits += 1
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise PoolTimeout(f"no connection available after {timeout}s")
+                    self._cond.wait(remaining)
+                    continue
+
+            if waited_since is not None:
+                with self._cond:
+                    self.stats.wait_time += time.monotonic() - waited_since
+                waited_since = None
+
+            if conn is None:
+                try:
+                    conn = self.factory()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.stats.created += 1
+            elif not self._is_healthy(conn, last_used, time.monotonic()):
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self.stats.checkouts += 1
+            return conn
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if self.reset is not None:
+            try:
+                self.reset(conn)
+            except Exception:
+                self._discard(conn)
+                return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                self._close_quietly(conn)
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        """Drop a broken connection and free its slot"""
+        self._close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with-block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                self._discard(conn)
+                raise
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        """Close all idle connections; checked-out ones are closed when released"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._size -= 1
+                self._close_quietly(conn)
+            self._cond.notify_all()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+
+class ThreadLocalPool:
+    """One long-lived connection per thread, used for SQLite
+
+    The factory should open connections with check_same_thread=False so that
+    close() can shut down every thread's connection from the owning thread.
+    """
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self.stats = PoolStats()
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.factory()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+                self.stats.created += 1
+        with self._lock:
+            self.stats.checkouts += 1
+        return conn
+
+    def release(self, conn):
+        pass
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+
+    def close(self):
+        """Close every connection opened through this pool"""
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                self.stats.closed += 1
+            self._connections.clear()
+        self._local = threading.local()
+
+    @property
+    def size(self) -> int:
+        return len(self._connections)
+
+    @property
+    def idle(self) -> int:
+        return 0
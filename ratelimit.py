@@ -0,0 +1,128 @@
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+
+class Bucket:
+    """Token bucket state for one user or chat"""
+    __slots__ = ('tokens', 'updated', 'warned')
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        # Set once the sender has been told it is throttled, cleared when a command is allowed again
+        self.warned = False
+
+
+class BucketTable:
+    """Token buckets by key, `rate` tokens per second with bursts up to `burst`.
+
+    At most `max_entries` buckets are kept; the least recently used is
+    evicted first. An evicted bucket was idle the longest, so it would
+    most likely have refilled anyway.
+    """
+
+    def __init__(self, rate: float, burst: float, max_entries: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._buckets: 'OrderedDict[Hashable, Bucket]' = OrderedDict()
+
+    def get(self, key: Hashable, now: float) -> Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = Bucket(self.burst, now)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        return bucket
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+@dataclass
+class LimiterStats:
+    allowed: int = 0
+    coalesced: int = 0
+    # (command or 'other', 'user' or 'chat') -> commands dropped
+    throttled: Dict[Tuple[str, str], int] = field(default_factory=lambda: defaultdict(int))
+
+
+class CommandLimiter:
+    """Per-user and per-chat token buckets in front of the bot's commands.
+
+    A command is allowed only while both its sender's and its chat's
+    bucket hold a token; private chats only use the user's bucket. Runs
+    in the event loop, so the state needs no lock. It is per process: with
+    sharded workers a chat's limit is exact (one worker owns the chat),
+    a user's applies separately on each worker. Throttled commands are
+    counted by name only for the known `commands`, anything else a user
+    types counts as 'other'.
+    """
+
+    USER = 'user'
+    CHAT = 'chat'
+    OTHER = 'other'
+
+    def __init__(self, user_rate: float = 0.5, user_burst: float = 5, chat_rate: float = 1,
+                 chat_burst: float = 10, coalesce_seconds: float = 2, max_entries: int = 10000,
+                 commands: Iterable[str] = ()):
+        self.users = BucketTable(user_rate, user_burst, max_entries)
+        self.chats = BucketTable(chat_rate, chat_burst, max_entries)
+        self.coalesce_seconds = coalesce_seconds
+        self.max_entries = max_entries
+        self.commands = frozenset(commands)
+        self.stats = LimiterStats()
+        self._recent: 'OrderedDict[str, float]' = OrderedDict()
+
+    def check(self, command: str, user_id: int, chat_id: int) -> Optional[Bucket]:
+        """Take a token for the command, or return the exhausted bucket if it is throttled"""
+        now = time.monotonic()
+        # A rate of 0 turns that limit off
+        user = self.users.get(user_id, now) if self.users.rate else None
+        chat = self.chats.get(chat_id, now) if self.chats.rate and chat_id != user_id else None
+        for reason, bucket in ((self.USER, user), (self.CHAT, chat)):
+            if bucket is not None and bucket.tokens < 1:
+                self.stats.throttled[(command if command in self.commands else self.OTHER, reason)] += 1
+                return bucket
+
+        for bucket in (user, chat):
+            if bucket is not None:
+                bucket.tokens -= 1
+                bucket.warned = False
+        self.stats.allowed += 1
+        return None
+
+    def coalesce(self, key: str) -> bool:
+        """Whether the same request was answered less than coalesce_seconds ago"""
+        now = time.monotonic()
+        answered_at = self._recent.get(key)
+        if answered_at is not None and now - answered_at < self.coalesce_seconds:
+            self.stats.coalesced += 1
+            return True
+
+        self._recent[key] = now
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+        return False
+
+    def forget(self, key: str):
+        """Answer the next request for key even inside the window, e.g. after the data changed"""
+        self._recent.pop(key, None)
+
+    def metrics(self) -> dict:
+        return {
+            'allowed': self.stats.allowed,
+            'coalesced': self.stats.coalesced,
+            'throttled': dict(self.stats.throttled),
+            'evictions': self.users.evictions + self.chats.evictions,
+            'entries': len(self.users) + len(self.chats) + len(self._recent),
+        }
@@ -0,0 +1,405 @@
+import string
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from telegram.constants import MessageLimit
+
+MAX_MESSAGE_LENGTH = MessageLimit.MAX_TEXT_LENGTH
+# Longer descriptions are shortened in /list so a full page fits in one message
+LIST_DESCRIPTION_CHARS = 300
+
+GROUP_EMOJI = "👥"
+PERSONAL_EMOJI = "👤"
+
+# Placeholders use str.format syntax; every locale defines the same templates
+MESSAGES: Dict[str, Dict[str, str]] = {
+    'ar': {
+        'welcome': (
+            "🎓 مرحباً بك في بوت التذكيرات!\n\n"
+            "📋 الأوامر:\n"
+            "• /add التاريخ العنوان الوصف\n"
+            "• /list عرض المواعيد\n"
+            "• /remove رقم حذف موعد\n"
+            "• /import استيراد مواعيد من ملف CSV أو ICS\n"
+            "• /export تصدير المواعيد\n"
+            "• /lang لغة الرسائل\n"
+            "• /help المساعدة\n\n"
+            "💡 مثال: /add 2024-03-15 امتحان الرياضيات\n\n"
+            "🔔 سيرسل لك تذكير قبل يوم واحد من كل موعد"
+        ),
+        'help': (
+            "📚 دليل الاستخدام\n\n"
+            "🎯 إضافة موعد:\n/add التاريخ العنوان الوصف\n\n"
+            "📅 عرض المواعيد:\n/list\n\n"
+            "🗑️ حذف موعد:\n/remove رقم الموعد\n\n"
+            "📥 استيراد مواعيد من ملف:\nأرسل ملف CSV أو ICS مع التعليق /import\n\n"
+            "📤 تصدير المواعيد:\n/export csv أو /export ics\n\n"
+            "🌐 لغة الرسائل في هذه المحادثة:\n/lang ar أو /lang en\n\n"
+            "💡 أمثلة:\n"
+            "• /add 2024-03-15 امتحان الرياضيات\n"
+            "• /add 2024-03-20 موعد طبيب\n"
+            "• /remove 1\n\n"
+            "🔔 البوت يذكرك قبل يوم واحد من كل موعد"
+        ),
+        'throttled': "⏳ طلبات كثيرة! حاول مرة أخرى بعد قليل",
+        'scope_group': "مجموعة",
+        'scope_personal': "شخصي",
+        'day_today': "اليوم",
+        'day_tomorrow': "غداً",
+        'day_other': "التاريخ",
+        'add_usage': (
+            "❌ خطأ في الاستخدام!\n\n"
+            "📝 الطريقة الصحيحة:\n"
+            "/add التاريخ العنوان الوصف\n\n"
+            "💡 أمثلة:\n"
+            "• /add 2024-03-15 امتحان الرياضيات\n"
+            "• /add 2024-03-20 موعد طبيب"
+        ),
+        'add_past_date': "❌ لا يمكن إضافة مواعيد في الماضي!\n💡 استخدم تاريخ اليوم أو مستقبلي",
+        'add_bad_date': "❌ تنسيق التاريخ غير صحيح!\n💡 استخدم: YYYY-MM-DD\nمثال: 2024-03-15",
+        'added': (
+            "✅ تم إضافة الموعد بنجاح!\n\n"
+            "📅 التاريخ: {exam_date}\n"
+            "📝 العنوان: {title}\n"
+            "{description}"
+            "🆔 الرقم: {exam_id}\n"
+            "{scope_emoji} النطاق: {scope}\n\n"
+            "💡 استخدم /list لرؤية جميع مواعيدك"
+        ),
+        'added_description': "📄 الوصف: {description}\n",
+        'list_empty_group': "📅 لا توجد مواعيد قادمة في المجموعة!\n💡 استخدم /add لإضافة موعد جديد",
+        'list_empty_personal': "📅 لا توجد مواعيد قادمة!\n💡 استخدم /add لإضافة موعدك الأول",
+        'list_header_group': "👥 مواعيد المجموعة:\n\n",
+        'list_header_personal': "👤 مواعيدك الشخصية:\n\n",
+        'list_item': "🎯 {number}. {title}\n📅 {exam_date}\n",
+        'list_item_description': "📝 {description}\n",
+        'list_range': "📄 {first}-{last}\n",
+        'list_footer': "💡 استخدم /remove <رقم> لحذف موعد",
+        'list_prev': "⬅️ السابق",
+        'list_next': "التالي ➡️",
+        'remove_usage': "❌ خطأ في الاستخدام!\n💡 مثال: /remove 1\n🔍 استخدم /list لرؤية أرقام المواعيد",
+        'remove_bad_id': "❌ رقم الموعد غير صحيح!\n💡 مثال: /remove 1",
+        'remove_not_found': "❌ لم يتم العثور على الموعد!\n💡 استخدم /list لرؤية المواعيد المتاحة",
+        'remove_not_owner': "❌ لا يمكنك حذف مواعيد الآخرين!\n👤 يمكنك حذف مواعيدك فقط",
+        'removed': (
+            "✅ تم حذف الموعد بنجاح!\n\n"
+            "📝 العنوان: {title}\n"
+            "📅 التاريخ: {exam_date}\n\n"
+            "💡 استخدم /list لرؤية المواعيد المتبقية"
+        ),
+        'remove_failed': "❌ فشل في حذف الموعد!\n🔄 حاول مرة أخرى",
+        'import_usage': (
+            "❌ أرسل ملف CSV أو ICS مع الأمر /import كتعليق\n"
+            "أو رد على الملف بالأمر /import\n\n"
+            "📄 أعمدة CSV: التاريخ,العنوان,الوصف\n"
+            "💡 مثال: 2024-03-15,امتحان الرياضيات,القاعة 3"
+        ),
+        'import_unsupported': "❌ نوع الملف غير مدعوم!\n💡 استخدم ملف .csv أو .ics",
+        'import_too_large': "❌ الملف كبير جداً! الحد الأقصى {megabytes} ميغابايت",
+        'import_bad_encoding': "❌ تعذر قراءة الملف!\n💡 احفظه بترميز UTF-8",
+        'import_bad_csv': "❌ ملف CSV غير صالح!\n💡 كل سطر: التاريخ,العنوان,الوصف",
+        'imported': "✅ تم استيراد {added} موعد في {elapsed:.2f} ث ({rate:.0f} موعد/ث)",
+        'import_skipped': "\n⚠️ تم تجاهل {skipped} سطر (تاريخ غير صحيح أو في الماضي، أو بدون عنوان، أو عنوان أطول من 255 حرفاً)",
+        'export_bad_format': "❌ الصيغة غير مدعومة!\n💡 مثال: /export csv أو /export ics",
+        'export_empty': "📅 لا توجد مواعيد للتصدير!",
+        'export_caption': "📤 {count} موعد",
+        'lang_current': "🌐 لغة هذه المحادثة: {locale}\n💡 للتغيير: /lang {locales}",
+        'lang_unknown': "❌ لغة غير مدعومة!\n💡 اللغات المتاحة: {locales}",
+        'lang_set': "✅ ستصلك الرسائل بالعربية",
+        'reminder': (
+            "🔔 تذكير بالموعد!\n\n"
+            "📅 {day_label}: {exam_date}\n"
+            "📝 العنوان: {title}\n"
+            "{description}"
+            "{scope_emoji} النطاق: {scope}\n\n"
+            "🎯 لا تنس الاستعداد للموعد!"
+        ),
+        'reminder_description': "📄 الوصف: {description}\n",
+        'digest_header': "🔔 تذكير بالمواعيد ({count})\n",
+        'digest_entry': "\n📅 {day_label}: {exam_date}\n📝 {title}\n{description}",
+        'digest_description': "📄 {description}\n",
+    },
+    'en': {
+        'welcome': (
+            "🎓 Welcome to the reminders bot!\n\n"
+            "📋 Commands:\n"
+            "• /add date title description\n"
+            "• /list show your events\n"
+            "• /remove number delete an event\n"
+            "• /import import events from a CSV or ICS file\n"
+            "• /export export your events\n"
+            "• /lang message language\n"
+            "• /help help\n\n"
+            "💡 Example: /add 2024-03-15 Math exam\n\n"
+            "🔔 You get a reminder one day before each event"
+        ),
+        'help': (
+            "📚 How to use\n\n"
+            "🎯 Add an event:\n/add date title description\n\n"
+            "📅 Show events:\n/list\n\n"
+            "🗑️ Delete an event:\n/remove event number\n\n"
+            "📥 Import events from a file:\nsend a CSV or ICS file with the caption /import\n\n"
+            "📤 Export events:\n/export csv or /export ics\n\n"
+            "🌐 Message language in this chat:\n/lang ar or /lang en\n\n"
+            "💡 Examples:\n"
+            "• /add 2024-03-15 Math exam\n"
+            "• /add 2024-03-20 Doctor\n"
+            "• /remove 1\n\n"
+            "🔔 The bot reminds you one day before each event"
+        ),
+        'throttled': "⏳ Too many requests! Try again in a moment",
+        'scope_group': "group",
+        'scope_personal': "personal",
+        'day_today': "Today",
+        'day_tomorrow': "Tomorrow",
+        'day_other': "Date",
+        'add_usage': (
+            "❌ Wrong usage!\n\n"
+            "📝 Use:\n"
+            "/add date title description\n\n"
+            "💡 Examples:\n"
+            "• /add 2024-03-15 Math exam\n"
+            "• /add 2024-03-20 Doctor"
+        ),
+        'add_past_date': "❌ Events cannot be added in the past!\n💡 Use today's date or a later one",
+        'add_bad_date': "❌ Invalid date format!\n💡 Use: YYYY-MM-DD\nExample: 2024-03-15",
+        'added': (
+            "✅ Event added!\n\n"
+            "📅 Date: {exam_date}\n"
+            "📝 Title: {title}\n"
+            "{description}"
+            "🆔 Number: {exam_id}\n"
+            "{scope_emoji} Scope: {scope}\n\n"
+            "💡 Use /list to see all your events"
+        ),
+        'added_description': "📄 Description: {description}\n",
+        'list_empty_group': "📅 No upcoming events in this group!\n💡 Use /add to add one",
+        'list_empty_personal': "📅 No upcoming events!\n💡 Use /add to add your first one",
+        'list_header_group': "👥 Group events:\n\n",
+        'list_header_personal': "👤 Your events:\n\n",
+        'list_item': "🎯 {number}. {title}\n📅 {exam_date}\n",
+        'list_item_description': "📝 {description}\n",
+        'list_range': "📄 {first}-{last}\n",
+        'list_footer': "💡 Use /remove <number> to delete an event",
+        'list_prev': "⬅️ Previous",
+        'list_next': "Next ➡️",
+        'remove_usage': "❌ Wrong usage!\n💡 Example: /remove 1\n🔍 Use /list to see event numbers",
+        'remove_bad_id': "❌ Invalid event number!\n💡 Example: /remove 1",
+        'remove_not_found': "❌ Event not found!\n💡 Use /list to see your events",
+        'remove_not_owner': "❌ You cannot delete other people's events!\n👤 You can only delete your own",
+        'removed': (
+            "✅ Event deleted!\n\n"
+            "📝 Title: {title}\n"
+            "📅 Date: {exam_date}\n\n"
+            "💡 Use /list to see the remaining events"
+        ),
+        'remove_failed': "❌ Could not delete the event!\n🔄 Please try again",
+        'import_usage': (
+            "❌ Send a CSV or ICS file with /import as its caption\n"
+            "or reply /import to the file\n\n"
+            "📄 CSV columns: date,title,description\n"
+            "💡 Example: 2024-03-15,Math exam,Room 3"
+        ),
+        'import_unsupported': "❌ Unsupported file type!\n💡 Use a .csv or .ics file",
+        'import_too_large': "❌ The file is too large! The limit is {megabytes} MB",
+        'import_bad_encoding': "❌ Could not read the file!\n💡 Save it as UTF-8",
+        'import_bad_csv': "❌ The file is not valid CSV!\n💡 Each line: date,title,description",
+        'imported': "✅ Imported {added} events in {elapsed:.2f}s ({rate:.0f} events/s)",
+        'import_skipped': "\n⚠️ Skipped {skipped} rows (invalid or past date, no title, or a title over 255 characters)",
+        'export_bad_format': "❌ Unsupported format!\n💡 Example: /export csv or /export ics",
+        'export_empty': "📅 No events to export!",
+        'export_caption': "📤 {count} events",
+        'lang_current': "🌐 Language of this chat: {locale}\n💡 To change it: /lang {locales}",
+        'lang_unknown': "❌ Unsupported language!\n💡 Available: {locales}",
+        'lang_set': "✅ Messages will be sent in English",
+        'reminder': (
+            "🔔 Event reminder!\n\n"
+            "📅 {day_label}: {exam_date}\n"
+            "📝 Title: {title}\n"
+            "{description}"
+            "{scope_emoji} Scope: {scope}\n\n"
+            "🎯 Don't forget to prepare!"
+        ),
+        'reminder_description': "📄 Description: {description}\n",
+        'digest_header': "🔔 Event reminders ({count})\n",
+        'digest_entry': "\n📅 {day_label}: {exam_date}\n📝 {title}\n{description}",
+        'digest_description': "📄 {description}\n",
+    },
+}
+
+
+def check_template(text: str) -> Callable[..., str]:
+    """Check a str.format-style template once and return a function taking its placeholders as keywords.
+
+    Placeholders must be plain names, optionally with a literal format spec
+    such as `{elapsed:.2f}`. Indexes, attributes, conversions and nested
+    fields are rejected, so rendering can only substitute the given values.
+    """
+    for _, field, spec, conversion in string.Formatter().parse(text):
+        if field is None:
+            continue
+        if not field.isidentifier() or conversion or '{' in spec:
+            raise ValueError(f"template placeholders must be plain names with a literal format spec, "
+                             f"got {{{field}{'!' + conversion if conversion else ''}{':' + spec if spec else ''}}}")
+    return text.format
+
+
+def message_length(text: str) -> int:
+    # Telegram counts UTF-16 code units, so an emoji takes two
+    return len(text.encode('utf-16-le')) // 2
+
+
+def fit(text: str, limit: int = MAX_MESSAGE_LENGTH) -> str:
+    """Cut text short so it fits in one message"""
+    encoded = text.encode('utf-16-le')
+    if len(encoded) <= 2 * limit:
+        return text
+    # 'ignore' drops half of an emoji's surrogate pair left at the cut
+    return encoded[:2 * (limit - 1)].decode('utf-16-le', 'ignore') + '…'
+
+
+def shorten(text: str, length: int) -> str:
+    return text if len(text) <= length else text[:length - 1] + '…'
+
+
+def split_message(header: str, entries: Sequence[str], limit: int = MAX_MESSAGE_LENGTH) -> List[Tuple[str, range]]:
+    """Pack entries under header into as few messages of at most `limit` as possible.
+
+    Returns (text, indexes of the entries it holds) per message; messages
+    are only split between entries, and an entry too long for any message
+    is cut short.
+    """
+    messages = []
+    header_length = message_length(header)
+    parts, first, length = [header], 0, header_length
+    for index, entry in enumerate(entries):
+        entry_length = message_length(entry)
+        if length + entry_length > limit and len(parts) > 1:
+            messages.append((''.join(parts), range(first, index)))
+            parts, first, length = [header], index, header_length
+        if length + entry_length > limit:
+            entry = fit(entry, limit - length)
+            entry_length = message_length(entry)
+        parts.append(entry)
+        length += entry_length
+    messages.append((''.join(parts), range(first, len(entries))))
+    return messages
+
+
+class Catalog:
+    """One locale's messages, each checked once and bound to a method taking its placeholders as keywords"""
+
+    def __init__(self, locale: str, templates: Dict[str, str]):
+        self.locale = locale
+        for name, text in templates.items():
+            setattr(self, name, check_template(text))
+
+
+class Renderer:
+    """Render the bot's replies and reminders in a chat's locale.
+
+    Catalogs are checked when the Renderer is built; chats that chose no
+    locale, or one that is not available, get `default_locale`. Multi-part
+    messages are built as a list of parts joined once.
+    """
+
+    def __init__(self, default_locale: str = 'ar', messages: Dict[str, Dict[str, str]] = None):
+        messages = messages or MESSAGES
+        self.catalogs = {locale: Catalog(locale, templates) for locale, templates in messages.items()}
+        if default_locale not in self.catalogs:
+            raise ValueError(f"no messages for the default locale {default_locale!r}")
+        self.default_locale = default_locale
+
+    @property
+    def locales(self) -> List[str]:
+        return sorted(self.catalogs)
+
+    def catalog(self, locale: Optional[str] = None) -> Catalog:
+        return self.catalogs.get(locale) or self.catalogs[self.default_locale]
+
+    @staticmethod
+    def _day_labels(t: Catalog, today: date) -> Callable[[object], str]:
+        """Label exam dates relative to today, parsing each distinct date once"""
+        labels = {}
+
+        def day_label(exam_date) -> str:
+            label = labels.get(exam_date)
+            if label is None:
+                days_left = (date.fromisoformat(str(exam_date)) - today).days
+                label = labels[exam_date] = (
+                    t.day_today() if days_left == 0 else t.day_tomorrow() if days_left == 1 else t.day_other()
+                )
+            return label
+        return day_label
+
+    def added(self, locale: Optional[str], exam_id: int, exam_date: str, title: str,
+              description: str, is_group: bool) -> str:
+        t = self.catalog(locale)
+        return t.added(
+            exam_date=exam_date, title=title, exam_id=exam_id,
+            description=t.added_description(description=description) if description else '',
+            scope_emoji=GROUP_EMOJI if is_group else PERSONAL_EMOJI,
+            scope=t.scope_group() if is_group else t.scope_personal()
+        )
+
+    def list_entries(self, locale: Optional[str], events: Sequence, offset: int = 0) -> List[str]:
+        """One /list entry per event, numbered from offset + 1"""
+        t = self.catalog(locale)
+        item, item_description = t.list_item, t.list_item_description
+        entries = []
+        for number, event in enumerate(events, offset + 1):
+            entry = item(number=number, title=event.title, exam_date=event.exam_date)
+            if event.description:
+                entry += item_description(description=shorten(event.description, LIST_DESCRIPTION_CHARS))
+            entries.append(entry + '\n\n')
+        return entries
+
+    def list_page(self, locale: Optional[str], events: Sequence, is_group: bool,
+                  offset: int = 0, paged: bool = False) -> str:
+        """One /list page; `paged` adds the position of the page in the whole list"""
+        t = self.catalog(locale)
+        if not events:
+            return t.list_empty_group() if is_group else t.list_empty_personal()
+        parts = [t.list_header_group() if is_group else t.list_header_personal()]
+        parts += self.list_entries(locale, events, offset)
+        if paged:
+            parts.append(t.list_range(first=offset + 1, last=offset + len(events)))
+        parts.append(t.list_footer())
+        return fit(''.join(parts))
+
+    def list_messages(self, locale: Optional[str], events: Sequence, is_group: bool) -> List[str]:
+        """A whole list as few messages as the length limit allows"""
+        t = self.catalog(locale)
+        if not events:
+            return [t.list_empty_group() if is_group else t.list_empty_personal()]
+        header = t.list_header_group() if is_group else t.list_header_personal()
+        return [text for text, _ in split_message(header, self.list_entries(locale, events))]
+
+    def reminder(self, notification, today: date = None) -> str:
+        """The reminder for one notification, in its chat's locale"""
+        t = self.catalog(notification.locale)
+        is_group = notification.is_group_exam
+        return t.reminder(
+            day_label=self._day_labels(t, today or date.today())(notification.exam_date),
+            exam_date=notification.exam_date,
+            title=notification.title,
+            description=t.reminder_description(description=notification.description) if notification.description else '',
+            scope_emoji=GROUP_EMOJI if is_group else PERSONAL_EMOJI,
+            scope=t.scope_group() if is_group else t.scope_personal()
+        )
+
+    def digest(self, notifications: Sequence, today: date = None) -> Tuple[str, List[str]]:
+        """The header and one entry per notification of a chat's reminder digest"""
+        t = self.catalog(notifications[0].locale)
+        day_label = self._day_labels(t, today or date.today())
+        entry, entry_description = t.digest_entry, t.digest_description
+        entries = [
+            entry(
+                day_label=day_label(notification.exam_date),
+                exam_date=notification.exam_date,
+                title=notification.title,
+                description=entry_description(description=notification.description) if notification.description else ''
+            )
+            for notification in notifications
+        ]
+        return t.digest_header(count=len(notifications)), entries
@@ -0,0 +1,145 @@
+import asyncio
+import heapq
+import logging
+import os
+import time as monotonic_time
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Awaitable, Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+@dataclass(frozen=True)
+class ReminderPolicy:
+    """When reminders are due relative to an exam.
+
+    Exams only carry a date, so each exam is anchored at `anchor` on its
+    date and one reminder is due `lead` minutes before that for every lead
+    time. With the defaults this is 9:00 the day before, as before. A
+    per-chat offset of up to `spread_minutes` spreads the load so not every
+    chat is due in the same minute; a chat's reminders keep the same offset.
+    """
+    lead_minutes: Tuple[int, ...] = (1440,)
+    anchor: time = time(hour=9, minute=0)
+    spread_minutes: int = 0
+
+    @classmethod
+    def from_env(cls) -> 'ReminderPolicy':
+        leads = tuple(int(lead) for lead in os.getenv('REMINDER_LEAD_MINUTES', '1440').split(',') if lead.strip())
+        hour, minute = os.getenv('REMINDER_TIME', '09:00').split(':')
+        return cls(
+            lead_minutes=leads,
+            anchor=time(hour=int(hour), minute=int(minute)),
+            spread_minutes=int(os.getenv('REMINDER_SPREAD_MINUTES', '60'))
+        )
+
+    def chat_offset(self, chat_id: int) -> timedelta:
+        if not self.spread_minutes:
+            return timedelta(0)
+        # Multiplicative hash so neighbouring chat ids land far apart
+        return timedelta(minutes=(chat_id * 2654435761) % 2 ** 32 % self.spread_minutes)
+
+    def due_times(self, exam_date: str, chat_id: int, now: datetime = None) -> List[Tuple[int, datetime]]:
+        """Return (lead_minutes, due_at) for each reminder of an exam that has not started yet"""
+        now = now or datetime.now()
+        anchor = datetime.combine(date.fromisoformat(str(exam_date)), self.anchor)
+        if anchor <= now:
+            return []
+        offset = self.chat_offset(chat_id)
+        return [(lead, anchor - timedelta(minutes=lead) + offset) for lead in self.lead_minutes]
+
+
+def parse_due_at(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.strptime(value, DATETIME_FORMAT)
+
+
+class ReminderScheduler:
+    """Fire due reminders from a min-heap of upcoming due times.
+
+    The heap holds the distinct due times of pending outbox rows within
+    `horizon_seconds`, reloaded every `refresh_seconds` and topped up as
+    exams are added. When the earliest entry comes due, `fire` is awaited;
+    it is expected to drain every reminder due by then (OutboxWorker.drain).
+    Rows are claimed through the database, so each replica may run its own
+    scheduler.
+    """
+
+    def __init__(self, db, fire: Callable[[], Awaitable], policy: ReminderPolicy,
+                 horizon_seconds: int = 600, refresh_seconds: int = 60,
+                 max_lateness_seconds: int = 43200):
+        self.db = db
+        self.fire = fire
+        self.policy = policy
+        self.horizon = timedelta(seconds=horizon_seconds)
+        self.refresh_seconds = refresh_seconds
+        self.max_lateness = timedelta(seconds=max_lateness_seconds)
+        self._heap: List[datetime] = []
+        self._queued = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def schedule(self, due_at: datetime):
+        """Add a due time to the heap if it falls inside the horizon"""
+        if due_at in self._queued or due_at > datetime.now() + self.horizon:
+            return
+        self._queued.add(due_at)
+        heapq.heappush(self._heap, due_at)
+        self._wakeup.set()
+
+    def schedule_exam(self, exam_date: str, chat_id: int):
+        """Track the reminders of a newly added exam"""
+        for _, due_at in self.policy.due_times(exam_date, chat_id):
+            self.schedule(due_at)
+
+    async def refresh(self):
+        now = datetime.now()
+        due_times = await self.db.get_upcoming_due_times(
+            until=(now + self.horizon).strftime(DATETIME_FORMAT),
+            not_before=(now - self.max_lateness).strftime(DATETIME_FORMAT)
+        )
+        for due_at in due_times:
+            self.schedule(parse_due_at(due_at))
+
+    async def run(self):
+        next_refresh = 0.0
+        while True:
+            try:
+                if monotonic_time.monotonic() >= next_refresh:
+                    next_refresh = monotonic_time.monotonic() + self.refresh_seconds
+                    await self.refresh()
+
+                now = datetime.now()
+                if self._heap and self._heap[0] <= now:
+                    while self._heap and self._heap[0] <= now:
+                        self._queued.discard(heapq.heappop(self._heap))
+                    await self.fire()
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reminder scheduler iteration failed: {e}")
+
+            timeout = max(0.0, next_refresh - monotonic_time.monotonic())
+            if self._heap:
+                timeout = min(timeout, (self._heap[0] - datetime.now()).total_seconds())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
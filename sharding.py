@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue
+import signal
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from telegram import Update
+from telegram.ext import Application, BaseUpdateProcessor, ContextTypes, TypeHandler
+
+from app import AppContext
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+def partition_of(chat_id: int, count: int) -> int:
+    """Worker index that owns chat_id; must match dialects.CHAT_PARTITION in SQL"""
+    return ((abs(chat_id) % 2 ** 32) * 1597334677 % 2 ** 32 >> 16) % count
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Process updates concurrently, but each chat's updates one at a time in arrival order.
+
+    At most `max_concurrent_updates` handlers run at once. An update waits
+    for its chat's lock before taking a slot, so a busy chat never holds
+    slots other chats could use.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        # The slots are enforced below, after the per-chat lock
+        super().__init__(sys.maxsize)
+        self.slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_waiters: Dict[int, int] = defaultdict(int)
+
+    async def do_process_update(self, update: object, coroutine):
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            async with self.slots:
+                await coroutine
+            return
+
+        lock = self._chat_locks.setdefault(chat.id, asyncio.Lock())
+        self._chat_waiters[chat.id] += 1
+        try:
+            async with lock, self.slots:
+                await coroutine
+        finally:
+            self._chat_waiters[chat.id] -= 1
+            if not self._chat_waiters[chat.id]:
+                del self._chat_waiters[chat.id]
+                del self._chat_locks[chat.id]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+class Supervisor:
+    """Run the bot as `workers` processes, each owning one chat_id partition.
+
+    The supervisor alone receives updates from Telegram (long polling or
+    webhook, as configured) and forwards each one, in order, to the worker
+    that owns its chat. Every worker runs a full ExamBot without an updater;
+    its reminder scheduler and outbox only see its own partition's chats.
+    """
+
+    def __init__(self, workers: int, max_restarts: int = 3, restart_window: float = 60,
+                 check_interval: float = 1.0):
+        self.context = multiprocessing.get_context('spawn')
+        self.queues = [self.context.Queue() for _ in range(workers)]
+        self.processes = [self.spawn(index) for index in range(workers)]
+        self.routed: List[int] = [0] * workers
+        # A worker that dies more than max_restarts times within restart_window seconds stops the bot
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.check_interval = check_interval
+        self.restarts: List[List[float]] = [[] for _ in range(workers)]
+        self._watcher = None
+
+    def spawn(self, index: int) -> multiprocessing.Process:
+        return self.context.Process(target=run_worker, args=(index, len(self.queues), self.queues[index]),
+                                    name=f"worker-{index}")
+
+    def check_workers(self, application: Application) -> bool:
+        """Restart dead workers; returns False, after stopping the bot, if one keeps dying.
+
+        A restarted worker reads on from its queue, so the updates routed
+        to its partition while it was down are not lost.
+        """
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            recent = [died_at for died_at in self.restarts[index] if now - died_at < self.restart_window]
+            if len(recent) >= self.max_restarts:
+                logger.critical(f"{process.name} exited with code {process.exitcode} {len(recent) + 1} times "
+                                f"within {self.restart_window:g}s; stopping the bot")
+                application.stop_running()
+                return False
+            logger.error(f"{process.name} exited with code {process.exitcode}; restarting it")
+            self.restarts[index] = recent + [now]
+            self.processes[index] = self.spawn(index)
+            self.processes[index].start()
+        return True
+
+    async def watch(self, application: Application):
+        while self.check_workers(application):
+            await asyncio.sleep(self.check_interval)
+
+    async def route(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        chat = update.effective_chat
+        # Updates without a chat (none of the bot's handlers use them) go to worker 0
+        index = partition_of(chat.id, len(self.queues)) if chat else 0
+        self.queues[index].put(update.to_json())
+        self.routed[index] += 1
+
+    async def post_init(self, application: Application):
+        # Migrate once here rather than in every worker at the same time
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: Database().close())
+        for process in self.processes:
+            process.start()
+        logger.info(f"Started {len(self.processes)} workers: {[process.pid for process in self.processes]}")
+        self._watcher = asyncio.create_task(self.watch(application))
+
+    async def post_shutdown(self, application: Application):
+        loop = asyncio.get_running_loop()
+        if self._watcher is not None:
+            self._watcher.cancel()
+        for updates in self.queues:
+            updates.put(None)
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join, 30)
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop in time; terminating it")
+                process.terminate()
+        logger.info(f"Workers stopped; updates routed per worker: {self.routed}")
+
+    def build_application(self) -> Application:
+        from bot import application_builder
+
+        application = (
+            application_builder()
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+            .build()
+        )
+        # Updates are routed one at a time so each worker receives them in order
+        application.add_handler(TypeHandler(Update, self.route))
+        return application
+
+    def run(self):
+        from bot import run_application
+
+        run_application(self.build_application())
+
+
+def run_worker(index: int, count: int, updates: multiprocessing.Queue):
+    """Entry point of a worker process"""
+    # Ctrl-C reaches the whole process group; the supervisor stops workers in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from bot import ExamBot, build_application
+
+    app = AppContext(partition=(index, count))
+    exam_bot = ExamBot(app)
+    application = build_application(exam_bot, updater=False)
+    logger.info(f"Worker {index}/{count} serving chats with partition_of(chat_id, {count}) == {index}")
+    asyncio.run(serve_worker(app, application, updates))
+
+
+async def serve_worker(app: AppContext, application: Application, updates: multiprocessing.Queue):
+    """Feed routed updates into the Application until the supervisor sends None"""
+    await app.startup(network=application.initialize())
+    await application.post_init(application)
+    await application.start()
+
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+    try:
+        while True:
+            try:
+                data = await loop.run_in_executor(None, updates.get, True, 1.0)
+            except queue.Empty:
+                # Exit if the supervisor died without saying goodbye
+                if parent is not None and not parent.is_alive():
+                    break
+                continue
+            if data is None:
+                break
+            await application.update_queue.put(Update.de_json(json.loads(data), application.bot))
+    finally:
+        # stop() lets the updates already queued finish
+        await application.stop()
+        await application.post_shutdown(application)
+        await application.shutdown()
@@ -0,0 +1,43 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from scheduler import ReminderPolicy
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'exams.db'}"
+
+
+@pytest.fixture
+def db(database_url):
+    # No spread, so every reminder of a day is due at the same time
+    database = Database(database_url, reminder_policy=ReminderPolicy(spread_minutes=0))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def exam_date():
+    return (date.today() + timedelta(days=7)).isoformat()
+
+
+class FakeBot:
+    """Records sent messages instead of calling the Bot API"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+
+@pytest.fixture
+def bot():
+    return FakeBot()
@@ -0,0 +1,111 @@
+import asyncio
+import gzip
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import database
+from archiver import Archiver
+from async_database import AsyncDatabase
+from database import Database
+from models import Exam
+from scheduler import DATETIME_FORMAT
+from sharding import partition_of
+
+
+def add_past_exams(db, count):
+    past = (date.today() - timedelta(days=60)).isoformat()
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            db.dialect.compile('INSERT INTO exams (user_id, chat_id, exam_date, title, description, is_group_exam) '
+                               'VALUES (?, ?, ?, ?, ?, ?)'),
+            [(1, -1, past, f'Exam {i}', '', True) for i in range(count)]
+        )
+        conn.commit()
+    return past
+
+
+def count_exams(db):
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM exams')
+        return cursor.fetchone()[0]
+
+
+def read_archive(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        return [json.loads(line)['id'] for line in archive]
+
+
+def test_archive_file_gets_each_exam_once(db, tmp_path):
+    add_past_exams(db, 25)
+    path = str(tmp_path / 'archive.jsonl.gz')
+    archiver = Archiver(AsyncDatabase(db), batch_size=10, pause_seconds=0, path=path)
+    archiver.reminders_due = lambda: asyncio.sleep(0, result=False)
+
+    report = asyncio.run(archiver.run_once())
+
+    ids = read_archive(path)
+    assert report.archived == 25 and len(ids) == 25 == len(set(ids))
+    assert count_exams(db) == 0
+
+
+def test_failed_write_keeps_the_rows(db):
+    before_date = date.today().isoformat()
+    add_past_exams(db, 5)
+
+    def failing_sink(exams):
+        raise OSError('disk full')
+
+    with pytest.raises(OSError):
+        db.archive_exams(before_date, sink=failing_sink)
+    assert count_exams(db) == 5
+
+
+def test_batch_changed_after_select_is_retried(db, monkeypatch):
+    # The first select returns a row that is already gone, as if /remove deleted it meanwhile
+    before_date = add_past_exams(db, 3)
+    mapper, calls = database.EXAM, []
+
+    class RacingMapper:
+        def all(self, rows):
+            exams = mapper.all(rows)
+            calls.append(len(exams))
+            if len(calls) == 1:
+                exams.append(Exam(10 ** 6, 1, -1, before_date, 'Removed', '', True))
+            return exams
+
+    monkeypatch.setattr(database, 'EXAM', RacingMapper())
+    written = []
+
+    assert db.archive_exams(date.today().isoformat(), sink=written.extend) == 3
+    assert len(calls) == 2 and len(written) == 3
+    assert count_exams(db) == 0
+
+
+def test_reminder_guard_covers_every_partition(db, database_url, exam_date):
+    other_chat = next(chat_id for chat_id in range(-1, -100, -1) if partition_of(chat_id, 2) == 1)
+    db.add_exam(1, other_chat, exam_date, 'Exam', '', True)
+    worker_0 = Database(database_url, partition=(0, 2))
+    archiver = Archiver(AsyncDatabase(worker_0), guard_minutes=15)
+
+    def set_notification(due_at, status):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(db.dialect.compile('UPDATE notifications SET due_at = ?, status = ?'),
+                           (due_at.strftime(DATETIME_FORMAT), status))
+            conn.commit()
+
+    now = datetime.now()
+    try:
+        assert not asyncio.run(archiver.reminders_due())
+        set_notification(now + timedelta(minutes=10), 'pending')
+        assert asyncio.run(archiver.reminders_due())
+        set_notification(now - timedelta(minutes=10), 'sending')
+        assert asyncio.run(archiver.reminders_due())
+        set_notification(now - timedelta(minutes=10), 'sent')
+        assert not asyncio.run(archiver.reminders_due())
+    finally:
+        asyncio.run(archiver.db.close())
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from async_database import GroupCommitWriter
+
+
+class FailingTitle:
+    """Delegates to the database, but a transaction with an exam titled 'bad' fails"""
+
+    def __init__(self, db):
+        self.db = db
+        self.transactions = []
+
+    def write_batch(self, writes):
+        self.transactions.append(len(writes))
+        if any(kind == 'add' and args[3] == 'bad' for kind, args in writes):
+            raise ValueError('bad title')
+        return self.db.write_batch(writes)
+
+
+async def run(func, *args):
+    return func(*args)
+
+
+def add(writer, exam_date, title, user_id=1):
+    return writer.submit('add', user_id, user_id, str(exam_date), title, '', False)
+
+
+def test_concurrent_writes_commit_together(db, exam_date):
+    database = FailingTitle(db)
+
+    async def main():
+        writer = GroupCommitWriter(database, run, window=0.01, max_batch=100)
+        ids = await asyncio.gather(*(add(writer, exam_date, f'E{i}', user_id=i) for i in range(5)))
+        removed = await asyncio.gather(writer.submit('remove', ids[0], 0), writer.submit('remove', ids[1], 1))
+        return writer, ids, removed
+
+    writer, ids, removed = asyncio.run(main())
+    assert database.transactions == [5, 2]
+    assert (writer.batches, writer.writes) == (2, 7)
+    assert len(set(ids)) == 5
+    assert removed == [True, True]
+    assert [exam.title for exam in db.get_exams_for_user(2, 2)] == ['E2']
+
+
+def test_full_batch_is_committed_without_waiting(db, exam_date):
+    database = FailingTitle(db)
+
+    async def main():
+        writer = GroupCommitWriter(database, run, window=60, max_batch=3)
+        return await asyncio.wait_for(
+            asyncio.gather(*(add(writer, exam_date, f'E{i}') for i in range(3))), timeout=5)
+
+    assert len(asyncio.run(main())) == 3
+    assert database.transactions == [3]
+
+
+def test_failed_batch_is_retried_one_write_at_a_time(db, exam_date):
+    database = FailingTitle(db)
+
+    async def main():
+        writer = GroupCommitWriter(database, run, window=0.01)
+        return await asyncio.gather(add(writer, exam_date, 'Math'), add(writer, exam_date, 'bad'),
+                                    add(writer, exam_date, 'Physics'), return_exceptions=True)
+
+    good, bad, other = asyncio.run(main())
+    assert isinstance(bad, ValueError)
+    assert isinstance(good, int) and isinstance(other, int)
+    assert database.transactions == [3, 1, 1, 1]
+    assert sorted(exam.title for exam in db.get_exams_for_user(1, 1)) == ['Math', 'Physics']
+
+
+def test_single_failed_write_is_not_retried(db, exam_date):
+    database = FailingTitle(db)
+
+    async def main():
+        writer = GroupCommitWriter(database, run, window=0.01)
+        with pytest.raises(ValueError):
+            await add(writer, exam_date, 'bad')
+
+    asyncio.run(main())
+    assert database.transactions == [1]
+
+
+def test_cancelled_caller_does_not_break_the_batch(db, exam_date):
+    database = FailingTitle(db)
+
+    async def main():
+        writer = GroupCommitWriter(database, run, window=0.01)
+        cancelled = asyncio.ensure_future(add(writer, exam_date, 'Math'))
+        kept = asyncio.ensure_future(add(writer, exam_date, 'Physics'))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await kept
+
+    assert isinstance(asyncio.run(main()), int)
+    # The cancelled write was already queued and is still committed
+    assert len(db.get_exams_for_user(1, 1)) == 2
+
+
+def test_close_commits_pending_writes(db, exam_date):
+    database = FailingTitle(db)
+
+    async def main():
+        writer = GroupCommitWriter(database, run, window=60)
+        pending = asyncio.ensure_future(add(writer, exam_date, 'Math'))
+        await asyncio.sleep(0)
+        await writer.close()
+        return await pending
+
+    assert isinstance(asyncio.run(main()), int)
+    assert database.transactions == [1]
@@ -0,0 +1,50 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram.ext import ApplicationHandlerStop
+
+from app import AppContext
+from bot import COMMANDS, ExamBot
+from ratelimit import CommandLimiter
+
+
+def test_post_shutdown_flushes_writes_and_closes_the_database(db, exam_date, monkeypatch):
+    monkeypatch.setenv('DB_WRITE_BATCH_MS', '60000')
+    exam_bot = ExamBot(AppContext(database=db))
+
+    async def run():
+        # Held by the long batch window until shutdown flushes it
+        add = asyncio.ensure_future(exam_bot.app.db.add_exam(1, 1, str(exam_date), 'Math', '', False))
+        await asyncio.sleep(0)
+        assert not add.done()
+        await exam_bot.post_shutdown(None)
+        return await add
+
+    assert asyncio.run(run())
+    assert exam_bot.app.db.executor._shutdown
+    assert [exam.title for exam in db.get_exams_for_user(1, 1)] == ['Math']
+
+
+def test_throttle_ignores_commands_for_other_bots(db):
+    exam_bot = ExamBot(AppContext(database=db))
+    exam_bot.limiter = CommandLimiter(user_rate=0.001, user_burst=1, chat_rate=0, commands=COMMANDS)
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    def throttle(text):
+        message = SimpleNamespace(text=text, caption=None, reply_text=reply_text)
+        update = SimpleNamespace(effective_message=message, effective_user=SimpleNamespace(id=5),
+                                 effective_chat=SimpleNamespace(id=-100))
+        context = SimpleNamespace(bot=SimpleNamespace(username='ExamBot'))
+        return asyncio.run(exam_bot.throttle(update, context))
+
+    for _ in range(3):
+        throttle('/list@other_bot')
+    throttle('/list@exambot')
+    with pytest.raises(ApplicationHandlerStop):
+        throttle('/list')
+    assert len(replies) == 1
+    assert exam_bot.limiter.metrics()['throttled'] == {('list', 'user'): 1}
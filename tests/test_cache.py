@@ -0,0 +1,83 @@
+import pytest
+
+import cache
+from cache import ListCache, LocalBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, 'time', clock)
+    return clock
+
+
+def test_entries_expire_after_their_ttl(clock):
+    backend = LocalBackend()
+    backend.set('a', 'A', ttl=10)
+    clock.now += 10
+    assert backend.get('a') == 'A'
+    clock.now += 0.001
+    assert backend.get('a') is None
+    # An expired entry is dropped when it is read
+    assert len(backend) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    backend = LocalBackend(max_entries=2)
+    backend.set('a', 'A', ttl=60)
+    backend.set('b', 'B', ttl=60)
+    assert backend.get('a') == 'A'
+    backend.set('c', 'C', ttl=60)
+    assert backend.get('b') is None
+    assert (backend.get('a'), backend.get('c')) == ('A', 'C')
+    assert backend.evictions == 1 and len(backend) == 2
+
+
+def test_setting_a_key_again_refreshes_it(clock):
+    backend = LocalBackend(max_entries=2)
+    backend.set('a', 'A', ttl=5)
+    backend.set('b', 'B', ttl=60)
+    clock.now += 4
+    backend.set('a', 'A2', ttl=5)
+    backend.set('c', 'C', ttl=60)
+    clock.now += 4
+    assert backend.get('a') == 'A2' and backend.get('b') is None
+
+
+def test_hits_misses_and_invalidations_are_counted(clock):
+    lists = ListCache(ttl=60)
+    assert lists.get(1, 1, ListCache.PERSONAL) is None
+    lists.set(1, 1, ListCache.PERSONAL, 'mine')
+    assert lists.get(1, 1, ListCache.PERSONAL) == 'mine'
+    lists.invalidate(1, 1, is_group=False)
+    assert lists.get(1, 1, ListCache.PERSONAL) is None
+    assert lists.metrics() == {'hits': 1, 'misses': 2, 'invalidations': 1, 'hit_rate': 1 / 3, 'evictions': 0}
+
+
+def test_group_list_is_shared_by_members_and_invalidated_by_any(clock):
+    lists = ListCache(ttl=60)
+    lists.set(-10, 1, ListCache.GROUP, 'group list')
+    assert lists.get(-10, 2, ListCache.GROUP) == 'group list'
+    # A member's personal list in the group is theirs alone
+    lists.set(-10, 1, ListCache.PERSONAL, 'personal list')
+    assert lists.get(-10, 2, ListCache.PERSONAL) is None
+
+    # A group exam added by member 2 drops the shared list but not member 1's own
+    lists.invalidate(-10, 2, is_group=True)
+    assert lists.get(-10, 1, ListCache.GROUP) is None
+    assert lists.get(-10, 1, ListCache.PERSONAL) == 'personal list'
+    lists.invalidate(-10, 1, is_group=False)
+    assert lists.get(-10, 1, ListCache.PERSONAL) is None
+
+
+def test_keys():
+    assert ListCache.key(-10, 7, ListCache.GROUP) == ListCache.key(-10, 8, ListCache.GROUP) == '-10:0:group'
+    assert ListCache.key(-10, 7, ListCache.PERSONAL) == '-10:7:personal'
@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+
+from database import EXAM, NOTIFICATION
+from models import Exam
+
+
+def days_from_now(days: int) -> str:
+    return (date.today() + timedelta(days=days)).isoformat()
+
+
+def test_row_mapper_builds_records_with_bool_flags():
+    assert EXAM((1, 2, -3, '2030-01-01', 'Exam', '', 1)) == Exam(1, 2, -3, '2030-01-01', 'Exam', '', True)
+    notifications = NOTIFICATION.all([(1, 0, 1440, 'c', 2, 3, -4, '2030-01-01', 'Exam', '', 0, 'en')])
+    assert notifications[0].is_group_exam is False and notifications[0].locale == 'en'
+
+
+def test_add_and_fetch_exam(db, exam_date):
+    exam_id = db.add_exam(7, -7, exam_date, 'Exam', 'Room 1', True)
+    exam = db.get_exam_by_id(exam_id)
+    assert exam == Exam(exam_id, 7, -7, exam_date, 'Exam', 'Room 1', True)
+    assert type(exam.is_group_exam) is bool
+
+
+def add_exams(db, dates, user_id=1, chat_id=1, is_group_exam=False):
+    for i, exam_date in enumerate(dates):
+        db.add_exam(user_id, chat_id, exam_date, f'E{i}', '', is_group_exam)
+
+
+def cursor_of(exam):
+    return exam.exam_date, exam.id
+
+
+def test_upcoming_pages_walk_forward_and_back(db):
+    # Several exams share a date, and ids do not follow date order
+    add_exams(db, [days_from_now(days) for days in (3, 1, 2, 1, 3, 5, 2, 1, 9, 4)])
+    # Outside the user's range or chat
+    add_exams(db, [days_from_now(30)])
+    add_exams(db, [days_from_now(2)], chat_id=-5)
+    from_date, until_date = days_from_now(0), days_from_now(10)
+    everything = db.get_upcoming_exams_for_user(1, 1, from_date, until_date, limit=100)
+    assert len(everything) == 10
+    assert everything == sorted(everything, key=cursor_of)
+
+    pages, after = [], None
+    while True:
+        page = db.get_upcoming_exams_for_user(1, 1, from_date, until_date, after=after, limit=3)
+        if not page:
+            break
+        pages.append(page)
+        after = cursor_of(page[-1])
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    assert [exam for page in pages for exam in page] == everything
+
+    # Back from the last page gives the same pages, still in ascending order
+    before = cursor_of(pages[-1][0])
+    for page in reversed(pages[:-1]):
+        assert db.get_upcoming_exams_for_user(1, 1, from_date, until_date, before=before, limit=3) == page
+        before = cursor_of(page[0])
+    assert db.get_upcoming_exams_for_user(1, 1, from_date, until_date, before=before, limit=3) == []
+
+
+def test_upcoming_page_cursor_outside_the_range_is_clamped(db):
+    add_exams(db, [days_from_now(days) for days in (1, 2, 3)], user_id=2, chat_id=-9, is_group_exam=True)
+    from_date, until_date = days_from_now(2), days_from_now(3)
+    in_range = db.get_upcoming_exams_for_group(-9, from_date, until_date)
+    assert [exam.exam_date for exam in in_range] == [from_date, until_date]
+    # A cursor kept from an earlier range, e.g. before the day changed
+    assert db.get_upcoming_exams_for_group(-9, from_date, until_date, after=(days_from_now(0), 0)) == in_range
+    assert db.get_upcoming_exams_for_group(-9, from_date, until_date, before=(days_from_now(60), 1)) == in_range
+
+
+def test_iter_exams_for_notification_pages_by_id(db):
+    tomorrow = days_from_now(1)
+    add_exams(db, [tomorrow, days_from_now(2)] * 3 + [tomorrow])
+    add_exams(db, [tomorrow], user_id=3, chat_id=-3, is_group_exam=True)
+    exams = list(db.iter_exams_for_notification(days_ahead=1, batch_size=2))
+    assert [exam.id for exam in exams] == sorted(exam.id for exam in db.get_exams_for_notification(1))
+    assert len(exams) == 5 and {exam.exam_date for exam in exams} == {tomorrow}
+    # An exact multiple of the batch size ends with one empty page
+    assert len(list(db.iter_exams_for_notification(days_ahead=1, batch_size=5))) == 5
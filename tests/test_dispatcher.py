@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+from dispatcher import NotificationDispatcher, OutgoingMessage
+
+
+class TimedBot:
+    """Records (monotonic time, chat_id, text) per send; `errors` maps a text to the errors to raise first"""
+
+    def __init__(self, errors=None):
+        self.sent = []
+        self.errors = errors or {}
+
+    async def send_message(self, chat_id, text):
+        errors = self.errors.get(text)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((time.monotonic(), chat_id, text))
+
+
+def messages(*chats, per_chat=1):
+    return [OutgoingMessage(chat_id, f'{chat_id}:{i}', ref=(chat_id, i)) for i in range(per_chat) for chat_id in chats]
+
+
+def dispatch(dispatcher, outgoing):
+    return asyncio.run(dispatcher.dispatch(outgoing))
+
+
+def test_messages_to_a_chat_are_sent_in_order_at_the_chat_rate():
+    bot = TimedBot()
+    report = dispatch(NotificationDispatcher(bot, global_rate=1000, chat_rate=20), messages(1, 2, per_chat=4))
+    assert report.sent == 8 and report.queued == 8
+    for chat_id in (1, 2):
+        sent = [(at, text) for at, chat, text in bot.sent if chat == chat_id]
+        assert [text for _, text in sent] == [f'{chat_id}:{i}' for i in range(4)]
+        gaps = [later - earlier for (earlier, _), (later, _) in zip(sent, sent[1:])]
+        assert min(gaps) >= 0.04
+    # Chats are served concurrently, not one after the other
+    assert report.duration < 0.3
+
+
+def test_global_rate_spaces_sends_across_chats():
+    bot = TimedBot()
+    dispatch(NotificationDispatcher(bot, global_rate=50, chat_rate=1000), messages(*range(10)))
+    times = [at for at, _, _ in bot.sent]
+    assert times[-1] - times[0] >= 9 / 50 * 0.9
+
+
+def test_retry_after_pauses_every_sender():
+    bot = TimedBot({'1:0': [RetryAfter(0.2)]})
+    report = dispatch(NotificationDispatcher(bot, global_rate=1000, chat_rate=1000, concurrency=1),
+                      messages(1, 2, 3))
+    assert report.retry_after == 1 and report.sent == 3 and report.failed == 0
+    first, *others = [at for at, _, _ in bot.sent]
+    assert [text for _, _, text in bot.sent] == ['1:0', '2:0', '3:0']
+    # Chat 1 retried after the pause and the other chats waited for it too
+    assert first - report.started_at >= 0.2
+    assert all(at >= first for at in others)
+
+
+def test_repeated_retry_after_is_given_up_after_max_retries():
+    failed = []
+    bot = TimedBot({'1:0': [RetryAfter(0.01) for _ in range(5)]})
+    dispatcher = NotificationDispatcher(bot, chat_rate=1000, max_retries=2,
+                                        on_failed=lambda message, error: failed.append(error))
+    report = dispatch(dispatcher, messages(1))
+    assert report.retry_after == 2 and report.failed == 1 and report.sent == 0
+    assert isinstance(failed[0], RetryAfter)
+
+
+def test_timeouts_are_retried_with_backoff():
+    bot = TimedBot({'1:0': [TimedOut(), TimedOut()]})
+    report = dispatch(NotificationDispatcher(bot, chat_rate=1000, max_retries=3, backoff=0.05), messages(1))
+    assert report.retries == 2 and report.sent == 1
+    # 0.05 then 0.1 seconds, each jittered by 0.5-1.5x
+    assert bot.sent[0][0] - report.started_at >= (0.05 + 0.1) * 0.5
+
+
+def test_timeouts_are_given_up_after_max_retries():
+    failed = []
+    bot = TimedBot({'1:0': [TimedOut() for _ in range(5)]})
+    dispatcher = NotificationDispatcher(bot, chat_rate=1000, max_retries=2, backoff=0.001,
+                                        on_failed=lambda message, error: failed.append((message.ref, error)))
+    report = dispatch(dispatcher, messages(1, 2))
+    assert report.retries == 2 and report.failed == 1 and report.sent == 1
+    assert failed[0][0] == (1, 0) and isinstance(failed[0][1], TimedOut)
+    # Three attempts were made
+    assert len(bot.errors['1:0']) == 2
+
+
+def test_forbidden_is_not_retried():
+    bot = TimedBot({'1:0': [Forbidden('bot was blocked by the user')]})
+    report = dispatch(NotificationDispatcher(bot, chat_rate=1000, max_retries=3), messages(1, per_chat=2))
+    assert report.failed == 1 and report.retries == 0
+    assert [text for _, _, text in bot.sent] == ['1:1']
+
+
+def test_failing_callback_does_not_stop_the_chat():
+    sent = []
+
+    async def on_sent(message):
+        sent.append(message.ref)
+        if len(sent) == 2:
+            raise ConnectionError('database is locked')
+
+    bot = TimedBot()
+    dispatcher = NotificationDispatcher(bot, global_rate=1000, chat_rate=1000, max_pending=2, on_sent=on_sent)
+    report = dispatch(dispatcher, messages(1, 2, per_chat=3))
+    assert report.sent == 6 and len(sent) == 6
+    assert sorted(text for _, _, text in bot.sent) == sorted(message.text for message in messages(1, 2, per_chat=3))
+
+
+def test_failing_input_stops_every_sender():
+    bot = TimedBot()
+
+    async def outgoing():
+        for message in messages(1, 2, per_chat=5):
+            yield message
+        raise ConnectionError('claim failed')
+
+    async def run():
+        dispatcher = NotificationDispatcher(bot, global_rate=1000, chat_rate=10)
+        with pytest.raises(ConnectionError):
+            await dispatcher.dispatch(outgoing())
+        sent = len(bot.sent)
+        await asyncio.sleep(0.3)
+        return sent
+
+    sent = asyncio.run(run())
+    assert len(bot.sent) == sent < 10
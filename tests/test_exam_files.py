@@ -0,0 +1,104 @@
+import asyncio
+import csv
+import io
+import sqlite3
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from app import AppContext
+from exam_files import CSV, ICS, MAX_TITLE_LENGTH, ExamReader, write_exams
+from models import Exam
+
+TODAY = date(2030, 1, 1)
+# A field over csv.field_size_limit()
+MALFORMED = b'2030-02-01,Math,\n2030-02-02,"' + b'x' * 200_000 + b'",\n'
+
+
+def read(text, file_format=CSV):
+    reader = ExamReader(io.StringIO(text), file_format, today=TODAY)
+    return list(reader), reader.skipped
+
+
+def test_csv_rows_are_validated():
+    rows, skipped = read(
+        "date,title,description\n"
+        "2030-02-01,Math,Room 1, hall B\n"
+        "2029-12-31,Past,\n"
+        "not a date,Bad,\n"
+        "2030-02-02,,\n"
+        f"2030-02-03,{'x' * (MAX_TITLE_LENGTH + 1)},\n"
+        f"2030-02-04,{'x' * MAX_TITLE_LENGTH},\n"
+    )
+    assert rows == [('2030-02-01', 'Math', 'Room 1, hall B'), ('2030-02-04', 'x' * MAX_TITLE_LENGTH, '')]
+    assert skipped == 4
+
+
+def test_malformed_csv_raises_csv_error():
+    with pytest.raises(csv.Error):
+        read(MALFORMED.decode())
+
+
+def test_ics_round_trip():
+    exams = [Exam(1, 1, -1, '2030-02-01', 'Math; final', 'Room 1,\nhall B', True)]
+    rows, skipped = read(write_exams(exams, ICS).read(), ICS)
+    assert rows == [('2030-02-01', 'Math; final', 'Room 1,\nhall B')] and skipped == 0
+
+
+class Document:
+    file_name = 'exams.csv'
+    mime_type = 'text/csv'
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.file_size = len(data)
+
+    async def get_file(self):
+        async def download_to_drive(path):
+            with open(path, 'wb') as f:
+                f.write(self.data)
+        return SimpleNamespace(download_to_drive=download_to_drive)
+
+
+def import_file(db, data: bytes):
+    from bot import ExamBot
+
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    message = SimpleNamespace(document=Document(data), reply_to_message=None, reply_text=reply_text)
+    update = SimpleNamespace(effective_message=message, message=message,
+                             effective_user=SimpleNamespace(id=5), effective_chat=SimpleNamespace(id=5))
+    asyncio.run(ExamBot(AppContext(database=db)).import_exams(update, SimpleNamespace(args=[])))
+    return replies
+
+
+def test_import_replies_when_the_csv_is_malformed(db):
+    replies = import_file(db, MALFORMED)
+    assert len(replies) == 1 and 'CSV' in replies[0]
+    assert db.get_exams_for_user(5, 5) == []
+
+
+def test_import_skips_over_long_titles(db, exam_date):
+    replies = import_file(db, f"{exam_date},Math,\n{exam_date},{'x' * 300},\n".encode())
+    assert len(db.get_exams_for_user(5, 5)) == 1
+    assert '1' in replies[0]
+
+
+def test_ics_escapes_round_trip():
+    description = 'C:\\new\\temp; a\\,b, line\nnext \\n'
+    exams = [Exam(1, 1, -1, '2030-02-01', 'back\\slash\\N', description, True)]
+    rows, _ = read(write_exams(exams, ICS).read(), ICS)
+    assert rows == [('2030-02-01', 'back\\slash\\N', description)]
+
+
+def test_bulk_insert_stays_within_the_parameter_limit(db, exam_date):
+    # As on SQLite builds before 3.32
+    with db.connection() as conn:
+        conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+    db.dialect.max_variables = 999
+    assert db.add_exams_bulk(1, 1, ((exam_date, f'Exam {i}', '') for i in range(400))) == 400
+    assert len(db.get_exams_for_user(1, 1)) == 400
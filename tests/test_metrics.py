@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import metrics
+from metrics import (
+    REGISTRY, Counter, Gauge, Histogram, MetricsServer, count_notification, observe_handler, observe_query
+)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency_seconds', 'Latency', ['handler'], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.labels('add').observe(value)
+    assert histogram.expose() == [
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{handler="add",le="0.1"} 1',
+        'latency_seconds_bucket{handler="add",le="1"} 3',
+        'latency_seconds_bucket{handler="add",le="+Inf"} 4',
+        'latency_seconds_sum{handler="add"} 6.25',
+        'latency_seconds_count{handler="add"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter('commands_total', 'Commands', ['command'])
+    counter.labels('a"b\\c\nd').inc(2)
+    assert counter.expose()[-1] == 'commands_total{command="a\\"b\\\\c\\nd"} 2.0'
+
+
+def test_gauge_reads_its_callback_at_scrape_time():
+    values = {('open',): 1}
+    gauge = Gauge('connections', 'Connections', lambda: values, ['state'])
+    assert gauge.expose()[-1] == 'connections{state="open"} 1'
+    values[('idle',)] = 3
+    assert gauge.expose()[2:] == ['connections{state="idle"} 3', 'connections{state="open"} 1']
+
+
+def test_failing_gauge_callback_exposes_no_samples():
+    gauge = Gauge('broken', 'Broken', lambda: 1 / 0, kind='counter')
+    assert gauge.expose() == ['# HELP broken Broken', '# TYPE broken counter']
+
+
+def samples(metric, *labels):
+    """Observations of a histogram, or a counter's total, under the given labels"""
+    child = metric._children.get(labels)
+    if child is None:
+        return 0
+    return child.count if isinstance(metric, Histogram) else child.value
+
+
+def test_instrumentation_is_a_no_op_when_disabled(monkeypatch):
+    @observe_query
+    def lookup_for_metrics_test():
+        return [1, 2, 3]
+
+    class Handlers:
+        @observe_handler('metrics_test')
+        async def handle(self, update, context):
+            return 'handled'
+
+    for enabled in (False, True):
+        monkeypatch.setattr(REGISTRY, 'enabled', enabled)
+        monkeypatch.setattr(REGISTRY, 'tracing', False)
+        assert lookup_for_metrics_test() == [1, 2, 3]
+        assert asyncio.run(Handlers().handle(None, None)) == 'handled'
+        count_notification('metrics_test')
+        expected = 1 if enabled else 0
+        assert samples(metrics.QUERY_LATENCY, 'lookup_for_metrics_test') == expected
+        assert samples(metrics.QUERY_ROWS, 'lookup_for_metrics_test') == 3 * expected
+        assert samples(metrics.HANDLER_LATENCY, 'metrics_test') == expected
+        assert samples(metrics.NOTIFICATIONS, 'metrics_test') == expected
+
+
+def test_handler_errors_are_counted(monkeypatch):
+    monkeypatch.setattr(REGISTRY, 'enabled', True)
+
+    class Handlers:
+        @observe_handler('metrics_test_error')
+        async def handle(self, update, context):
+            raise ValueError
+
+    with pytest.raises(ValueError):
+        asyncio.run(Handlers().handle(None, None))
+    assert samples(metrics.HANDLER_ERRORS, 'metrics_test_error') == 1
+    assert samples(metrics.HANDLER_LATENCY, 'metrics_test_error') == 1
+
+
+async def http_get(port, request_line):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"{request_line}\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return head.split(b'\r\n')[0].decode(), body.decode()
+
+
+def test_metrics_server_answers_get_metrics_only():
+    async def run():
+        server = MetricsServer('127.0.0.1', 0)
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        try:
+            return [await http_get(port, request_line) for request_line in
+                    ('GET /metrics HTTP/1.1', 'GET /metrics?x=1 HTTP/1.1', 'GET / HTTP/1.1',
+                     'POST /metrics HTTP/1.1')]
+        finally:
+            await server.stop()
+
+    (status, body), (query_status, _), (root_status, _), (post_status, _) = asyncio.run(run())
+    assert status == query_status == 'HTTP/1.1 200 OK'
+    assert body == REGISTRY.expose()
+    assert '# TYPE exam_bot_handler_latency_seconds histogram' in body
+    assert root_status == post_status == 'HTTP/1.1 404 Not Found'
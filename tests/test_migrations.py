@@ -0,0 +1,35 @@
+import multiprocessing
+import sqlite3
+
+from migrations import MIGRATIONS, SQLITE, run_migrations
+
+
+def migrate(path, start):
+    conn = sqlite3.connect(path, timeout=30)
+    start.wait()
+    try:
+        return run_migrations(conn, SQLITE)
+    finally:
+        conn.close()
+
+
+def test_migrations_are_idempotent(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'exams.db'))
+    assert run_migrations(conn, SQLITE) == MIGRATIONS[-1].version
+    assert run_migrations(conn, SQLITE) == MIGRATIONS[-1].version
+    assert conn.execute('SELECT COUNT(*) FROM schema_version').fetchone()[0] == len(MIGRATIONS)
+
+
+def test_concurrent_processes_migrate_a_fresh_sqlite_file_once(tmp_path):
+    # As the sharded workers do when they all start against a new file
+    path = str(tmp_path / 'exams.db')
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager:
+        start = manager.Barrier(6)
+        with context.Pool(6) as pool:
+            versions = pool.starmap(migrate, [(path, start)] * 6)
+
+    assert versions == [MIGRATIONS[-1].version] * 6
+    conn = sqlite3.connect(path)
+    assert [row[0] for row in conn.execute('SELECT version FROM schema_version ORDER BY version')] == \
+        [migration.version for migration in MIGRATIONS]
@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from async_database import AsyncDatabase
+from database import Database
+from dispatcher import NotificationDispatcher
+from outbox import OutboxWorker
+from scheduler import DATETIME_FORMAT
+
+
+def make_due(db, chat_id, due_at):
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(db.dialect.compile('UPDATE notifications SET due_at = ? WHERE chat_id = ?'),
+                       (due_at.strftime(DATETIME_FORMAT), chat_id))
+        conn.commit()
+
+
+def statuses(db):
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*) FROM notifications GROUP BY status')
+        return dict(cursor.fetchall())
+
+
+def worker(db, batch_size, digest=True):
+    def dispatcher_factory(bot, **kwargs):
+        return NotificationDispatcher(bot, global_rate=10000, chat_rate=10000, **kwargs)
+
+    return OutboxWorker(
+        AsyncDatabase(db), dispatcher_factory,
+        format_message=lambda notification: str(notification.notification_id),
+        batch_size=batch_size,
+        # One line per reminder, so a message shows how many reminders it carries
+        format_digest=(lambda notifications: ('', [f"{n.notification_id}\n" for n in notifications]))
+        if digest else None
+    )
+
+
+def sent_counts(bot):
+    return [(chat_id, len(text.splitlines())) for chat_id, text in bot.sent]
+
+
+def test_digest_holds_back_the_chat_cut_off_by_the_claim(db, bot, exam_date):
+    # Claim order is (due_at, chat_id, id): -5's 3 rows, then -9's 5 rows.
+    # A batch of 6 ends inside -9 even though -9 sorts before -5 by chat_id.
+    now = datetime.now()
+    for chat_id, count, due_at in ((-5, 3, now - timedelta(minutes=2)), (-9, 5, now - timedelta(minutes=1))):
+        for i in range(count):
+            db.add_exam(1, chat_id, exam_date, f'Exam {i}', '', True)
+        make_due(db, chat_id, due_at)
+
+    report = asyncio.run(worker(db, batch_size=6).drain(bot))
+
+    assert sorted(sent_counts(bot)) == [(-9, 5), (-5, 3)]
+    assert report.sent == 2
+    assert statuses(db) == {'sent': 8}
+
+
+def test_digest_of_a_chat_larger_than_a_batch_is_sent_once(db, bot, exam_date):
+    for i in range(7):
+        db.add_exam(1, -3, exam_date, f'Exam {i}', '', True)
+    make_due(db, -3, datetime.now() - timedelta(minutes=1))
+
+    asyncio.run(worker(db, batch_size=3).drain(bot))
+
+    assert sent_counts(bot) == [(-3, 7)]
+    assert statuses(db) == {'sent': 7}
+
+
+def test_one_message_per_reminder_without_digest(db, bot, exam_date):
+    for chat_id in (-1, -2):
+        for i in range(2):
+            db.add_exam(1, chat_id, exam_date, f'Exam {i}', '', True)
+        make_due(db, chat_id, datetime.now() - timedelta(minutes=1))
+
+    report = asyncio.run(worker(db, batch_size=3, digest=False).drain(bot))
+
+    assert report.sent == 4
+    assert sorted(chat_id for chat_id, _ in bot.sent) == [-2, -2, -1, -1]
+
+
+def test_two_workers_send_every_reminder_once(db, database_url, bot, exam_date):
+    # One group with more reminders than a lease lasts at its chat rate
+    for i in range(40):
+        db.add_exam(1, -7, exam_date, f'Exam {i}', '', True)
+    make_due(db, -7, datetime.now() - timedelta(minutes=1))
+    other = Database(database_url, reminder_policy=db.reminder_policy)
+
+    def dispatcher_factory(bot, **kwargs):
+        return NotificationDispatcher(bot, global_rate=10000, chat_rate=4, **kwargs)
+
+    def outbox(database, worker_id):
+        return OutboxWorker(AsyncDatabase(database), dispatcher_factory,
+                            format_message=lambda notification: str(notification.notification_id),
+                            worker_id=worker_id, batch_size=10, lease_seconds=1, chat_rate=4)
+
+    async def run():
+        return await asyncio.gather(outbox(db, 'a').drain(bot), outbox(other, 'b').drain(bot))
+
+    try:
+        reports = asyncio.run(run())
+    finally:
+        other.close()
+    texts = [text for _, text in bot.sent]
+    assert len(texts) == len(set(texts)) == 40
+    assert sum(report.sent for report in reports) == 40
+    assert statuses(db) == {'sent': 40}
+
+
+def test_claim_takes_at_most_max_per_chat_rows_of_a_chat(db, exam_date):
+    for chat_id, count in ((-1, 5), (-2, 2)):
+        for i in range(count):
+            db.add_exam(1, chat_id, exam_date, f'Exam {i}', '', True)
+        make_due(db, chat_id, datetime.now() - timedelta(minutes=1))
+
+    claimed = db.claim_notifications('a', limit=10, max_per_chat=3)
+    assert sorted(notification.chat_id for notification in claimed) == [-2, -2, -1, -1, -1]
+    # The rest of -1 goes to the next claim, in order
+    rest = db.claim_notifications('b', limit=10, max_per_chat=3)
+    assert [n.chat_id for n in rest] == [-1, -1]
+    assert max(n.notification_id for n in claimed if n.chat_id == -1) < min(n.notification_id for n in rest)
+    assert db.claim_notifications('c', limit=10) == []
+
+
+def test_renewed_lease_is_not_claimed_again(db, exam_date):
+    db.add_exam(1, -1, exam_date, 'Exam', '', True)
+    make_due(db, -1, datetime.now() - timedelta(minutes=1))
+    [notification] = db.claim_notifications('a', lease_seconds=-60)
+    # An expired lease is claimable...
+    [taken_over] = db.claim_notifications('b', lease_seconds=-60)
+    assert db.renew_notification_leases([notification.claim]) == 0
+    # ...until its holder renews it
+    assert db.renew_notification_leases([taken_over.claim], lease_seconds=60) == 1
+    assert db.claim_notifications('c') == []
@@ -0,0 +1,42 @@
+from argparse import Namespace
+
+import pytest
+
+from database import Database
+from migrations import MIGRATIONS
+from plan_reminders import ChatPlan, Release, main, simulate
+
+
+def run(releases, global_rate=30, chat_rate=1, concurrency=64):
+    plans = {release.chat_id: ChatPlan(release.chat_id, 0) for release in releases}
+    lags = simulate(releases, global_rate, chat_rate, concurrency, plans)
+    return max(lag for lag, _ in lags), max(plan.last_sent for plan in plans.values())
+
+
+def test_one_chat_is_limited_by_the_chat_rate():
+    assert run([Release(0, -1, 10, 10)]) == (10, 10)
+
+
+def test_many_chats_share_the_global_rate():
+    lag, last_sent = run([Release(0, chat_id, 1, 1) for chat_id in range(90)])
+    assert lag == pytest.approx(3) and last_sent == pytest.approx(3)
+
+
+def test_a_chat_queues_behind_its_earlier_batch():
+    assert run([Release(0, -1, 5, 5), Release(2, -1, 5, 5)]) == (8, 10)
+
+
+def test_planner_does_not_migrate(database_url):
+    planner_args = Namespace(
+        database_url=database_url, from_date='2030-01-01', to_date='2030-01-01', digest=False,
+        global_rate=30, chat_rate=1, concurrency=64, workers=1, top=10
+    )
+    with pytest.raises(SystemExit):
+        main(planner_args)
+
+    db = Database(database_url, init_schema=False)
+    assert db.read_schema_version() == 0
+    db.init_database()
+    assert db.read_schema_version() == MIGRATIONS[-1].version
+    db.close()
+    main(planner_args)
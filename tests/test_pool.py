@@ -0,0 +1,175 @@
+import threading
+import time
+
+import pytest
+
+from pool import ConnectionPool, PoolTimeout, ThreadLocalPool
+
+
+class Connection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.rollbacks = 0
+        self.broken = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        if self.broken:
+            raise OSError('connection lost')
+
+    def close(self):
+        self.closed = True
+
+
+class Factory:
+    def __init__(self):
+        self.created = []
+
+    def __call__(self):
+        conn = Connection(len(self.created))
+        self.created.append(conn)
+        return conn
+
+
+def test_connections_are_reused():
+    factory = Factory()
+    pool = ConnectionPool(factory, max_size=2)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    second = pool.acquire()
+    assert second is not first
+    assert pool.size == 2 and pool.stats.created == 2 and pool.stats.checkouts == 3
+
+
+def test_acquire_waits_for_a_release_at_max_size():
+    pool = ConnectionPool(Factory(), max_size=1)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, (conn,)).start()
+    assert pool.acquire(timeout=5) is conn
+    assert pool.stats.waits == 1 and pool.stats.wait_time > 0
+
+
+def test_acquire_times_out():
+    pool = ConnectionPool(Factory(), max_size=1)
+    pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.05)
+    assert time.monotonic() - started >= 0.05
+
+
+def test_concurrent_callers_respect_max_size():
+    factory = Factory()
+    pool = ConnectionPool(factory, max_size=3)
+    in_use, peak, lock = set(), [0], threading.Lock()
+
+    def work():
+        for _ in range(20):
+            with pool.connection() as conn:
+                with lock:
+                    in_use.add(conn)
+                    peak[0] = max(peak[0], len(in_use))
+                time.sleep(0.001)
+                with lock:
+                    in_use.discard(conn)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(factory.created) <= 3 and peak[0] <= 3
+
+
+def test_failed_factory_frees_its_slot():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError('refused')
+        return Connection(len(calls))
+
+    pool = ConnectionPool(factory, max_size=1)
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.size == 0
+    assert pool.acquire(timeout=0.1).number == 2
+
+
+def test_exception_rolls_back_and_returns_the_connection():
+    pool = ConnectionPool(Factory(), max_size=1)
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError
+    assert conn.rollbacks == 1 and not conn.closed
+    assert pool.idle == 1
+
+
+def test_failed_rollback_discards_the_connection():
+    pool = ConnectionPool(Factory(), max_size=1)
+    with pytest.raises(OSError):
+        with pool.connection() as conn:
+            conn.broken = True
+            raise ValueError
+    assert conn.closed and pool.size == 0
+    assert pool.acquire(timeout=0.1) is not conn
+
+
+def test_reset_failure_discards_the_connection():
+    def reset(conn):
+        raise OSError('connection lost')
+
+    pool = ConnectionPool(Factory(), max_size=1, reset=reset)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert conn.closed and pool.size == 0
+
+
+def test_unhealthy_idle_connection_is_replaced():
+    def health_check(conn):
+        if conn.number == 0:
+            raise OSError('connection lost')
+
+    pool = ConnectionPool(Factory(), health_check=health_check, health_check_interval=0)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire().number == 1
+    assert first.closed and pool.stats.health_check_failures == 1 and pool.size == 1
+
+
+def test_idle_connections_are_evicted():
+    pool = ConnectionPool(Factory(), idle_timeout=0)
+    first = pool.acquire()
+    pool.release(first)
+    time.sleep(0.01)
+    assert pool.acquire() is not first
+    assert first.closed and pool.size == 1
+
+
+def test_close_closes_idle_now_and_checked_out_on_release():
+    pool = ConnectionPool(Factory(), max_size=2)
+    idle, busy = pool.acquire(), pool.acquire()
+    pool.release(idle)
+    pool.close()
+    assert idle.closed and not busy.closed
+    pool.release(busy)
+    assert busy.closed and pool.size == 0
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+
+def test_thread_local_pool_gives_each_thread_its_own_connection():
+    factory = Factory()
+    pool = ThreadLocalPool(factory)
+    main = pool.acquire()
+    assert pool.acquire() is main
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.acquire()))
+    thread.start()
+    thread.join()
+    assert other[0] is not main and pool.size == 2
+    pool.close()
+    assert all(conn.closed for conn in factory.created) and pool.size == 0
@@ -0,0 +1,103 @@
+import pytest
+
+import ratelimit
+from ratelimit import BucketTable, CommandLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, 'time', clock)
+    return clock
+
+
+def test_user_burst_then_refill(clock):
+    limiter = CommandLimiter(user_rate=0.5, user_burst=3, commands=('add',))
+    assert [limiter.check('add', 1, 1) for _ in range(3)] == [None] * 3
+    bucket = limiter.check('add', 1, 1)
+    assert bucket is limiter.users.get(1, clock.now)
+    assert limiter.stats.throttled[('add', 'user')] == 1
+    # One token every two seconds
+    clock.now += 2
+    assert limiter.check('add', 1, 1) is None
+    assert limiter.check('add', 1, 1) is not None
+
+
+def test_chat_bucket_is_shared_by_its_members(clock):
+    limiter = CommandLimiter(user_burst=5, chat_burst=2, commands=('list',))
+    assert limiter.check('list', 1, -10) is None
+    assert limiter.check('list', 2, -10) is None
+    assert limiter.check('list', 3, -10) is not None
+    assert limiter.metrics()['throttled'] == {('list', 'chat'): 1}
+    # Private chats only use the user's bucket
+    assert limiter.check('list', 3, 3) is None
+
+
+def test_unknown_commands_are_counted_together(clock):
+    limiter = CommandLimiter(user_burst=1, commands=('add', 'list'))
+    limiter.check('add', 1, 1)
+    for command in ('add', 'anything123', 'a"b', 'list'):
+        limiter.check(command, 1, 1)
+    assert limiter.metrics()['throttled'] == {('add', 'user'): 1, ('other', 'user'): 2, ('list', 'user'): 1}
+
+
+def test_throttled_command_takes_no_token(clock):
+    limiter = CommandLimiter(user_burst=5, chat_burst=1)
+    assert limiter.check('add', 1, -10) is None
+    assert limiter.check('add', 1, -10) is not None
+    assert limiter.users.get(1, clock.now).tokens == 4
+
+
+def test_rate_zero_turns_a_limit_off(clock):
+    limiter = CommandLimiter(user_rate=0, user_burst=1, chat_rate=0, chat_burst=1)
+    assert all(limiter.check('add', 1, -10) is None for _ in range(20))
+    assert len(limiter.users) == len(limiter.chats) == 0
+
+
+def test_allowed_command_clears_warned(clock):
+    limiter = CommandLimiter(user_rate=1, user_burst=1)
+    limiter.check('add', 1, 1)
+    limiter.check('add', 1, 1).warned = True
+    clock.now += 1
+    assert limiter.check('add', 1, 1) is None
+    assert not limiter.users.get(1, clock.now).warned
+
+
+def test_least_recently_used_bucket_is_evicted():
+    table = BucketTable(rate=1, burst=5, max_entries=2)
+    table.get(1, 0).tokens = 0
+    table.get(2, 0)
+    table.get(1, 0)
+    table.get(3, 0)
+    assert table.evictions == 1 and len(table) == 2
+    # 1 was used more recently than 2, so it kept its state
+    assert table.get(1, 0).tokens == 0
+    assert table.get(2, 0).tokens == 5
+
+
+def test_coalesce_within_window_and_forget(clock):
+    limiter = CommandLimiter(coalesce_seconds=2)
+    assert not limiter.coalesce('list:1')
+    assert limiter.coalesce('list:1')
+    assert not limiter.coalesce('list:2')
+    limiter.forget('list:1')
+    assert not limiter.coalesce('list:1')
+    clock.now += 2
+    assert not limiter.coalesce('list:1')
+    assert limiter.stats.coalesced == 1
+
+
+def test_coalesce_keys_are_bounded(clock):
+    limiter = CommandLimiter(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        limiter.coalesce(key)
+    assert not limiter.coalesce('a')
+    assert limiter.coalesce('c')
@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+import pytest
+
+from models import Notification
+from rendering import MESSAGES, Renderer, check_template, message_length, split_message
+
+
+@pytest.mark.parametrize('template', [
+    "{x:{__import__('os').getpid()}}",
+    "{x.__class__}",
+    "{x[0]}",
+    "{x!r}",
+    "{0}",
+    "{}",
+])
+def test_templates_only_substitute_plain_names(template):
+    with pytest.raises(ValueError):
+        check_template(template)
+
+
+def test_template_renders_format_specs_and_escapes():
+    assert check_template("{rate:.0f}/s {{x}}")(rate=12.4) == "12/s {x}"
+    assert check_template("no placeholders")() == "no placeholders"
+
+
+def test_every_locale_defines_the_same_templates():
+    names = {locale: set(templates) for locale, templates in MESSAGES.items()}
+    assert all(templates == names['ar'] for templates in names.values())
+    Renderer('ar')
+
+
+def test_split_message_packs_entries_within_the_limit():
+    entries = [f"entry {i} " + "😀" * 10 + "\n" for i in range(100)]
+    messages = split_message("header\n", entries, limit=200)
+    assert all(message_length(text) <= 200 for text, _ in messages)
+    assert [index for _, indexes in messages for index in indexes] == list(range(100))
+
+
+def test_digest_labels_and_locale():
+    today = date.today()
+    notification = Notification(1, 0, 1440, 'c', 1, 1, -1, (today + timedelta(days=1)).isoformat(),
+                                'Exam', 'Room 3', True, 'en')
+    header, [entry] = Renderer('ar').digest([notification], today)
+    assert header == "🔔 Event reminders (1)\n"
+    assert entry.startswith("\n📅 Tomorrow:") and "📄 Room 3" in entry
@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime, time, timedelta
+
+from scheduler import DATETIME_FORMAT, ReminderPolicy, ReminderScheduler
+
+
+def test_due_times_are_lead_minutes_before_the_anchor():
+    policy = ReminderPolicy(lead_minutes=(1440, 60), anchor=time(9, 30))
+    assert policy.due_times('2030-01-10', -5, now=datetime(2030, 1, 1)) == [
+        (1440, datetime(2030, 1, 9, 9, 30)),
+        (60, datetime(2030, 1, 10, 8, 30)),
+    ]
+
+
+def test_chat_offset_spreads_chats_and_is_stable():
+    policy = ReminderPolicy(spread_minutes=60)
+    offsets = {chat_id: policy.chat_offset(chat_id) for chat_id in range(-500, 500)}
+    assert all(timedelta(0) <= offset < timedelta(minutes=60) for offset in offsets.values())
+    assert len(set(offsets.values())) == 60
+    assert policy.chat_offset(42) == offsets[42]
+    [(_, due_at)] = policy.due_times('2030-01-10', 42, now=datetime(2030, 1, 1))
+    assert due_at == datetime(2030, 1, 9, 9) + offsets[42]
+    assert ReminderPolicy(spread_minutes=0).chat_offset(42) == timedelta(0)
+
+
+def test_no_reminders_once_the_anchor_has_passed():
+    policy = ReminderPolicy(lead_minutes=(1440, 60))
+    # Both reminders are late, but the exam has not started: they are still due
+    assert len(policy.due_times('2030-01-10', 1, now=datetime(2030, 1, 10, 8, 59))) == 2
+    assert policy.due_times('2030-01-10', 1, now=datetime(2030, 1, 10, 9)) == []
+    assert policy.due_times('2030-01-10', 1, now=datetime(2030, 1, 11)) == []
+
+
+def test_policy_from_env(monkeypatch):
+    monkeypatch.setenv('REMINDER_LEAD_MINUTES', '1440, 60,')
+    monkeypatch.setenv('REMINDER_TIME', '07:45')
+    monkeypatch.setenv('REMINDER_SPREAD_MINUTES', '15')
+    assert ReminderPolicy.from_env() == ReminderPolicy((1440, 60), time(7, 45), 15)
+
+
+class DueTimes:
+    """Stands in for the database's get_upcoming_due_times"""
+
+    def __init__(self, due_times=()):
+        self.due_times = list(due_times)
+        self.refreshes = 0
+
+    async def get_upcoming_due_times(self, until: str, not_before: str, limit: int = 1000):
+        self.refreshes += 1
+        return [due_at for due_at in self.due_times if not_before <= due_at <= until]
+
+
+def run_scheduler(scheduler, seconds, during=None):
+    async def run():
+        scheduler.start()
+        if during:
+            await asyncio.sleep(0.05)
+            during()
+        await asyncio.sleep(seconds)
+        await scheduler.stop()
+
+    asyncio.run(run())
+
+
+def test_run_fires_once_per_due_time_from_the_database():
+    now = datetime.now()
+    late = (now - timedelta(minutes=5)).strftime(DATETIME_FORMAT)
+    soon = (now + timedelta(seconds=1)).strftime(DATETIME_FORMAT)
+    too_late = (now - timedelta(hours=2)).strftime(DATETIME_FORMAT)
+    beyond_horizon = (now + timedelta(hours=1)).strftime(DATETIME_FORMAT)
+    fired = []
+
+    async def fire():
+        fired.append(datetime.now())
+
+    db = DueTimes([late, late, soon, too_late, beyond_horizon])
+    scheduler = ReminderScheduler(db, fire, ReminderPolicy(), horizon_seconds=600, refresh_seconds=60,
+                                  max_lateness_seconds=3600)
+    run_scheduler(scheduler, 1.5)
+    # The late one at once, then the one due in a second; nothing outside the window
+    assert len(fired) == 2 and db.refreshes == 1
+    assert fired[1] >= datetime.strptime(soon, DATETIME_FORMAT)
+    assert scheduler._heap == []
+
+
+def test_run_picks_up_scheduled_exams():
+    due_at = datetime.now() + timedelta(seconds=0.5)
+    policy = ReminderPolicy(lead_minutes=(0,), anchor=due_at.time())
+    fired = []
+
+    async def fire():
+        fired.append(datetime.now())
+
+    scheduler = ReminderScheduler(DueTimes(), fire, policy)
+
+    def add_exams():
+        # Same chat and date: one due time
+        scheduler.schedule_exam(due_at.date().isoformat(), 1)
+        scheduler.schedule_exam(due_at.date().isoformat(), 1)
+
+    run_scheduler(scheduler, 1, during=add_exams)
+    assert len(fired) == 1 and fired[0] >= due_at
+
+
+def test_fire_errors_do_not_stop_the_scheduler():
+    now = datetime.now()
+    calls = []
+
+    async def fire():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError('database is locked')
+
+    scheduler = ReminderScheduler(DueTimes(), fire, ReminderPolicy())
+    scheduler.schedule(now - timedelta(seconds=1))
+    scheduler.schedule(now + timedelta(seconds=0.3))
+    run_scheduler(scheduler, 0.6)
+    assert len(calls) == 2
@@ -0,0 +1,104 @@
+import random
+from datetime import datetime, timedelta
+
+from database import Database
+from dialects import CHAT_PARTITION
+from scheduler import DATETIME_FORMAT, ReminderPolicy
+from sharding import Supervisor, partition_of
+
+
+class FakeProcess:
+    def __init__(self, name, alive=True):
+        self.name = name
+        self.alive = alive
+        self.exitcode = None if alive else 1
+        self.started = False
+
+    def is_alive(self):
+        return self.alive
+
+    def start(self):
+        self.started = True
+
+
+class FakeApplication:
+    def __init__(self):
+        self.stopped = False
+
+    def stop_running(self):
+        self.stopped = True
+
+
+def supervisor(workers=2, **kwargs):
+    supervisor = Supervisor(workers, **kwargs)
+    supervisor.spawn = lambda index: FakeProcess(f"worker-{index}")
+    supervisor.processes = [FakeProcess(f"worker-{index}") for index in range(workers)]
+    return supervisor
+
+
+def test_dead_worker_is_restarted():
+    supervisor_ = supervisor()
+    application = FakeApplication()
+    supervisor_.processes[1] = dead = FakeProcess('worker-1', alive=False)
+
+    assert supervisor_.check_workers(application)
+    assert supervisor_.processes[1] is not dead and supervisor_.processes[1].started
+    assert not application.stopped
+
+
+def test_worker_that_keeps_dying_stops_the_bot():
+    supervisor_ = supervisor(max_restarts=2)
+    application = FakeApplication()
+    supervisor_.spawn = lambda index: FakeProcess(f"worker-{index}", alive=False)
+    supervisor_.processes[0] = FakeProcess('worker-0', alive=False)
+
+    assert supervisor_.check_workers(application)
+    assert supervisor_.check_workers(application)
+    assert not supervisor_.check_workers(application)
+    assert application.stopped
+
+
+def chat_ids(count, seed=1):
+    rng = random.Random(seed)
+    # Private chats are positive, groups negative, supergroups -100...
+    return [rng.choice((rng.randint(1, 10 ** 10), -rng.randint(1, 10 ** 10),
+                        -10 ** 12 - rng.randint(1, 10 ** 10))) for _ in range(count)]
+
+
+def test_partition_of_matches_sql(db):
+    ids = chat_ids(500) + [0, 1, -1, 2 ** 32, -(2 ** 32) - 1, -1009999999999]
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        for count in (2, 3, 4, 7):
+            for chat_id in ids:
+                cursor.execute(f'SELECT {CHAT_PARTITION} FROM (SELECT ? AS chat_id) chats', (count, chat_id))
+                assert cursor.fetchone()[0] == partition_of(chat_id, count)
+
+
+def test_every_spread_minute_is_shared_by_all_workers():
+    policy = ReminderPolicy(spread_minutes=60)
+    for workers in (2, 3, 4, 6):
+        minutes = {}
+        for chat_id in chat_ids(6000):
+            minutes.setdefault(policy.chat_offset(chat_id), set()).add(partition_of(chat_id, workers))
+        assert all(len(partitions) == workers for partitions in minutes.values())
+
+
+def test_each_worker_claims_only_its_partition(database_url, db, exam_date):
+    ids = chat_ids(60, seed=2)
+    for chat_id in ids:
+        db.add_exam(abs(chat_id), chat_id, exam_date, 'Exam', '', chat_id < 0)
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('UPDATE notifications SET due_at = ?',
+                       ((datetime.now() - timedelta(minutes=1)).strftime(DATETIME_FORMAT),))
+        conn.commit()
+
+    claimed = []
+    for index in range(3):
+        worker = Database(database_url, partition=(index, 3))
+        batch = worker.claim_notifications(f'worker-{index}', limit=1000)
+        worker.close()
+        assert {partition_of(n.chat_id, 3) for n in batch} <= {index}
+        claimed.extend(n.chat_id for n in batch)
+    assert sorted(claimed) == sorted(ids)
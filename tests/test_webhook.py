@@ -0,0 +1,57 @@
+import asyncio
+import socket
+
+import bot
+from app import AppContext
+from benchmarks.fake_bot_api import FakeBotAPI
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for(condition, timeout: float = 5):
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError('timed out')
+
+
+def test_webhook_checks_the_secret_and_answers_commands(db, exam_date, monkeypatch):
+    port = free_port()
+    monkeypatch.setattr(bot, 'require_bot_token', lambda: '123456:fake')
+    monkeypatch.setattr(bot, 'WEBHOOK_URL', f'http://127.0.0.1:{port}')
+    monkeypatch.setattr(bot, 'WEBHOOK_LISTEN', '127.0.0.1')
+    monkeypatch.setattr(bot, 'WEBHOOK_PORT', port)
+    monkeypatch.setattr(bot, 'WEBHOOK_SECRET', 'webhook-secret')
+
+    async def run():
+        async with FakeBotAPI() as api:
+            monkeypatch.setattr(bot, 'TELEGRAM_BASE_URL', api.base_url)
+            application = bot.build_application(bot.ExamBot(AppContext(database=db)))
+            await application.initialize()
+            await application.updater.start_webhook(**bot.webhook_settings())
+            await application.start()
+            try:
+                assert api.webhook_url == f'http://127.0.0.1:{port}/{bot.WEBHOOK_PATH}'
+                assert api.webhook_secret == 'webhook-secret'
+
+                update = api.make_update(f'/add {exam_date} Math', 5, 5)
+                assert await api.post_update(update, secret='wrong') == 403
+                assert await api.post_update(update, secret='') == 403
+                await asyncio.sleep(0.2)
+                assert api.sent == []
+
+                assert await api.post_update(update) == 200
+                await wait_for(lambda: api.sent)
+                assert api.sent[0].chat_id == 5 and 'Math' in api.sent[0].text
+            finally:
+                await application.updater.stop()
+                await application.stop()
+                await application.shutdown()
+
+    asyncio.run(run())
+    assert [exam.title for exam in db.get_exams_for_user(5, 5)] == ['Math']